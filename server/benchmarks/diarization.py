@@ -0,0 +1,260 @@
+"""Benchmark: built-in diarizer vs. pyannote, speed and diarization error rate.
+
+Scores each backend on a fixture set and reports the real-time factor
+(processing seconds per audio second) and the DER (missed speech, false
+alarm and speaker confusion over reference speech, after the best one-to-one
+speaker mapping). ``--collar`` excludes that many seconds around every
+reference boundary from scoring, as usual for DER.
+
+Fixtures are either synthetic meetings (``--synthetic N``: voiced speech
+from ``--speakers`` voices with distinct pitch and vocal-tract length, turns
+of 1-8 s, short pauses) or real recordings via ``--fixtures DIR``, where
+every ``name.wav`` (16 kHz mono) has a ``name.rttm`` reference next to it.
+pyannote runs only when ``pyannote.audio`` is installed and
+``DIARIZATION_AUTH_TOKEN``/``HF_TOKEN`` is set; otherwise it is reported as
+skipped.
+
+    python benchmarks/diarization.py --synthetic 6 --minutes 5 --speakers 3
+    python benchmarks/diarization.py --fixtures ~/ami-eval --collar 0.25 \\
+        --backends builtin,pyannote
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import wave
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from scipy.optimize import linear_sum_assignment  # noqa: E402
+from scipy.signal import lfilter  # noqa: E402
+
+import diarizer  # noqa: E402
+
+SAMPLE_RATE = diarizer.SAMPLE_RATE
+SCORE_STEP = 0.01  # DER resolution, seconds
+# (F1, F2, F3) of a few vowels for an adult male tract; voices scale these
+VOWELS = np.array(
+    [[730, 1090, 2440], [270, 2290, 3010], [300, 870, 2240], [530, 1840, 2480], [570, 840, 2410], [440, 1020, 2240]],
+    dtype=np.float64,
+)
+
+
+def _voices(rng: np.random.Generator, count: int) -> List[Dict[str, float]]:
+    # Pitch and tract length from a shuffled grid, jittered: distinct voices
+    # that can still be close neighbours, as in a real meeting.
+    f0 = np.linspace(95, 230, count) * rng.uniform(0.95, 1.05, count)
+    tract = rng.permutation(np.linspace(0.85, 1.2, count)) * rng.uniform(0.97, 1.03, count)
+    return [
+        {
+            "f0": float(f0[i]),
+            "tract": float(tract[i]),
+            "tilt": float(rng.uniform(0.6, 0.95)),
+            "breath": float(rng.uniform(0.02, 0.08)),
+        }
+        for i in range(count)
+    ]
+
+
+def _speak(rng: np.random.Generator, voice: Dict[str, float], seconds: float) -> np.ndarray:
+    """Syllables: a glottal pulse train through three vowel formant resonators."""
+    out = []
+    while sum(len(x) for x in out) < seconds * SAMPLE_RATE:
+        n = int(rng.uniform(0.12, 0.3) * SAMPLE_RATE)
+        f0 = voice["f0"] * rng.uniform(0.9, 1.1) * np.linspace(1.0, rng.uniform(0.92, 1.08), n)
+        phase = np.cumsum(f0 / SAMPLE_RATE)
+        source = np.diff(np.floor(phase), prepend=0.0)
+        source = lfilter([1.0], [1.0, -voice["tilt"]], source)
+        source += rng.normal(0.0, voice["breath"], n)
+        syllable = np.zeros(n)
+        for formant, bandwidth in zip(VOWELS[rng.integers(len(VOWELS))] * voice["tract"], (80, 100, 140)):
+            r = np.exp(-np.pi * bandwidth / SAMPLE_RATE)
+            theta = 2 * np.pi * formant / SAMPLE_RATE
+            syllable += lfilter([1.0 - r], [1.0, -2 * r * np.cos(theta), r * r], source)
+        out.append(syllable * np.hanning(n))
+    audio = np.concatenate(out)[: int(seconds * SAMPLE_RATE)]
+    return audio / (np.abs(audio).max() + 1e-9)
+
+
+def synthetic_meeting(minutes: float, speakers: int, seed: int) -> Tuple[np.ndarray, List[Tuple[float, float, str]]]:
+    rng = np.random.default_rng(seed)
+    voices = _voices(rng, speakers)
+    total = int(minutes * 60 * SAMPLE_RATE)
+    audio = rng.normal(0.0, 0.002, total)
+    reference = []
+    t, current = rng.uniform(0.2, 1.0), int(rng.integers(speakers))
+    while True:
+        length = rng.uniform(1.0, 8.0)
+        if t + length > total / SAMPLE_RATE:
+            break
+        start = int(t * SAMPLE_RATE)
+        speech = _speak(rng, voices[current], length) * rng.uniform(0.2, 0.5)
+        audio[start : start + len(speech)] += speech
+        reference.append((t, t + length, f"spk{current}"))
+        t += length + rng.uniform(0.1, 1.0)
+        current = (current + int(rng.integers(1, speakers))) % speakers if speakers > 1 else 0
+    return audio.astype(np.float32), reference
+
+
+def _read_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as wav:
+        if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise SystemExit(f"{path}: expected 16 kHz mono 16-bit PCM")
+        return np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2").astype(np.float32) / 32768.0
+
+
+def _read_rttm(path: str) -> List[Tuple[float, float, str]]:
+    turns = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            fields = line.split()
+            if len(fields) >= 8 and fields[0] == "SPEAKER":
+                start, duration = float(fields[3]), float(fields[4])
+                turns.append((start, start + duration, fields[7]))
+    return turns
+
+
+def _labels(turns, frames: int) -> Tuple[np.ndarray, List[str]]:
+    """``(frames, speakers)`` activity matrix at SCORE_STEP resolution."""
+    names = sorted({t[2] for t in turns})
+    activity = np.zeros((frames, len(names)), dtype=bool)
+    for start, end, name in turns:
+        activity[int(round(start / SCORE_STEP)) : int(round(end / SCORE_STEP)), names.index(name)] = True
+    return activity, names
+
+
+def der(reference, hypothesis, duration: float, collar: float = 0.0) -> Dict[str, float]:
+    frames = int(np.ceil(duration / SCORE_STEP))
+    ref, _ = _labels(reference, frames)
+    hyp, _ = _labels(hypothesis, frames)
+    scored = np.ones(frames, dtype=bool)
+    if collar:
+        width = int(round(collar / SCORE_STEP))
+        for start, end, _ in reference:
+            for edge in (int(round(start / SCORE_STEP)), int(round(end / SCORE_STEP))):
+                scored[max(0, edge - width) : edge + width] = False
+    ref, hyp = ref[scored], hyp[scored]
+    if hyp.shape[1] and ref.shape[1]:
+        overlap = ref.T.astype(np.int64) @ hyp.astype(np.int64)
+        rows, cols = linear_sum_assignment(-overlap)
+        mapped = np.zeros_like(ref)
+        mapped[:, rows] = hyp[:, cols]
+    else:
+        rows = cols = np.zeros(0, dtype=np.int64)
+        mapped = np.zeros_like(ref)
+    n_ref, n_hyp = ref.sum(axis=1), hyp.sum(axis=1)
+    correct = (ref & mapped).sum(axis=1)
+    total = max(1, int(n_ref.sum()))
+    missed = np.maximum(n_ref - n_hyp, 0).sum()
+    false_alarm = np.maximum(n_hyp - n_ref, 0).sum()
+    confusion = (np.minimum(n_ref, n_hyp) - correct).sum()
+    return {
+        "der": round(float(missed + false_alarm + confusion) / total, 4),
+        "missed": round(float(missed) / total, 4),
+        "false_alarm": round(float(false_alarm) / total, 4),
+        "confusion": round(float(confusion) / total, 4),
+        "speakers": int(hyp.any(axis=0).sum()),
+    }
+
+
+def run_builtin(audio: np.ndarray, num_speakers: Optional[int]) -> List[Tuple[float, float, str]]:
+    turns = diarizer.diarize(audio, num_speakers=num_speakers)
+    return [(t["start"], t["end"], t["speaker"]) for t in turns]
+
+
+def _pyannote_runner(model: str):
+    token = os.getenv("DIARIZATION_AUTH_TOKEN") or os.getenv("HF_TOKEN") or os.getenv("HUGGINGFACE_TOKEN")
+    try:
+        import torch
+        from pyannote.audio import Pipeline
+    except ImportError:
+        return None, "pyannote.audio is not installed"
+    if not token:
+        return None, "no DIARIZATION_AUTH_TOKEN/HF_TOKEN"
+    pipeline = Pipeline.from_pretrained(model, use_auth_token=token)
+
+    def run(audio: np.ndarray, num_speakers: Optional[int]):
+        result = pipeline(
+            {"waveform": torch.from_numpy(audio).unsqueeze(0), "sample_rate": SAMPLE_RATE},
+            num_speakers=num_speakers,
+        )
+        return [(float(t.start), float(t.end), str(s)) for t, _, s in result.itertracks(yield_label=True)]
+
+    return run, None
+
+
+def _fixtures(args) -> List[Tuple[str, np.ndarray, list]]:
+    if args.fixtures:
+        out = []
+        for path in sorted(glob.glob(os.path.join(os.path.expanduser(args.fixtures), "*.wav"))):
+            rttm = os.path.splitext(path)[0] + ".rttm"
+            if os.path.exists(rttm):
+                out.append((os.path.basename(path), _read_wav(path), _read_rttm(rttm)))
+        if not out:
+            raise SystemExit(f"no .wav/.rttm pairs in {args.fixtures}")
+        return out
+    return [
+        (f"synthetic-{i}", *synthetic_meeting(args.minutes, args.speakers, args.seed + i))
+        for i in range(args.synthetic)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", help="directory of name.wav + name.rttm pairs")
+    parser.add_argument("--synthetic", type=int, default=4, help="synthetic meetings when --fixtures is not given")
+    parser.add_argument("--minutes", type=float, default=5.0)
+    parser.add_argument("--speakers", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--collar", type=float, default=0.25)
+    parser.add_argument("--oracle-speakers", action="store_true", help="pass the reference speaker count")
+    parser.add_argument("--backends", default="builtin,pyannote")
+    parser.add_argument("--pyannote-model", default="pyannote/speaker-diarization-3.1")
+    args = parser.parse_args()
+
+    runners = {}
+    for backend in args.backends.split(","):
+        if backend == "builtin":
+            runners[backend] = run_builtin
+        elif backend == "pyannote":
+            runner, reason = _pyannote_runner(args.pyannote_model)
+            if runner is None:
+                print(f"pyannote: skipped ({reason})")
+            else:
+                runners[backend] = runner
+        else:
+            raise SystemExit(f"unknown backend {backend!r}")
+
+    fixtures = _fixtures(args)
+    totals: Dict[str, Dict[str, float]] = {name: {"seconds": 0.0, "audio": 0.0, "der": []} for name in runners}
+    print(f"{'fixture':<22} {'backend':<9} {'RTF':>7} {'DER':>7} {'miss':>6} {'FA':>6} {'conf':>6} {'spk':>4}/ref")
+    for name, audio, reference in fixtures:
+        duration = len(audio) / SAMPLE_RATE
+        speakers = len({t[2] for t in reference})
+        for backend, runner in runners.items():
+            started = time.perf_counter()
+            hypothesis = runner(audio, speakers if args.oracle_speakers else None)
+            elapsed = time.perf_counter() - started
+            score = der(reference, hypothesis, duration, args.collar)
+            totals[backend]["seconds"] += elapsed
+            totals[backend]["audio"] += duration
+            totals[backend]["der"].append((score["der"], duration))
+            print(
+                f"{name:<22} {backend:<9} {elapsed / duration:>7.4f} {score['der']:>7.1%} {score['missed']:>6.1%} "
+                f"{score['false_alarm']:>6.1%} {score['confusion']:>6.1%} {score['speakers']:>4}/{speakers}"
+            )
+    print()
+    for backend, total in totals.items():
+        weighted = sum(d * w for d, w in total["der"]) / max(total["audio"], 1e-9)
+        print(
+            f"{backend:<9} RTF={total['seconds'] / max(total['audio'], 1e-9):.4f} "
+            f"DER={weighted:.1%} over {total['audio'] / 60:.1f} min"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Micro-benchmark: sweep-line speaker alignment vs. the old nested overlap scan.
+
+Generates a synthetic long meeting (Whisper-like segments plus pyannote-like
+turns that alternate between a few speakers) and times both implementations.
+
+    python benchmarks/speaker_assignment.py --hours 3 --speakers 6
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from speaker_alignment import SpeakerTimeline  # noqa: E402
+
+
+def _synthetic_meeting(hours: float, speakers: int, seed: int):
+    rng = random.Random(seed)
+    total = hours * 3600.0
+    segments = []
+    t = 0.0
+    while t < total:
+        length = rng.uniform(1.5, 8.0)
+        segments.append((t, min(total, t + length)))
+        t += length + rng.uniform(0.0, 0.6)
+    turns = []
+    t = 0.0
+    while t < total:
+        length = rng.uniform(0.8, 12.0)
+        turns.append(
+            {
+                "start": t,
+                "end": min(total, t + length),
+                "speaker": f"SPEAKER_{rng.randrange(speakers):02d}",
+            }
+        )
+        t += length + rng.uniform(-0.3, 0.5)  # small overlaps between speakers
+    return segments, turns
+
+
+def _legacy_assign(segments, speaker_segments):
+    labels = []
+    for seg_start, seg_end in segments:
+        best_label = None
+        best_overlap = 0.0
+        for entry in speaker_segments:
+            try:
+                s0 = float(entry.get("start", 0.0))
+                e0 = float(entry.get("end", 0.0))
+            except Exception:
+                continue
+            overlap = max(0.0, min(seg_end, e0) - max(seg_start, s0))
+            if overlap > best_overlap:
+                best_overlap = overlap
+                best_label = str(entry.get("speaker", ""))
+        labels.append(best_label)
+    return labels
+
+
+def _sweep_assign(segments, speaker_segments):
+    timeline = SpeakerTimeline(speaker_segments)
+    arr = np.asarray(segments, dtype=np.float64)
+    return timeline.assign(arr[:, 0], arr[:, 1])
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=2.0)
+    parser.add_argument("--speakers", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--skip-legacy", action="store_true", help="only time the sweep-line version"
+    )
+    args = parser.parse_args()
+
+    segments, turns = _synthetic_meeting(args.hours, args.speakers, args.seed)
+    print(f"segments={len(segments)} turns={len(turns)} speakers={args.speakers}")
+
+    sweep_s, sweep_labels = _best_of(lambda: _sweep_assign(segments, turns), args.repeat)
+    print(f"sweep-line : {sweep_s * 1000:9.2f} ms")
+    if args.skip_legacy:
+        return
+    legacy_s, legacy_labels = _best_of(lambda: _legacy_assign(segments, turns), 1)
+    print(f"legacy scan: {legacy_s * 1000:9.2f} ms")
+    agree = sum(a == b for a, b in zip(sweep_labels, legacy_labels)) / max(1, len(segments))
+    print(f"speedup    : {legacy_s / max(sweep_s, 1e-9):9.1f}x  (label agreement {agree:.2%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Benchmark: cold start, until the port answers and until the server is ready.
+
+Starts ``python main.py`` ``--repeat`` times with fresh caches and polls
+``/livez`` and ``/readyz``. Per run it reports the time to ``import main``
+in a fresh interpreter, from process start to the first ``/livez`` answer
+(the port is bound) and to ``/readyz`` returning 200 (the background warm-up
+has loaded the configured models), plus the warm-up steps ``/readyz`` lists.
+
+``--stub`` uses ``benchmarks/stub_model``; ``BENCH_STUB_IMPORT_SECONDS`` and
+``BENCH_STUB_LOAD_SECONDS`` then stand in for the faster-whisper import and
+the model load.
+
+    python benchmarks/startup.py --model small --repeat 3
+    python benchmarks/startup.py --stub --env BENCH_STUB_IMPORT_SECONDS=2 \\
+        --env BENCH_STUB_LOAD_SECONDS=8 --save-baseline startup.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+
+from transcription import SERVER_DIR, STUB_DIR, _connection
+
+POLL_SECONDS = 0.02
+# metric -> compared against a baseline (larger is worse for all of them)
+COMPARED = ("import_seconds", "live_seconds", "ready_seconds")
+
+
+def _status(url: str, path: str) -> Optional[Tuple[int, Dict[str, object]]]:
+    conn = _connection(url, 1.0)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+    finally:
+        conn.close()
+
+
+def _environment(env: Dict[str, str], stub: bool, workdir: str) -> Dict[str, str]:
+    full_env = dict(os.environ)
+    full_env.update(
+        {
+            "JOBS_DIR": os.path.join(workdir, "jobs"),
+            "TRANSCRIPT_CACHE_DIR": os.path.join(workdir, "transcripts"),
+        }
+    )
+    full_env.update(env)
+    if stub:
+        full_env["PYTHONPATH"] = os.pathsep.join(p for p in (STUB_DIR, full_env.get("PYTHONPATH")) if p)
+    return full_env
+
+
+def measure_import(env: Dict[str, str]) -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_start(env: Dict[str, str], timeout: float) -> Dict[str, object]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(env, HOST="127.0.0.1", PORT=str(port))
+    url = f"http://127.0.0.1:{port}"
+    log = tempfile.TemporaryFile()
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "main.py"], cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    result: Dict[str, object] = {"live_seconds": None, "ready_seconds": None, "steps": []}
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                log.seek(0)
+                raise RuntimeError(f"server exited with {proc.returncode}:\n{log.read().decode(errors='replace')[-2000:]}")
+            if result["live_seconds"] is None:
+                if _status(url, "/livez") is not None:
+                    result["live_seconds"] = round(time.perf_counter() - started, 3)
+            else:
+                answer = _status(url, "/readyz")
+                if answer is not None and answer[0] == 200:
+                    result["ready_seconds"] = round(time.perf_counter() - started, 3)
+                    result["steps"] = answer[1].get("steps", [])
+                    break
+                if answer is not None and answer[1].get("finished"):
+                    result["steps"] = answer[1].get("steps", [])
+                    break  # warm-up finished but failed: never ready
+            time.sleep(POLL_SECONDS)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+    return result
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stub", action="store_true", help="offline: fake faster-whisper from benchmarks/stub_model")
+    parser.add_argument("--model", default="tiny", help="WHISPER_MODEL for the started server")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="server environment override")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-run limit for becoming ready")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON; exit 1 on regression")
+    parser.add_argument("--save-baseline", help="write results JSON as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before a regression")
+    args = parser.parse_args()
+
+    overrides = dict(item.split("=", 1) for item in args.env)
+    overrides.setdefault("WHISPER_MODEL", args.model)
+    runs = []
+    for index in range(args.repeat):
+        workdir = tempfile.mkdtemp(prefix="meeting-startup-")
+        try:
+            env = _environment(overrides, args.stub, workdir)
+            run = {"import_seconds": round(measure_import(env), 3)}
+            run.update(measure_start(env, args.timeout))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        runs.append(run)
+        steps = ", ".join(f"{s['name']}={s.get('seconds')}s {s['status']}" for s in run["steps"])
+        print(
+            f"run {index + 1}: import={run['import_seconds']}s live={run['live_seconds']}s "
+            f"ready={run['ready_seconds']}s [{steps}]",
+            flush=True,
+        )
+
+    summary = {metric: _median([r[metric] for r in runs]) for metric in COMPARED}
+    print("\nmedian: " + " ".join(f"{k}={v}" for k, v in summary.items()))
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "stub": bool(args.stub),
+            "env": overrides,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "summary": summary,
+        "runs": runs,
+    }
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
+                fh.write("\n")
+            print(f"wrote {path}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh).get("summary", {})
+        regressions = []
+        print(f"\ncompared with baseline (tolerance {args.tolerance:.0%}):")
+        for metric in COMPARED:
+            old, new = baseline.get(metric), summary.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            # Sub-50 ms jitter is not a regression.
+            worse = change > args.tolerance and new - old > 0.05
+            print(f"  {metric:<16} {old:>8.3f} -> {new:>8.3f} {change:+7.1%} {'REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append(metric)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Stand-in for ``faster_whisper`` used by ``benchmarks/transcription.py --stub``.
+
+It decodes nothing: every call sleeps ``BENCH_STUB_RTF`` seconds per second of
+audio (one segment per ``BENCH_STUB_SEGMENT_SECONDS``) and returns placeholder
+text. Like CTranslate2, a model decodes at most ``num_workers`` segments at
+once and further calls wait for a free worker. That keeps the server's own
+costs (upload, queueing, preprocessing, streaming, diarization hand-off)
+measurable on machines without model weights or network access. ``BENCH_STUB_IMPORT_SECONDS`` and
+``BENCH_STUB_LOAD_SECONDS`` stand in for the real import and model load
+times in ``benchmarks/startup.py``. Only put this directory on
+``PYTHONPATH`` for benchmarks.
+"""
+
+import os
+import threading
+import time
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+
+_RTF = float(os.getenv("BENCH_STUB_RTF", "0.05"))
+_SEGMENT_SECONDS = float(os.getenv("BENCH_STUB_SEGMENT_SECONDS", "5"))
+_LOAD_SECONDS = float(os.getenv("BENCH_STUB_LOAD_SECONDS", "0"))
+_SAMPLE_RATE = 16000
+
+time.sleep(float(os.getenv("BENCH_STUB_IMPORT_SECONDS", "0")))
+
+
+def available_models():
+    return ["tiny", "base", "small", "medium", "large-v1", "large-v2", "large-v3"]
+
+
+def download_model(name, local_files_only=False, **kwargs):
+    raise RuntimeError("stub model has no weights")
+
+
+def decode_audio(path, sampling_rate=_SAMPLE_RATE, **kwargs):
+    with wave.open(path, "rb") as wav:
+        frames = wav.readframes(wav.getnframes())
+        channels = wav.getnchannels()
+    audio = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return audio
+
+
+def _duration(audio) -> float:
+    if isinstance(audio, np.ndarray):
+        return len(audio) / _SAMPLE_RATE
+    try:
+        with wave.open(audio, "rb") as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except Exception:
+        return 0.0
+
+
+def _segments(workers, spans, cost=1.0, word_timestamps=False):
+    for index, (start, end) in enumerate(spans):
+        with workers:
+            time.sleep((end - start) * _RTF * cost)
+        words = None
+        if word_timestamps:
+            middle = (start + end) / 2
+            words = [
+                SimpleNamespace(start=start, end=middle, word=" segment", probability=0.9),
+                SimpleNamespace(start=middle, end=end, word=f" {index}", probability=0.8),
+            ]
+        yield SimpleNamespace(start=start, end=end, text=f" segment {index}", words=words)
+
+
+class WhisperModel:
+    def __init__(self, model_size_or_path, **kwargs):
+        time.sleep(_LOAD_SECONDS)
+        self.name = model_size_or_path
+        self.workers = threading.BoundedSemaphore(max(1, int(kwargs.get("num_workers", 1))))
+
+    def transcribe(self, audio, language=None, word_timestamps=False, **kwargs):
+        duration = _duration(audio)
+        spans = []
+        start = 0.0
+        while start < duration:
+            spans.append((start, min(duration, start + _SEGMENT_SECONDS)))
+            start += _SEGMENT_SECONDS
+        info = SimpleNamespace(language=language or "th", duration=duration)
+        return _segments(self.workers, spans, word_timestamps=word_timestamps), info
+
+
+class BatchedInferencePipeline:
+    def __init__(self, model, **kwargs):
+        self.model = model
+
+    def transcribe(
+        self, audio, language=None, clip_timestamps=None, batch_size=8, word_timestamps=False, **kwargs
+    ):
+        duration = _duration(audio)
+        clips = clip_timestamps or [{"start": 0.0, "end": duration}]
+        spans = [(float(c["start"]), float(c["end"])) for c in clips]
+        info = SimpleNamespace(language=language or "th", duration=duration)
+        # A batch decodes its clips together, so the simulated cost is shared.
+        cost = 1.0 / max(1, min(batch_size, len(spans)))
+        return _segments(self.model.workers, spans, cost, word_timestamps), info
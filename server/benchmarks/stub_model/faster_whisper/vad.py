@@ -0,0 +1,32 @@
+"""Energy-based stand-in for ``faster_whisper.vad`` (see the package docstring)."""
+
+import numpy as np
+
+_SAMPLE_RATE = 16000
+
+
+class VadOptions:
+    def __init__(self, min_silence_duration_ms=2000, max_speech_duration_s=float("inf"), **kwargs):
+        self.min_silence_duration_ms = min_silence_duration_ms
+        self.max_speech_duration_s = max_speech_duration_s
+        self.__dict__.update(kwargs)
+
+
+def get_speech_timestamps(audio, vad_options=None, sampling_rate=_SAMPLE_RATE, **kwargs):
+    options = vad_options or VadOptions(**kwargs)
+    frame = sampling_rate * 30 // 1000
+    frames = len(audio) // frame
+    if frames == 0:
+        return []
+    energy = np.sqrt(np.mean(np.square(audio[: frames * frame].reshape(frames, frame)), axis=1))
+    voiced = energy > max(1e-3, 0.1 * float(energy.max()))
+    gap = max(1, int(options.min_silence_duration_ms / 30))
+    longest = options.max_speech_duration_s * sampling_rate
+    spans = []
+    for index in np.flatnonzero(voiced):
+        start, end = index * frame, (index + 1) * frame
+        if spans and index - spans[-1][1] // frame <= gap and end - spans[-1][0] <= longest:
+            spans[-1][1] = end
+        else:
+            spans.append([start, end])
+    return [{"start": int(s), "end": int(e)} for s, e in spans]
@@ -0,0 +1,104 @@
+"""Benchmark: extractive /summarize on a long synthetic meeting transcript.
+
+Builds Whisper-like segments (Thai, English or mixed sentences drawn from a
+small meeting vocabulary, alternating speakers) and times the summarizer
+end to end: sentence split, TF-IDF, TextRank and section assignment.
+
+    python benchmarks/summarizer.py --hours 3 --lang th
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import summarizer  # noqa: E402
+
+_TH = {
+    "topics": ["ระบบฐานข้อมูล", "งบประมาณ", "แอปมือถือ", "การตลาด", "ลูกค้ารายใหญ่", "เซิร์ฟเวอร์", "สัญญาจ้าง"],
+    "templates": [
+        "ตอนนี้{t}ยังมีปัญหาเรื่องความล่าช้าอยู่",
+        "ผมคิดว่า{t}ควรปรับแผนใหม่ให้ทันไตรมาสหน้า",
+        "สรุปว่าเราตกลงเลือกใช้แนวทางใหม่สำหรับ{t}",
+        "ฝากช่วยเตรียมเอกสารเรื่อง{t}ภายในวันศุกร์",
+        "เรื่อง{t}ยังไม่แน่ใจว่าใครจะรับผิดชอบ",
+        "ครับ",
+        "ค่ะ เข้าใจแล้ว",
+        "ตัวเลขของ{t}เดือนที่แล้วดีขึ้นกว่าที่คาดไว้",
+    ],
+}
+_EN = {
+    "topics": ["the database", "the budget", "the mobile app", "marketing", "the key account", "the servers"],
+    "templates": [
+        "We are still seeing delays on {t}.",
+        "I think {t} plan needs to change before next quarter.",
+        "We agreed to go with the new approach for {t}.",
+        "Please prepare the {t} document by Friday.",
+        "It is unclear who owns {t} right now?",
+        "Okay.",
+        "Right, makes sense.",
+        "Last month the numbers for {t} were better than expected.",
+    ],
+}
+
+
+def _synthetic_segments(hours: float, speakers: int, lang: str, seed: int):
+    rng = random.Random(seed)
+    total = hours * 3600.0
+    segments = []
+    t = 0.0
+    speaker = 0
+    while t < total:
+        source = _TH if lang == "th" or (lang == "mixed" and rng.random() < 0.5) else _EN
+        text = rng.choice(source["templates"]).format(t=rng.choice(source["topics"]))
+        length = rng.uniform(1.5, 8.0)
+        if rng.random() < 0.3:
+            speaker = rng.randrange(speakers)
+        segments.append(
+            {"start": t, "end": min(total, t + length), "text": text, "speaker": f"SPEAKER_{speaker:02d}"}
+        )
+        t += length + rng.uniform(0.0, 0.6)
+    return segments
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=3.0)
+    parser.add_argument("--speakers", type=int, default=5)
+    parser.add_argument("--lang", choices=("th", "en", "mixed"), default="th")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--text", action="store_true", help="pass a 'SPEAKER: text' transcript instead of segments"
+    )
+    args = parser.parse_args()
+
+    segments = _synthetic_segments(args.hours, args.speakers, args.lang, args.seed)
+    transcript = "\n".join(f"{s['speaker']}: {s['text']}" for s in segments)
+    print(f"segments={len(segments)} chars={len(transcript)} lang={args.lang}")
+
+    def run():
+        if args.text:
+            return summarizer.summarize(transcript=transcript)
+        return summarizer.summarize(segments=segments)
+
+    best = float("inf")
+    result = None
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - started)
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print(f"units      : {result['units']}")
+    print(f"summarize  : {best * 1000:9.2f} ms (best of {args.repeat})")
+    print(f"peak RSS   : {rss_mb:9.1f} MiB")
+    for section in result["sections"]:
+        print(f"  {section['kind']:<10} {len(section['items'])} items")
+
+
+if __name__ == "__main__":
+    main()
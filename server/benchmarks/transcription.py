@@ -0,0 +1,461 @@
+"""Benchmark: transcription throughput, latency and memory per endpoint.
+
+Starts the server (or targets ``--url``), sends synthetic speech-like WAVs of
+``--seconds`` length to ``/transcribe``, ``/transcribe_stream`` and
+``/transcribe_stream_upload`` at each ``--concurrency`` level, and reports
+per level: real-time factor, p50/p95/p99 latency, time to first ``progress``
+event, queue wait, throughput and the server's peak RSS. Every request gets
+unique audio so the transcript cache never answers for the model.
+
+``--stub`` runs offline against ``benchmarks/stub_model`` (a fake
+faster-whisper that sleeps ``BENCH_STUB_RTF`` per audio second); otherwise
+use a small cached model such as ``--model tiny``. Server settings under test
+go through ``--env`` (``WHISPER_COMPUTE``, ``WHISPER_CPU_THREADS``,
+``WHISPER_NUM_WORKERS``, ``TRANSCRIBE_CONCURRENCY``, ``WHISPER_BATCHING``...).
+``--upload-kbps`` throttles uploads like a slow uplink; with ``--pipelined``
+``/transcribe_stream_upload`` decodes while the upload is still arriving, and
+``tail`` (last byte to ``done``) shows what that saves.
+
+    python benchmarks/transcription.py --stub --seconds 30,120 --concurrency 1,4
+    python benchmarks/transcription.py --model tiny --save-baseline baseline.json
+    python benchmarks/transcription.py --model tiny --env TRANSCRIBE_CONCURRENCY=2 \\
+        --baseline baseline.json
+    python benchmarks/transcription.py --stub --seconds 600 --concurrency 1 \\
+        --endpoints transcribe_stream_upload --upload-kbps 2000 --pipelined
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_DIR = os.path.join(SERVER_DIR, "benchmarks", "stub_model")
+ENDPOINTS = ("transcribe", "transcribe_stream", "transcribe_stream_upload")
+SAMPLE_RATE = 16000
+
+# metric -> True when a larger value is worse
+COMPARED = {
+    "latency_p50": True,
+    "latency_p95": True,
+    "rtf_p50": True,
+    "first_progress_p50": True,
+    "queue_wait_p95": True,
+    "throughput_x": False,
+    "peak_rss_mb": True,
+}
+
+
+def synthetic_wav(seconds: float, seed: int) -> bytes:
+    """Voiced bursts (harmonics under a syllable-rate envelope) and pauses."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLE_RATE)
+    audio = rng.normal(0.0, 0.003, total).astype(np.float32)
+    t = 0
+    while t < total:
+        burst = int(rng.uniform(0.4, 3.0) * SAMPLE_RATE)
+        n = min(burst, total - t)
+        time_axis = np.arange(n) / SAMPLE_RATE
+        pitch = rng.uniform(90.0, 240.0)
+        voice = sum(np.sin(2 * np.pi * pitch * k * time_axis) / k for k in range(1, 6))
+        envelope = 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(3.0, 6.0) * time_axis))
+        audio[t : t + n] += (0.2 * voice * envelope).astype(np.float32)
+        t += n + int(rng.uniform(0.15, 1.0) * SAMPLE_RATE)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+class Server:
+    """``python main.py`` in a subprocess on a free port, with its own caches.
+
+    Ready once ``/readyz`` answers 200, so the configured model is loaded.
+    """
+
+    def __init__(self, env: Dict[str, str], stub: bool, timeout: float):
+        self.workdir = tempfile.mkdtemp(prefix="meeting-bench-")
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        full_env = dict(os.environ)
+        full_env.update(
+            {
+                "HOST": "127.0.0.1",
+                "PORT": str(self.port),
+                "JOBS_DIR": os.path.join(self.workdir, "jobs"),
+                "TRANSCRIPT_CACHE_DIR": os.path.join(self.workdir, "transcripts"),
+                "TRANSCRIPT_CACHE_MAX_MB": "0",
+            }
+        )
+        full_env.update(env)
+        if stub:
+            full_env["PYTHONPATH"] = os.pathsep.join(
+                p for p in (STUB_DIR, full_env.get("PYTHONPATH")) if p
+            )
+        self.log_path = os.path.join(self.workdir, "server.log")
+        self._log = open(self.log_path, "wb")
+        started = time.perf_counter()
+        self.proc = subprocess.Popen(
+            [sys.executable, "main.py"], cwd=SERVER_DIR, env=full_env, stdout=self._log, stderr=subprocess.STDOUT
+        )
+        self.url = f"http://127.0.0.1:{self.port}"
+        while True:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"server exited with {self.proc.returncode}; see {self.log_path}")
+            try:
+                if _get_json(self.url, "/readyz", timeout=1.0) is not None:
+                    break
+            except OSError:
+                pass
+            if time.perf_counter() - started > timeout:
+                self.close()
+                raise RuntimeError(f"server not ready after {timeout:.0f}s; see {self.log_path}")
+            time.sleep(0.2)
+        self.startup_seconds = time.perf_counter() - started
+
+    def peak_rss_mb(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.proc.pid}/status") as fh:
+                for line in fh:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024.0
+        except OSError:
+            pass
+        return None
+
+    def close(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self._log.close()
+
+
+def _connection(url: str, timeout: float) -> http.client.HTTPConnection:
+    parsed = urlparse(url)
+    cls = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+    return cls(parsed.hostname, parsed.port, timeout=timeout)
+
+
+def _get_json(url: str, path: str, timeout: float = 10.0):
+    conn = _connection(url, timeout)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return json.loads(response.read()) if response.status == 200 else None
+    finally:
+        conn.close()
+
+
+def _multipart(fields: Dict[str, str], audio: bytes):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="bench.wav"\r\n'
+        f"Content-Type: audio/wav\r\n\r\n".encode()
+    )
+    parts.append(audio)
+    parts.append(f"\r\n--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def _throttled(body: bytes, kbps: float):
+    step = 64 * 1024
+    for i in range(0, len(body), step):
+        yield body[i : i + step]
+        time.sleep(step / (kbps * 1024))
+
+
+def run_request(
+    url: str, endpoint: str, audio: bytes, fields: Dict[str, str], timeout: float, upload_kbps: float = 0.0
+) -> Dict[str, object]:
+    """One request; latency runs from sending the upload to the final result."""
+    conn = _connection(url, timeout)
+    headers = {"X-Client-Id": f"bench-{uuid.uuid4().hex[:8]}"}
+    if endpoint == "transcribe_stream_upload":
+        path = f"/{endpoint}?{urlencode(fields)}"
+        body = audio
+        headers["Content-Type"] = "application/octet-stream"
+    else:
+        path = f"/{endpoint}"
+        body, headers["Content-Type"] = _multipart(fields, audio)
+    if upload_kbps > 0:
+        headers["Content-Length"] = str(len(body))
+        body = _throttled(body, upload_kbps)
+    sample = {"ok": False, "first_progress": None, "queue_wait": None, "status": None, "tail": None}
+    started = time.perf_counter()
+    try:
+        conn.request("POST", path, body=body, headers=headers)
+        response = conn.getresponse()
+        sample["status"] = response.status
+        if response.status != 200:
+            response.read()
+            return sample
+        if endpoint == "transcribe":
+            result = json.loads(response.read())
+        else:
+            result = None
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                event = json.loads(line)
+                kind = event.get("event")
+                if kind == "progress" and sample["first_progress"] is None:
+                    sample["first_progress"] = time.perf_counter() - started
+                elif kind == "done":
+                    result = event
+                elif kind in ("error", "cancelled"):
+                    break
+        if result is not None:
+            sample["ok"] = True
+            sample["queue_wait"] = (result.get("queue") or {}).get("wait_seconds")
+            sample["quality"] = result.get("quality")
+            sample["tail"] = (result.get("upload") or {}).get("tail_seconds")
+    except (OSError, http.client.HTTPException, ValueError) as exc:
+        sample["error"] = f"{type(exc).__name__}: {exc}"
+    finally:
+        sample["latency"] = time.perf_counter() - started
+        conn.close()
+    return sample
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 4) if values else None
+
+
+def run_level(
+    url: str,
+    endpoint: str,
+    seconds: float,
+    concurrency: int,
+    requests: int,
+    fields,
+    timeout: float,
+    seed: int,
+    upload_kbps: float = 0.0,
+) -> Dict[str, object]:
+    audios = [synthetic_wav(seconds, seed + i) for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = list(
+            pool.map(lambda a: run_request(url, endpoint, a, fields, timeout, upload_kbps), audios)
+        )
+    wall = time.perf_counter() - started
+    ok = [s for s in samples if s["ok"]]
+    latency = [s["latency"] for s in ok]
+    progress = [s["first_progress"] for s in ok if s["first_progress"] is not None]
+    waits = [s["queue_wait"] for s in ok if s["queue_wait"] is not None]
+    tails = [s["tail"] for s in ok if s["tail"] is not None]
+    return {
+        "endpoint": endpoint,
+        "seconds": seconds,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(samples) - len(ok),
+        "statuses": sorted({s["status"] for s in samples if s["status"] not in (None, 200)}),
+        "latency_p50": _percentile(latency, 50),
+        "latency_p95": _percentile(latency, 95),
+        "latency_p99": _percentile(latency, 99),
+        "rtf_p50": _percentile([x / seconds for x in latency], 50),
+        "rtf_p95": _percentile([x / seconds for x in latency], 95),
+        "first_progress_p50": _percentile(progress, 50),
+        "first_progress_p95": _percentile(progress, 95),
+        "queue_wait_p50": _percentile(waits, 50),
+        "queue_wait_p95": _percentile(waits, 95),
+        "upload_tail_p50": _percentile(tails, 50),
+        "throughput_x": round(len(ok) * seconds / wall, 3) if wall > 0 else None,
+        "qualities": sorted({str(s.get("quality")) for s in ok}),
+        "wall_seconds": round(wall, 3),
+    }
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object], tolerance: float) -> List[str]:
+    """Print deltas against ``baseline``; return the metrics that regressed."""
+    index = {
+        (r["endpoint"], r["seconds"], r["concurrency"]): r for r in baseline.get("results", [])
+    }
+    regressions = []
+    print(f"\ncompared with baseline (tolerance {tolerance:.0%}):")
+    for result in current["results"]:
+        key = (result["endpoint"], result["seconds"], result["concurrency"])
+        base = index.get(key)
+        if base is None:
+            print(f"  {key}: no baseline entry")
+            continue
+        for metric, higher_is_worse in COMPARED.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if higher_is_worse else change < -tolerance
+            # Sub-50 ms jitter on near-zero timings is not a regression.
+            worse = worse and abs(new - old) > 0.05
+            flag = "REGRESSION" if worse else ""
+            print(f"  {key[0]:<26} {key[1]:>6.0f}s c={key[2]:<3} {metric:<20} {old:>10.3f} -> {new:>10.3f} {change:+7.1%} {flag}")
+            if worse:
+                regressions.append(f"{key} {metric}")
+    return regressions
+
+
+_TABLE = (
+    ("endpoint", "endpoint", 26),
+    ("seconds", "sec", 6),
+    ("concurrency", "conc", 4),
+    ("errors", "err", 4),
+    ("rtf_p50", "rtf", 7),
+    ("latency_p50", "p50", 8),
+    ("latency_p95", "p95", 8),
+    ("latency_p99", "p99", 8),
+    ("first_progress_p50", "first", 7),
+    ("queue_wait_p95", "wait95", 7),
+    ("upload_tail_p50", "tail", 7),
+    ("throughput_x", "thru_x", 7),
+    ("peak_rss_mb", "rss_mb", 7),
+)
+
+
+def _print_table(results: List[Dict[str, object]]) -> None:
+    print(" ".join(title.rjust(width) if i else title.ljust(width) for i, (_, title, width) in enumerate(_TABLE)))
+    for result in results:
+        cells = []
+        for i, (name, _, width) in enumerate(_TABLE):
+            value = result.get(name)
+            text = "-" if value is None else f"{value:.2f}" if isinstance(value, float) else str(value)
+            cells.append(text.rjust(width) if i else text.ljust(width))
+        print(" ".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--stub", action="store_true", help="offline: fake faster-whisper from benchmarks/stub_model")
+    parser.add_argument("--model", default="tiny", help="WHISPER_MODEL for the started server")
+    parser.add_argument("--quality", default="balanced")
+    parser.add_argument("--language", default="th")
+    parser.add_argument("--seconds", default="30", help="comma-separated audio lengths")
+    parser.add_argument("--concurrency", default="1,2,4", help="comma-separated client concurrency levels")
+    parser.add_argument("--requests", type=int, default=0, help="requests per level (default 2x concurrency)")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="server environment override")
+    parser.add_argument("--upload-kbps", type=float, default=0.0, help="throttle uploads (KiB/s, 0 = unthrottled)")
+    parser.add_argument(
+        "--pipelined", action="store_true", help="pipelined=true for /transcribe_stream_upload"
+    )
+    parser.add_argument("--timeout", type=float, default=1800.0, help="per-request timeout")
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON; exit 1 on regression")
+    parser.add_argument("--save-baseline", help="write results JSON as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before a regression")
+    args = parser.parse_args()
+
+    env = dict(item.split("=", 1) for item in args.env)
+    env.setdefault("WHISPER_MODEL", args.model)
+    endpoints = [e.strip().lstrip("/") for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {sorted(unknown)}")
+    lengths = [float(x) for x in args.seconds.split(",")]
+    levels = [int(x) for x in args.concurrency.split(",")]
+    fields = {"language": args.language, "quality": args.quality, "model_size": env["WHISPER_MODEL"]}
+
+    server = None if args.url else Server(env, args.stub, args.startup_timeout)
+    url = args.url or server.url
+    try:
+        health = _get_json(url, "/healthz") or {}
+        # Warm-up: model load and first-call costs stay out of the numbers.
+        run_request(url, "transcribe", synthetic_wav(5.0, args.seed - 1), fields, args.timeout)
+        results = []
+        seed = args.seed
+        for seconds in lengths:
+            for endpoint in endpoints:
+                for concurrency in levels:
+                    requests = args.requests or 2 * concurrency
+                    level_fields = dict(fields)
+                    if args.pipelined and endpoint == "transcribe_stream_upload":
+                        level_fields["pipelined"] = "true"
+                    result = run_level(
+                        url, endpoint, seconds, concurrency, requests, level_fields, args.timeout, seed,
+                        args.upload_kbps,
+                    )
+                    seed += requests
+                    rss = server.peak_rss_mb() if server is not None else None
+                    result["peak_rss_mb"] = round(rss, 1) if rss is not None else None
+                    results.append(result)
+                    print(
+                        f"{endpoint:<26} {seconds:>6.0f}s c={concurrency:<3} p95={result['latency_p95']}s "
+                        f"rtf={result['rtf_p50']} errors={result['errors']}",
+                        flush=True,
+                    )
+    finally:
+        if server is not None:
+            server.close()
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "stub": bool(args.stub),
+            "url": args.url,
+            "env": env,
+            "quality": args.quality,
+            "language": args.language,
+            "seed": args.seed,
+            "upload_kbps": args.upload_kbps,
+            "pipelined": args.pipelined,
+            "startup_seconds": round(server.startup_seconds, 2) if server else None,
+            "server": {
+                k: health.get(k)
+                for k in ("default_model", "compute", "cpu_threads", "num_workers", "max_concurrency", "mode")
+            },
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    print()
+    _print_table(results)
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
+                fh.write("\n")
+            print(f"wrote {path}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
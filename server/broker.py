@@ -0,0 +1,270 @@
+"""Job broker shared by the API front-end and transcription workers.
+
+In ``DEPLOY_MODE=api`` the server only accepts uploads and submits jobs here;
+``DEPLOY_MODE=worker`` processes claim them, run the normal pipeline and
+publish the resulting NDJSON events back for the API to relay.
+
+:class:`SqliteBroker` is the built-in backend: one SQLite file on a volume
+every node can reach (the same host, or a shared mount), which is also what
+tests use. Any other backend only has to provide the same methods.
+All methods are blocking; callers run them off the event loop.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Events after which a job produces nothing more.
+FINAL_EVENTS = ("done", "error", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS broker_jobs (
+    id TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    claimed_at REAL,
+    cancelled INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS broker_jobs_status ON broker_jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS broker_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE TABLE IF NOT EXISTS broker_workers (
+    id TEXT PRIMARY KEY,
+    models TEXT NOT NULL,
+    slots INTEGER NOT NULL,
+    busy INTEGER NOT NULL,
+    seen_at REAL NOT NULL
+);
+"""
+
+
+class SqliteBroker:
+    def __init__(self, path: str, worker_ttl: float = 30.0, cold_claim_after: float = 10.0):
+        self.path = path
+        self.worker_ttl = worker_ttl
+        # A pending job whose model no live worker has loaded is taken by any
+        # worker at once; otherwise cold workers leave it to warm ones for
+        # this many seconds.
+        self.cold_claim_after = cold_claim_after
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30.0
+        )
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    # -- API side ---------------------------------------------------------
+
+    def submit(self, job_id: str, model: str, payload: Dict[str, object]) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO broker_jobs (id, model, payload, status, created_at)"
+                " VALUES (?, ?, ?, 'pending', ?)",
+                (job_id, model, json.dumps(payload), time.time()),
+            )
+
+    def events(self, job_id: str, since: int = 0) -> List[Tuple[int, Dict[str, object]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, payload FROM broker_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, since),
+            ).fetchall()
+        return [(row["seq"], json.loads(row["payload"])) for row in rows]
+
+    def cancel(self, job_id: str) -> None:
+        """Flag a job as cancelled; a pending job is never handed out."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE broker_jobs SET cancelled = 1,"
+                " status = CASE status WHEN 'pending' THEN 'cancelled' ELSE status END"
+                " WHERE id = ?",
+                (job_id,),
+            )
+
+    def forget(self, job_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM broker_events WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM broker_jobs WHERE id = ?", (job_id,))
+
+    # -- worker side ------------------------------------------------------
+
+    def heartbeat(self, worker_id: str, models: Iterable[str], slots: int, busy: int) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO broker_workers (id, models, slots, busy, seen_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET models = excluded.models, slots = excluded.slots,"
+                " busy = excluded.busy, seen_at = excluded.seen_at",
+                (worker_id, json.dumps(sorted(models)), slots, busy, time.time()),
+            )
+
+    def leave(self, worker_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM broker_workers WHERE id = ?", (worker_id,))
+            self._requeue(conn, [worker_id])
+
+    def claim(self, worker_id: str, loaded_models: Iterable[str]) -> Optional[Dict[str, object]]:
+        """Take the next job for this worker, preferring models it has loaded."""
+        loaded = set(loaded_models)
+        now = time.time()
+        with self._transaction() as conn:
+            live = self._live_workers(conn, now)
+            dead = [
+                row["id"]
+                for row in conn.execute("SELECT id FROM broker_workers").fetchall()
+                if row["id"] not in live
+            ]
+            if dead:
+                conn.execute(
+                    f"DELETE FROM broker_workers WHERE id IN ({','.join('?' for _ in dead)})",
+                    dead,
+                )
+                self._requeue(conn, dead)
+            warm_elsewhere = {
+                model for wid, models in live.items() if wid != worker_id for model in models
+            }
+            pending = conn.execute(
+                "SELECT id, model, payload, created_at FROM broker_jobs"
+                " WHERE status = 'pending' ORDER BY created_at"
+            ).fetchall()
+            chosen = next((row for row in pending if row["model"] in loaded), None)
+            if chosen is None:
+                chosen = next(
+                    (
+                        row
+                        for row in pending
+                        if row["model"] not in warm_elsewhere
+                        or now - row["created_at"] >= self.cold_claim_after
+                    ),
+                    None,
+                )
+            if chosen is None:
+                return None
+            conn.execute(
+                "UPDATE broker_jobs SET status = 'claimed', worker = ?, claimed_at = ? WHERE id = ?",
+                (worker_id, now, chosen["id"]),
+            )
+        return {"id": chosen["id"], "model": chosen["model"], **json.loads(chosen["payload"])}
+
+    def publish(self, job_id: str, event: Dict[str, object]) -> int:
+        with self._transaction() as conn:
+            (last,) = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM broker_events WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            conn.execute(
+                "INSERT INTO broker_events (job_id, seq, payload) VALUES (?, ?, ?)",
+                (job_id, last + 1, json.dumps(event)),
+            )
+            if event.get("event") in FINAL_EVENTS:
+                conn.execute("UPDATE broker_jobs SET status = 'finished' WHERE id = ?", (job_id,))
+        return last + 1
+
+    def is_cancelled(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cancelled FROM broker_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        # A job the API already forgot has nobody waiting for it either.
+        return row is None or bool(row["cancelled"])
+
+    # -- introspection ----------------------------------------------------
+
+    def workers(self) -> List[Dict[str, object]]:
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM broker_workers ORDER BY id").fetchall()
+        return [
+            {
+                "id": row["id"],
+                "models": json.loads(row["models"]),
+                "slots": row["slots"],
+                "busy": row["busy"],
+                "seen_seconds_ago": round(now - row["seen_at"], 1),
+            }
+            for row in rows
+            if now - row["seen_at"] <= self.worker_ttl
+        ]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM broker_jobs GROUP BY status"
+            ).fetchall()
+        return {"jobs": {row["status"]: row["n"] for row in rows}, "workers": self.workers()}
+
+    # -- helpers ----------------------------------------------------------
+
+    def _live_workers(self, conn, now: float) -> Dict[str, List[str]]:
+        rows = conn.execute("SELECT id, models, seen_at FROM broker_workers").fetchall()
+        return {
+            row["id"]: json.loads(row["models"])
+            for row in rows
+            if now - row["seen_at"] <= self.worker_ttl
+        }
+
+    @staticmethod
+    def _requeue(conn, worker_ids: List[str]) -> None:
+        # Jobs of a worker that stopped heartbeating start over elsewhere.
+        placeholders = ",".join("?" for _ in worker_ids)
+        rows = conn.execute(
+            f"SELECT id FROM broker_jobs WHERE status = 'claimed' AND worker IN ({placeholders})",
+            worker_ids,
+        ).fetchall()
+        for row in rows:
+            conn.execute(
+                "UPDATE broker_jobs SET status = 'pending', worker = NULL, claimed_at = NULL"
+                " WHERE id = ?",
+                (row["id"],),
+            )
+            (last,) = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM broker_events WHERE job_id = ?", (row["id"],)
+            ).fetchone()
+            conn.execute(
+                "INSERT INTO broker_events (job_id, seq, payload) VALUES (?, ?, ?)",
+                (row["id"], last + 1, json.dumps({"event": "requeued"})),
+            )
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._lock.acquire()
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self._lock.release()
+            raise
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._lock.release()
+
+
+def make_broker(url: str, **options) -> SqliteBroker:
+    """Build a broker from ``BROKER_URL`` (``sqlite:///path/to/broker.sqlite3``)."""
+    if url.startswith("sqlite:///"):
+        return SqliteBroker(url[len("sqlite:///"):], **options)
+    if "://" not in url:
+        return SqliteBroker(url, **options)
+    raise ValueError(f"unsupported BROKER_URL scheme: {url.split('://', 1)[0]}")
@@ -0,0 +1,291 @@
+"""Built-in CPU speaker diarization: no torch, no model download, no token.
+
+Speech regions (from the caller's VAD, or a log-energy detector) are covered
+with overlapping windows, each embedded as the mean and standard deviation
+of its MFCCs. Spectral clustering on a pruned cosine-affinity graph picks the
+speakers; their number is the largest eigengap of the normalized Laplacian,
+so there is no distance threshold to tune per microphone. Every window takes
+the label of the nearest speaker centroid, isolated flips are smoothed away
+and runs of one label become turns.
+
+Turns have the ``{"start", "end", "speaker"}`` shape of the pyannote path in
+``main._run_diarization``; speakers are named ``SPEAKER_00``, ``SPEAKER_01``...
+in order of first appearance.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.cluster.vq import kmeans2
+from scipy.fft import dct, rfft
+
+SAMPLE_RATE = 16000
+FRAME = 400  # 25 ms
+HOP = 160  # 10 ms
+N_FFT = 512
+N_MELS = 40
+N_MFCC = 20
+BLOCK_FRAMES = 6000  # one minute of frames per FFT batch
+WINDOW_FRAMES = 150  # 1.5 s embedding windows...
+STEP_FRAMES = 75  # ...every 0.75 s
+MIN_REGION_FRAMES = 30  # regions shorter than 0.3 s are labelled, not embedded
+
+MAX_SPEAKERS = 8
+NEIGHBOURS = 0.05  # share of windows each window keeps as graph neighbours...
+MIN_NEIGHBOURS = 15  # ...but never fewer, or a short recording's graph falls apart
+MIN_CLUSTER_SHARE = 0.02  # smaller clusters are folded into the nearest speaker
+
+
+class Cancelled(Exception):
+    pass
+
+
+def _mel_filterbank(sample_rate: int) -> np.ndarray:
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+
+    edges = mel_to_hz(np.linspace(hz_to_mel(20.0), hz_to_mel(min(7600.0, sample_rate / 2)), N_MELS + 2))
+    bins = np.fft.rfftfreq(N_FFT, 1.0 / sample_rate)
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (centre - lower)
+    falling = (upper - bins) / (upper - centre)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+_FILTERBANK = _mel_filterbank(SAMPLE_RATE)
+_WINDOW = np.hamming(FRAME).astype(np.float32)
+
+
+def _frames(audio: np.ndarray) -> np.ndarray:
+    if len(audio) < FRAME:
+        audio = np.pad(audio, (0, FRAME - len(audio)))
+    return np.lib.stride_tricks.sliding_window_view(audio, FRAME)[::HOP]
+
+
+def mfcc(audio: np.ndarray, should_stop: Optional[Callable[[], bool]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """``(frames, N_MFCC)`` cepstra (c1..c20, no energy term) and per-frame log energy."""
+    audio = np.asarray(audio, dtype=np.float32)
+    emphasized = np.empty_like(audio)
+    emphasized[0:1] = audio[0:1]
+    emphasized[1:] = audio[1:] - 0.97 * audio[:-1]
+    frames = _frames(emphasized)
+    out = np.empty((len(frames), N_MFCC), dtype=np.float32)
+    energy = np.empty(len(frames), dtype=np.float32)
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        if should_stop is not None and should_stop():
+            raise Cancelled()
+        block = frames[start : start + BLOCK_FRAMES] * _WINDOW
+        power = np.abs(rfft(block, n=N_FFT, axis=1)) ** 2
+        log_mel = np.log(power.astype(np.float32) @ _FILTERBANK.T + 1e-8)
+        out[start : start + len(block)] = dct(log_mel, type=2, norm="ortho", axis=1)[:, 1 : N_MFCC + 1]
+        energy[start : start + len(block)] = np.log(power.sum(axis=1) + 1e-8)
+    return out, energy
+
+
+def energy_speech(energy: np.ndarray, min_frames: int = MIN_REGION_FRAMES, gap_frames: int = 30) -> List[tuple]:
+    """``(start, end)`` frame ranges whose log energy clears a noise-floor estimate.
+
+    Used when no VAD regions are passed in.
+    """
+    if not len(energy):
+        return []
+    floor, peak = np.percentile(energy, 10), np.percentile(energy, 95)
+    active = energy > floor + 0.35 * (peak - floor)
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], active.astype(np.int8), [0]])))
+    regions = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if regions and start - regions[-1][1] < gap_frames:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return [(int(s), int(e)) for s, e in regions if e - s >= min_frames]
+
+
+def _windows(regions: Sequence[tuple]):
+    """Window ``(starts, ends, region index)`` over every region long enough to embed."""
+    starts, ends, owners = [], [], []
+    for index, (start, end) in enumerate(regions):
+        if end - start < MIN_REGION_FRAMES:
+            continue
+        last = max(start, end - WINDOW_FRAMES)
+        window_starts = np.arange(start, last + 1, STEP_FRAMES)
+        if window_starts[-1] != last:
+            window_starts = np.append(window_starts, last)
+        starts.append(window_starts)
+        ends.append(np.minimum(window_starts + WINDOW_FRAMES, end))
+        owners.append(np.full(len(window_starts), index))
+    if not starts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    return np.concatenate(starts), np.concatenate(ends), np.concatenate(owners)
+
+
+def _embed(features: np.ndarray, speech_mask: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    voiced = features[speech_mask]
+    mean, std = voiced.mean(axis=0), voiced.std(axis=0) + 1e-6
+    normalized = (features - mean) / std
+    # Windowed first and second moments from prefix sums: O(1) per window.
+    first = np.concatenate([np.zeros((1, N_MFCC)), np.cumsum(normalized, axis=0, dtype=np.float64)])
+    second = np.concatenate([np.zeros((1, N_MFCC)), np.cumsum(normalized.astype(np.float64) ** 2, axis=0)])
+    count = (ends - starts)[:, None].astype(np.float64)
+    window_mean = (first[ends] - first[starts]) / count
+    window_var = np.maximum((second[ends] - second[starts]) / count - window_mean**2, 0.0)
+    stats = np.hstack([window_mean, np.sqrt(window_var)])
+    stats = (stats - stats.mean(axis=0)) / (stats.std(axis=0) + 1e-6)
+    norms = np.linalg.norm(stats, axis=1, keepdims=True)
+    return (stats / np.maximum(norms, 1e-9)).astype(np.float32)
+
+
+def _centroids(embeddings: np.ndarray, labels: np.ndarray, count: int) -> np.ndarray:
+    sums = np.zeros((count, embeddings.shape[1]), dtype=np.float64)
+    np.add.at(sums, labels, embeddings)
+    return sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-9)
+
+
+def _spectral(embeddings: np.ndarray, max_speakers: int, num_speakers: Optional[int], seed: int) -> np.ndarray:
+    n = len(embeddings)
+    affinity = embeddings @ embeddings.T
+    # Keep each row's strongest neighbours only: cross-speaker similarity
+    # from shared phonetic content becomes zero instead of a weak link.
+    keep = min(n - 1, max(MIN_NEIGHBOURS, int(NEIGHBOURS * n)))
+    nearest = np.argpartition(-affinity, keep, axis=1)[:, :keep]
+    pruned = np.zeros_like(affinity)
+    np.put_along_axis(pruned, nearest, np.maximum(np.take_along_axis(affinity, nearest, axis=1), 0.0), axis=1)
+    pruned = (pruned + pruned.T) / 2.0
+    np.fill_diagonal(pruned, 0.0)
+    scale = 1.0 / np.sqrt(np.maximum(pruned.sum(axis=1), 1e-9))
+    laplacian = np.eye(n) - scale[:, None] * pruned * scale[None, :]
+    limit = min(max_speakers, n - 1)
+    values, vectors = np.linalg.eigh(laplacian)
+    count = num_speakers or int(np.argmax(np.diff(values[: limit + 1]))) + 1
+    count = max(1, min(count, n))
+    if count == 1:
+        return np.zeros(n, dtype=np.int64)
+    spectral = vectors[:, :count]
+    spectral = spectral / np.maximum(np.linalg.norm(spectral, axis=1, keepdims=True), 1e-9)
+    _, labels = kmeans2(spectral, count, minit="++", seed=seed)
+    return labels.astype(np.int64)
+
+
+def cluster(
+    embeddings: np.ndarray,
+    max_speakers: int = MAX_SPEAKERS,
+    num_speakers: Optional[int] = None,
+    max_points: int = 1000,
+    seed: int = 0,
+) -> np.ndarray:
+    """Speaker index per embedding (0-based, unordered)."""
+    n = len(embeddings)
+    if n < 3:
+        return np.zeros(n, dtype=np.int64)
+    sample = embeddings
+    if n > max_points:
+        # An even stride keeps every part of the recording represented.
+        sample = embeddings[np.linspace(0, n - 1, max_points).astype(np.int64)]
+    labels = _spectral(sample, max_speakers, num_speakers, seed)
+    sizes = np.bincount(labels)
+    big = np.flatnonzero(sizes >= max(2, MIN_CLUSTER_SHARE * len(sample)))
+    if not len(big):
+        big = np.array([int(np.argmax(sizes))])
+    centroids = _centroids(sample, labels, len(sizes))[big]
+    # Two assignment passes over every window: nearest centroid, recentre, again.
+    for _ in range(2):
+        assigned = np.argmax(embeddings @ centroids.T, axis=1)
+        centroids = _centroids(embeddings, assigned, len(centroids))
+    return assigned
+
+
+def _smooth(labels: np.ndarray, owners: np.ndarray) -> np.ndarray:
+    """Drop one-window flips (A B A within one region) in place."""
+    if len(labels) < 3:
+        return labels
+    prev, cur, nxt = labels[:-2], labels[1:-1], labels[2:]
+    same_region = (owners[:-2] == owners[1:-1]) & (owners[1:-1] == owners[2:])
+    flip = same_region & (prev == nxt) & (cur != prev)
+    labels[1:-1][flip] = prev[flip]
+    return labels
+
+
+def diarize(
+    audio: np.ndarray,
+    speech: Optional[Sequence[Dict[str, int]]] = None,
+    *,
+    sample_rate: int = SAMPLE_RATE,
+    max_speakers: int = MAX_SPEAKERS,
+    num_speakers: Optional[int] = None,
+    merge_gap: float = 0.5,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> List[Dict[str, object]]:
+    """Speaker turns for 16 kHz mono float32 ``audio``.
+
+    ``speech`` takes VAD regions as ``{"start", "end"}`` sample offsets (the
+    shape faster-whisper's ``get_speech_timestamps`` returns); without it a
+    log-energy detector is used. ``should_stop`` is polled between stages and
+    FFT blocks and aborts with :class:`Cancelled`.
+    """
+    if sample_rate != SAMPLE_RATE:
+        raise ValueError(f"expected {SAMPLE_RATE} Hz audio, got {sample_rate}")
+    audio = np.asarray(audio, dtype=np.float32)
+    if len(audio) < FRAME:
+        return []
+    features, energy = mfcc(audio, should_stop)
+    total = len(features)
+    if speech is None:
+        regions = energy_speech(energy)
+    else:
+        regions = [
+            (int(r["start"]) // HOP, min(total, -(-int(r["end"]) // HOP))) for r in speech
+        ]
+        regions = [(s, e) for s, e in regions if e > s]
+    if not regions:
+        return []
+    speech_mask = np.zeros(total, dtype=bool)
+    for start, end in regions:
+        speech_mask[start:end] = True
+    starts, ends, owners = _windows(regions)
+    if not len(starts):
+        # Only very short bursts: one speaker is the best guess.
+        labels = np.zeros(0, dtype=np.int64)
+    else:
+        if should_stop is not None and should_stop():
+            raise Cancelled()
+        embeddings = _embed(features, speech_mask, starts, ends)
+        labels = _smooth(cluster(embeddings, max_speakers, num_speakers), owners)
+    centres = (starts + ends) / 2.0
+
+    # Frame labels: nearest window centre (any region, for unembedded bursts).
+    frame_labels = np.full(total, -1, dtype=np.int64)
+    speech_frames = np.flatnonzero(speech_mask)
+    if len(labels) > 1:
+        order = np.argsort(centres, kind="stable")
+        sorted_centres, sorted_labels = centres[order], labels[order]
+        right = np.clip(np.searchsorted(sorted_centres, speech_frames), 1, len(order) - 1)
+        left = right - 1
+        nearer_left = (speech_frames - sorted_centres[left]) <= (sorted_centres[right] - speech_frames)
+        frame_labels[speech_frames] = np.where(nearer_left, sorted_labels[left], sorted_labels[right])
+    else:
+        frame_labels[speech_frames] = labels[0] if len(labels) else 0
+
+    # Runs of one label become turns; same-speaker turns split by a short gap merge.
+    change = np.flatnonzero(np.diff(np.concatenate([[-1], frame_labels, [-1]])))
+    turns: List[List[float]] = []
+    names: Dict[int, str] = {}
+    seconds_per_frame = HOP / SAMPLE_RATE
+    for start, end in zip(change[:-1], change[1:]):
+        label = int(frame_labels[start])
+        if label < 0:
+            continue
+        name = names.setdefault(label, f"SPEAKER_{len(names):02d}")
+        t0, t1 = start * seconds_per_frame, end * seconds_per_frame
+        if turns and turns[-1][2] == name and t0 - turns[-1][1] <= merge_gap:
+            turns[-1][1] = t1
+        else:
+            turns.append([t0, t1, name])
+    duration = len(audio) / SAMPLE_RATE
+    return [
+        {"start": round(float(t0), 3), "end": round(float(min(t1, duration)), 3), "speaker": name}
+        for t0, t1, name in turns
+    ]
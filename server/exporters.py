@@ -0,0 +1,168 @@
+"""Streaming renderers for ``/export``: TXT, DOCX, SRT, WebVTT and JSON.
+
+Every renderer is a generator of ``bytes`` chunks of roughly
+``CHUNK_BYTES``, so a long meeting is written out as it is rendered instead
+of being assembled in memory first. DOCX is the exception: python-docx
+builds the document in memory and only its saved bytes are chunked.
+"""
+
+import io
+import json
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from docx import Document as _DocxDocument
+except ImportError:
+    _DocxDocument = None
+
+CHUNK_BYTES = 64 * 1024
+
+# format -> (media type, file extension)
+FORMATS = {
+    "txt": ("text/plain; charset=utf-8", "txt"),
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "docx"),
+    "srt": ("application/x-subrip; charset=utf-8", "srt"),
+    "vtt": ("text/vtt; charset=utf-8", "vtt"),
+    "json": ("application/json", "json"),
+}
+_ALIASES = {"text": "txt", "docs": "docx", "webvtt": "vtt"}
+# Subtitle formats are meaningless without timestamps.
+TIMED_FORMATS = ("srt", "vtt")
+
+
+def normalize_format(fmt: Optional[str]) -> str:
+    name = (fmt or "txt").strip().lower()
+    name = _ALIASES.get(name, name)
+    if name not in FORMATS:
+        raise ValueError(f"ไม่รองรับรูปแบบไฟล์: {fmt}")
+    return name
+
+
+def _clock(seconds: float, separator: str) -> str:
+    millis = int(round(max(0.0, float(seconds)) * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def _chunked(pieces: Iterable[str]) -> Iterator[bytes]:
+    buffer: List[str] = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _segment_line(seg: Dict[str, object]) -> str:
+    speaker = f"{seg['speaker']}: " if seg.get("speaker") else ""
+    return f"[{_clock(seg['start'], '.')[:8]}] {speaker}{str(seg.get('text') or '').strip()}"
+
+
+def _transcript_lines(transcript: str, segments: Optional[Sequence[Dict[str, object]]]) -> Iterator[str]:
+    if segments:
+        for seg in segments:
+            yield _segment_line(seg)
+    else:
+        yield from transcript.strip().splitlines()
+
+
+def render_txt(sections: Sequence[Tuple[str, str, Optional[Sequence[Dict[str, object]]]]]) -> Iterator[bytes]:
+    def pieces():
+        first = True
+        for title, content, segments in sections:
+            if not first:
+                yield "\n"
+            first = False
+            yield f"## {title}\n"
+            for line in _transcript_lines(content, segments):
+                yield line + "\n"
+
+    return _chunked(pieces())
+
+
+def render_srt(segments: Sequence[Dict[str, object]]) -> Iterator[bytes]:
+    def pieces():
+        for index, seg in enumerate(segments, 1):
+            speaker = f"[{seg['speaker']}] " if seg.get("speaker") else ""
+            yield (
+                f"{index}\n{_clock(seg['start'], ',')} --> {_clock(seg['end'], ',')}\n"
+                f"{speaker}{str(seg.get('text') or '').strip()}\n\n"
+            )
+
+    return _chunked(pieces())
+
+
+def render_vtt(segments: Sequence[Dict[str, object]]) -> Iterator[bytes]:
+    def pieces():
+        yield "WEBVTT\n\n"
+        for seg in segments:
+            text = str(seg.get("text") or "").strip().replace("-->", "->")
+            text = text.replace("&", "&amp;").replace("<", "&lt;")
+            if seg.get("speaker"):
+                text = f"<v {seg['speaker']}>{text}"
+            yield f"{_clock(seg['start'], '.')} --> {_clock(seg['end'], '.')}\n{text}\n\n"
+
+    return _chunked(pieces())
+
+
+def render_json(
+    segments: Optional[Sequence[Dict[str, object]]],
+    transcript: str,
+    report_markdown: str,
+    meta: Dict[str, object],
+) -> Iterator[bytes]:
+    def pieces():
+        yield "{"
+        for key, value in meta.items():
+            yield f"{json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}, "
+        if report_markdown:
+            yield f'"report_markdown": {json.dumps(report_markdown, ensure_ascii=False)}, '
+        if not segments:
+            yield f'"transcript": {json.dumps(transcript, ensure_ascii=False)}, '
+        yield '"segments": ['
+        for index, seg in enumerate(segments or ()):
+            yield ("," if index else "") + json.dumps(seg, ensure_ascii=False)
+        yield "]}\n"
+
+    return _chunked(pieces())
+
+
+# Control characters are not allowed anywhere in an XML part.
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def render_docx(sections: Sequence[Tuple[str, str, Optional[Sequence[Dict[str, object]]]]]) -> Iterator[bytes]:
+    if _DocxDocument is None:
+        raise RuntimeError("python-docx ไม่พร้อมใช้งานบนเซิร์ฟเวอร์ โปรดใช้รูปแบบ .txt แทน")
+
+    def pieces():
+        doc = _DocxDocument()
+        for title, content, segments in sections:
+            doc.add_heading(title, level=1)
+            if segments:
+                for seg in segments:
+                    paragraph = doc.add_paragraph(f"[{_clock(seg['start'], '.')[:8]}] ")
+                    if seg.get("speaker"):
+                        paragraph.add_run(f"{seg['speaker']}: ").bold = True
+                    paragraph.add_run(_XML_INVALID.sub("", str(seg.get("text") or "").strip()))
+            else:
+                for line in content.strip().splitlines():
+                    doc.add_paragraph(_XML_INVALID.sub("", line) if line.strip() else "")
+        # A .docx is a zip whose central directory comes last, so python-docx
+        # builds it whole; only the download itself is chunked.
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        data = buffer.getbuffer()
+        for offset in range(0, len(data), CHUNK_BYTES):
+            yield bytes(data[offset : offset + CHUNK_BYTES])
+
+    # Checked up front so /export can answer 503 before streaming starts.
+    return pieces()
+
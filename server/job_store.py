@@ -0,0 +1,159 @@
+"""SQLite-backed store for asynchronous transcription jobs.
+
+One row per job (status, queue position, progress, decode parameters, the
+retained audio path and the final result) plus an append-only event log, so
+clients can poll a job or resume its event stream with ``since=<seq>`` after a
+dropped connection, and unfinished jobs can be picked up again after a
+restart. All methods are blocking; the server calls them off the event loop.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+TERMINAL_STATUSES = ("done", "error", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    params TEXT NOT NULL,
+    audio_path TEXT,
+    audio_hash TEXT,
+    position INTEGER NOT NULL DEFAULT 0,
+    progress REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+
+_UPDATABLE = ("status", "position", "progress", "result", "error")
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def create(
+        self,
+        job_id: str,
+        params: Dict[str, object],
+        audio_path: Optional[str],
+        audio_hash: Optional[str],
+    ) -> Dict[str, object]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, created_at, updated_at, params, audio_path, audio_hash)"
+                " VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, now, now, json.dumps(params), audio_path, audio_hash),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, object]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row is not None else None
+
+    def update(self, job_id: str, **fields: object) -> None:
+        unknown = set(fields) - set(_UPDATABLE)
+        if unknown:
+            raise ValueError(f"cannot update job fields {sorted(unknown)}")
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ?",
+                (*fields.values(), time.time(), job_id),
+            )
+
+    def append_event(self, job_id: str, payload: Dict[str, object]) -> int:
+        """Store ``payload`` as the job's next event and return its sequence number."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                (last,) = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM job_events WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                seq = last + 1
+                self._conn.execute(
+                    "INSERT INTO job_events (job_id, seq, payload) VALUES (?, ?, ?)",
+                    (job_id, seq, json.dumps(payload)),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return seq
+
+    def events(self, job_id: str, since: int = 0) -> List[Tuple[int, Dict[str, object]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, payload FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, since),
+            ).fetchall()
+        return [(row["seq"], json.loads(row["payload"])) for row in rows]
+
+    def unfinished(self) -> List[Dict[str, object]]:
+        placeholders = ",".join("?" for _ in TERMINAL_STATUSES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE status NOT IN ({placeholders}) ORDER BY created_at",
+                TERMINAL_STATUSES,
+            ).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def purge(self, older_than: float) -> List[Dict[str, object]]:
+        """Delete finished jobs last updated before ``older_than``; return them."""
+        placeholders = ",".join("?" for _ in TERMINAL_STATUSES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*TERMINAL_STATUSES, older_than),
+            ).fetchall()
+            for row in rows:
+                self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (row["id"],))
+                self._conn.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+        return [_row_to_job(row) for row in rows]
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, object]:
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    if job.get("result"):
+        job["result"] = json.loads(job["result"])
+    return job
@@ -1,29 +1,73 @@
-import os, json as _json, tempfile as _tf, threading, subprocess, asyncio, time, io
-from collections import deque
+import os, json as _json, tempfile as _tf, threading, subprocess, asyncio, time, hashlib, bisect, uuid, socket, shutil
+import importlib
+import warnings
+import weakref
+from types import SimpleNamespace
+from collections import OrderedDict
+from contextlib import aclosing, contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from itertools import count
 from typing import Dict, List, Optional
-from fastapi import FastAPI, UploadFile, File, Form, Request, Query, HTTPException
+from fastapi import (
+    FastAPI,
+    UploadFile,
+    File,
+    Form,
+    Request,
+    Query,
+    HTTPException,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
+import numpy as np
 from pydantic import BaseModel
-from starlette.responses import StreamingResponse, Response
-from faster_whisper import WhisperModel
+from starlette.responses import JSONResponse, StreamingResponse, Response
+
+import exporters
+import metrics
+import response_encoding
+from broker import FINAL_EVENTS, make_broker
+from job_store import TERMINAL_STATUSES, JobStore
+from speaker_alignment import SpeakerTimeline, speaker_runs
+
+# faster-whisper (ctranslate2, PyAV, onnxruntime), torch and pyannote.audio
+# take seconds to import, so they are imported on first use, normally by the
+# background warm-up after the port is bound, never at module import.
+_LAZY_MODULES: Dict[str, object] = {}
+
+
+def _lazy(name: str, optional: bool = False):
+    """Import ``name`` on first use; ``None`` for a missing ``optional`` module."""
+    module = _LAZY_MODULES.get(name)
+    if module is None and name not in _LAZY_MODULES:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            if not optional:
+                raise
+        _LAZY_MODULES[name] = module
+    return module
+
+
+def _cleanup_paths(*paths: Optional[str]) -> None:
+    for path in {p for p in paths if p}:
+        try:
+            os.remove(path)
+        except Exception:
+            pass
+
+
+def _speech_timestamps(audio, **vad_options):
+    vad = _lazy("faster_whisper.vad")
+    return vad.get_speech_timestamps(audio, vad.VadOptions(**vad_options))
 
-try:
-    from pyannote.audio import Pipeline as _DiarizationPipeline
-except ImportError:
-    _DiarizationPipeline = None
 
-try:
-    import torch as _torch
-except ImportError:
-    _torch = None
+def _decode_audio(path, sampling_rate: int):
+    return _lazy("faster_whisper").decode_audio(path, sampling_rate=sampling_rate)
 
-try:
-    from docx import Document as _DocxDocument
-except ImportError:
-    _DocxDocument = None
 
-_MODEL_SIZE_ENV = os.getenv("WHISPER_MODEL")
+_MODEL_SIZE_ENV = os.getenv("WHISPER_MODEL") or "small"
 
 # Allow overriding host/port/ffmpeg via env without relying on CLI arguments.
 HOST_DEFAULT = (
@@ -49,12 +93,101 @@ _FFMPEG_ENV = (
 # -------- Defaults (Thai + accuracy-first, but tunable) --------
 COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE", "int8")          # CPU:int8  | GPU:float16|float32
 LANGUAGE_DEFAULT = os.getenv("WHISPER_LANG", "th")           # default Thai
-QUALITY_DEFAULT = os.getenv("WHISPER_QUALITY", "accurate")   # accurate | balanced | fast | hyperfast
+QUALITY_DEFAULT = os.getenv("WHISPER_QUALITY", "accurate")   # accurate | balanced | fast | hyperfast | adaptive
 CPU_THREADS_DEFAULT = int(os.getenv("WHISPER_CPU_THREADS", str(os.cpu_count() or 4)))
-NUM_WORKERS_DEFAULT = int(os.getenv("WHISPER_NUM_WORKERS", "1"))
 TRANSCRIBE_CONCURRENCY = max(
     1, int(os.getenv("TRANSCRIBE_CONCURRENCY", "1"))
 )
+# CTranslate2 runs at most num_workers transcribe() calls of one model at a
+# time, so fewer workers than concurrent jobs just queues them inside it
+NUM_WORKERS_DEFAULT = int(os.getenv("WHISPER_NUM_WORKERS", str(TRANSCRIBE_CONCURRENCY)))
+if NUM_WORKERS_DEFAULT < TRANSCRIBE_CONCURRENCY:
+    print(
+        f"[WARN] WHISPER_NUM_WORKERS={NUM_WORKERS_DEFAULT} is below "
+        f"TRANSCRIBE_CONCURRENCY={TRANSCRIBE_CONCURRENCY}; concurrent jobs on one model will decode one after another"
+    )
+# Adaptive quality: lower the decode profile while the backlog would take
+# longer than QUALITY_SLO_SECONDS to drain, raise it again when load drops.
+# Requests with quality=adaptive always adapt; ADAPTIVE_QUALITY=true also lets
+# fixed profiles be downgraded (never upgraded past what was asked for).
+QUALITY_TIERS = ("accurate", "balanced", "fast", "hyperfast")
+ADAPTIVE_QUALITY = os.getenv("ADAPTIVE_QUALITY", "false").strip().lower() == "true"
+QUALITY_SLO_SECONDS = max(1.0, float(os.getenv("QUALITY_SLO_SECONDS", "600")))
+ADAPTIVE_QUALITY_FLOOR = os.getenv("ADAPTIVE_QUALITY_FLOOR", "fast").strip().lower()
+if ADAPTIVE_QUALITY_FLOOR not in QUALITY_TIERS:
+    raise ValueError(f"ADAPTIVE_QUALITY_FLOOR must be one of {QUALITY_TIERS}")
+PREPROCESS_CONCURRENCY = max(
+    1, int(os.getenv("PREPROCESS_CONCURRENCY", "2"))
+)
+SAMPLE_RATE = 16000  # faster-whisper / pyannote expect 16 kHz mono
+# A job's audio is decoded once to 16 kHz float32; longer recordings are
+# spooled to PCM_SPOOL_DIR and memory-mapped instead of held in memory
+PCM_MEMMAP_SECONDS = max(0.0, float(os.getenv("PCM_MEMMAP_SECONDS", "600")))
+PCM_SPOOL_DIR = os.path.expanduser(os.getenv("PCM_SPOOL_DIR") or _tf.gettempdir())
+# Decoded PCM retained next to job uploads for /retranscribe is capped at
+# PCM_KEEP_MAX_MB in total, least recently used first (0 = never retain; a
+# retranscribe then decodes its upload again)
+PCM_KEEP_MAX_BYTES = max(0, int(float(os.getenv("PCM_KEEP_MAX_MB", "2048")) * 1024 * 1024))
+# Scheduling: priority classes, queue-depth limits (0 = unlimited), how many
+# audio seconds a job is moved forward per second waited, and the upload byte
+# rate used to guess a job's length before it has been decoded
+JOB_PRIORITIES = ("high", "normal", "low")
+MAX_QUEUE_DEPTH = max(0, int(os.getenv("MAX_QUEUE_DEPTH", "0")))
+MAX_QUEUE_PER_CLIENT = max(0, int(os.getenv("MAX_QUEUE_PER_CLIENT", "0")))
+JOB_AGING_FACTOR = max(0.0, float(os.getenv("JOB_AGING_FACTOR", "10")))
+QUEUE_COST_BYTES_PER_SECOND = max(1, int(os.getenv("QUEUE_COST_BYTES_PER_SECOND", "16000")))
+# Upload size cap in MB (0 disables the limit)
+MAX_UPLOAD_MB = max(0, int(os.getenv("MAX_UPLOAD_MB", "2048")))
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Opt-in long-form mode: split audio at silences and decode chunks in parallel
+LONGFORM_DEFAULT = os.getenv("LONGFORM_DEFAULT", "false").strip().lower() == "true"
+LONGFORM_WORKERS = max(1, int(os.getenv("LONGFORM_WORKERS", str(max(2, NUM_WORKERS_DEFAULT)))))
+# Chunks decode on a model instance with enough CTranslate2 workers to run
+# LONGFORM_WORKERS of them at once (shared with other jobs when equal)
+LONGFORM_MODEL_WORKERS = max(LONGFORM_WORKERS, NUM_WORKERS_DEFAULT)
+LONGFORM_CHUNK_SECONDS = max(30.0, float(os.getenv("LONGFORM_CHUNK_SECONDS", "300")))
+# /transcribe_stream_upload: decode chunks while the body is still uploading
+STREAM_UPLOAD_PIPELINED = os.getenv("STREAM_UPLOAD_PIPELINED", "false").strip().lower() == "true"
+STREAM_UPLOAD_CHUNK_SECONDS = max(10.0, float(os.getenv("STREAM_UPLOAD_CHUNK_SECONDS", "60")))
+# Cross-job batching through faster-whisper's BatchedInferencePipeline
+WHISPER_BATCHING = os.getenv("WHISPER_BATCHING", "false").strip().lower() == "true"
+WHISPER_BATCH_SIZE = max(1, int(os.getenv("WHISPER_BATCH_SIZE", "8")))
+BATCH_MAX_WAIT_MS = max(0, int(os.getenv("BATCH_MAX_WAIT_MS", "200")))
+# Live /ws/transcribe: how often to re-decode and when an utterance is final
+LIVE_STEP_SECONDS = max(0.5, float(os.getenv("LIVE_STEP_SECONDS", "2.0")))
+LIVE_COMMIT_SILENCE_MS = max(100, int(os.getenv("LIVE_COMMIT_SILENCE_MS", "600")))
+LIVE_MAX_BUFFER_SECONDS = max(5.0, float(os.getenv("LIVE_MAX_BUFFER_SECONDS", "25")))
+# Decoded transcripts are cached on disk, keyed by audio hash + decode params
+TRANSCRIPT_CACHE_DIR = os.path.expanduser(
+    os.getenv("TRANSCRIPT_CACHE_DIR")
+    or os.path.join("~", ".cache", "meeting_minutes", "transcripts")
+)
+TRANSCRIPT_CACHE_MAX_MB = max(0, int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "512")))
+# Asynchronous /jobs: SQLite job store and retained uploads
+JOBS_DIR = os.path.expanduser(
+    os.getenv("JOBS_DIR") or os.path.join("~", ".cache", "meeting_minutes", "jobs")
+)
+JOB_RETENTION_HOURS = max(0.0, float(os.getenv("JOB_RETENTION_HOURS", "24")))
+# Deployment: "all" serves HTTP and decodes; "api" only serves HTTP and hands
+# jobs to the broker; "worker" decodes jobs from the broker and serves nothing.
+# Uploads of an API node go to BROKER_SHARED_DIR, which workers must see at
+# the same path.
+DEPLOY_MODE = os.getenv("DEPLOY_MODE", "all").strip().lower()
+if DEPLOY_MODE not in ("all", "api", "worker"):
+    raise ValueError(f"DEPLOY_MODE must be all, api or worker, not {DEPLOY_MODE!r}")
+BROKER_SHARED_DIR = os.path.expanduser(
+    os.getenv("BROKER_SHARED_DIR") or os.path.join("~", ".cache", "meeting_minutes", "shared")
+)
+BROKER_URL = os.getenv("BROKER_URL") or "sqlite:///" + os.path.join(
+    BROKER_SHARED_DIR, "broker.sqlite3"
+)
+BROKER_POLL_SECONDS = max(0.05, float(os.getenv("BROKER_POLL_SECONDS", "0.25")))
+WORKER_HEARTBEAT_SECONDS = max(1.0, float(os.getenv("WORKER_HEARTBEAT_SECONDS", "5")))
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# Jobs an API node lets into the broker at once; the rest wait in its queue
+API_MAX_INFLIGHT = max(1, int(os.getenv("API_MAX_INFLIGHT", "16")))
+_UPLOAD_DIR = os.path.join(BROKER_SHARED_DIR, "uploads") if DEPLOY_MODE == "api" else None
 
 
 def _is_path_like(value: str) -> bool:
@@ -86,6 +219,14 @@ FFMPEG_BIN = (
     else _FFMPEG_ENV
 )
 
+# Model registry: how many Whisper models may stay resident at once
+WHISPER_MAX_MODELS = max(1, int(os.getenv("WHISPER_MAX_MODELS", "2")))
+WHISPER_MODEL_BUDGET_MB = max(0, int(os.getenv("WHISPER_MODEL_BUDGET_MB", "0")))
+# Unset: faster-whisper's stock names, looked up when first needed
+WHISPER_ALLOWED_MODELS = [
+    n.strip() for n in (os.getenv("WHISPER_ALLOWED_MODELS") or "").split(",") if n.strip()
+] or None
+
 DIARIZATION_MODEL_DEFAULT = os.getenv(
     "DIARIZATION_MODEL", "pyannote/speaker-diarization-3.1"
 )
@@ -93,6 +234,19 @@ DIARIZATION_DEFAULT_ENABLED = (
     os.getenv("DIARIZATION_DEFAULT", "false").strip().lower() == "true"
 )
 DIARIZATION_DEVICE_ENV = os.getenv("DIARIZATION_DEVICE")
+# DIARIZATION_MODEL=builtin: diarizer.py on CPU, no pyannote/torch/token
+DIARIZATION_BUILTIN = "builtin"
+DIARIZATION_MAX_SPEAKERS = max(1, int(os.getenv("DIARIZATION_MAX_SPEAKERS", "8")))
+DIARIZATION_CONCURRENCY = max(1, int(os.getenv("DIARIZATION_CONCURRENCY", "1")))
+# Background warm-up after startup (see _WarmUp); "none" skips the models
+WARMUP_MODELS = [
+    n.strip() for n in os.getenv("WARMUP_MODELS", _MODEL_SIZE_ENV).split(",") if n.strip()
+]
+if [n.lower() for n in WARMUP_MODELS] == ["none"]:
+    WARMUP_MODELS = []
+WARMUP_DIARIZATION = os.getenv(
+    "WARMUP_DIARIZATION", "true" if DIARIZATION_DEFAULT_ENABLED else "false"
+).strip().lower() == "true"
 DIARIZATION_AUTH_TOKEN = (
     os.getenv("DIARIZATION_AUTH_TOKEN")
     or os.getenv("HUGGINGFACE_TOKEN")
@@ -101,25 +255,50 @@ DIARIZATION_AUTH_TOKEN = (
 )
 
 
+class _QueueFull(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
 class _JobTicket:
     __slots__ = (
         "job_id",
         "position",
+        "current_position",
+        "priority",
+        "client",
+        "cost",
         "_event",
+        "_changed",
         "_queue",
         "_active",
         "wait_started",
         "wait_seconds",
+        "granted_at",
+        "_released",
+        "batch_key",
+        "rider",
     )
 
-    def __init__(self, queue: "_JobQueue", job_id: int, event: asyncio.Event, position: int, active: bool):
+    def __init__(self, queue: "_JobQueue", job_id: int, priority: str, client: str, cost: float):
         self._queue = queue
         self.job_id = job_id
-        self.position = position  # number of jobs ahead at enqueue time
-        self._event = event
-        self._active = active
+        self.priority = priority
+        self.client = client
+        self.cost = cost  # expected audio seconds, for shortest-job-first
+        self.position = 0  # position at enqueue time (0 = running, 1 = next in line)
+        self.current_position = 0
+        self._event = asyncio.Event()  # set once a decode slot is granted
+        self._changed = asyncio.Event()  # set on every position change or grant
+        self._active = False
         self.wait_started = time.time()
         self.wait_seconds = 0.0
+        self.granted_at = 0.0
+        self._released = False
+        self.batch_key: Optional[str] = None  # set once its audio is ready to batch
+        self.rider = False  # granted into a forming batch, without a slot
 
     async def wait_until_ready(self) -> None:
         try:
@@ -132,97 +311,524 @@ class _JobTicket:
         if self._active:
             self.wait_seconds = max(0.0, time.time() - self.wait_started)
 
+    async def positions(self):
+        """Yield the live queue position each time it changes, until granted."""
+        last = None
+        while True:
+            self._changed.clear()
+            if self._event.is_set():
+                return
+            if self.current_position != last:
+                last = self.current_position
+                yield last
+                continue
+            await self._changed.wait()
+
+    async def update_cost(self, seconds: float) -> None:
+        """Replace the size-based estimate once the real audio length is known."""
+        await self._queue._reprice(self, seconds)
+
     async def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
         await self._queue._release(self)
 
 
 class _JobQueue:
-    def __init__(self, capacity: int):
+    """Decode slots handed out by priority class, fair share and job length.
+
+    Waiting tickets are grouped by priority class and, inside a class, by
+    client key. Each dispatch serves the highest non-empty class, takes the
+    client at the front of its round-robin order, gives that client's
+    shortest expected job the slot (long waits age jobs forward so they are
+    not starved) and moves the client to the back of the rotation.
+    """
+
+    def __init__(self, capacity: int, max_depth: int = 0, max_per_client: int = 0, max_riders: int = 0):
         self.capacity = max(1, capacity)
+        self.max_depth = max_depth
+        self.max_per_client = max_per_client
+        self.max_riders = max(0, max_riders)
         self._available = self.capacity
+        self._riders = 0
         self._lock = asyncio.Lock()
-        self._waiters: deque = deque()
+        self._lanes: List["OrderedDict[str, List[_JobTicket]]"] = [
+            OrderedDict() for _ in JOB_PRIORITIES
+        ]
         self._counter = count(1)
+        self._avg_hold = 60.0  # moving average of seconds a slot is held
+        self._rejected = 0
+        self._running: set = set()
+
+    def _waiting(self, client: Optional[str] = None) -> int:
+        if client is None:
+            return sum(len(t) for lane in self._lanes for t in lane.values())
+        return sum(len(lane.get(client, ())) for lane in self._lanes)
+
+    def _retry_after(self) -> int:
+        return max(1, int(self._avg_hold / self.capacity + 0.999))
 
-    async def enqueue(self) -> _JobTicket:
-        job_id = next(self._counter)
-        event = asyncio.Event()
+    def _admission_error(self, client: str) -> Optional[_QueueFull]:
+        if self.max_depth and self._waiting() >= self.max_depth:
+            return _QueueFull("คิวงานเต็ม กรุณาลองใหม่ภายหลัง", self._retry_after())
+        if self.max_per_client and self._waiting(client) >= self.max_per_client:
+            return _QueueFull("มีงานของผู้ใช้นี้รอคิวมากเกินไป", self._retry_after())
+        return None
+
+    async def check_admission(self, client: str) -> None:
+        """Raise :class:`_QueueFull` if a new job from ``client`` would be rejected."""
         async with self._lock:
-            if self._available > 0:
-                self._available -= 1
-                event.set()
-                position = 0
-                active = True
-            else:
-                position = len(self._waiters)
-                self._waiters.append((job_id, event))
-                active = False
-        return _JobTicket(self, job_id, event, position, active)
+            error = self._admission_error(client)
+            if error is not None:
+                self._rejected += 1
+                raise error
+
+    async def enqueue(
+        self,
+        priority: str = "normal",
+        client: str = "",
+        cost: float = 0.0,
+        enforce_limits: bool = True,
+    ) -> _JobTicket:
+        async with self._lock:
+            if enforce_limits:
+                error = self._admission_error(client)
+                if error is not None:
+                    self._rejected += 1
+                    raise error
+            ticket = _JobTicket(self, next(self._counter), priority, client, float(cost))
+            self._lanes[JOB_PRIORITIES.index(priority)].setdefault(client, []).append(ticket)
+            self._dispatch()
+            ticket.position = ticket.current_position
+        return ticket
+
+    @staticmethod
+    def _pick(lanes, now: float):
+        for lane in lanes:
+            if not lane:
+                continue
+            client, tickets = next(iter(lane.items()))
+            best = min(
+                tickets,
+                key=lambda t: (t.cost - JOB_AGING_FACTOR * (now - t.wait_started), t.job_id),
+            )
+            return lane, client, best
+        return None
+
+    @staticmethod
+    def _take(lane, client: str, ticket: _JobTicket) -> None:
+        tickets = lane[client]
+        tickets.remove(ticket)
+        if tickets:
+            lane.move_to_end(client)
+        else:
+            del lane[client]
+
+    def _dispatch(self) -> None:
+        now = time.time()
+        while self._available > 0:
+            picked = self._pick(self._lanes, now)
+            if picked is None:
+                break
+            lane, client, ticket = picked
+            self._take(lane, client, ticket)
+            self._available -= 1
+            self._grant(ticket)
+        self._refresh_positions(now)
+
+    def _grant(self, ticket: _JobTicket) -> None:
+        self._running.add(ticket)
+        ticket.current_position = 0
+        ticket.granted_at = time.monotonic()
+        ticket._event.set()
+        ticket._changed.set()
+
+    async def admit_riders(self, batch_key: str, limit: int) -> int:
+        """Grant up to ``limit`` waiting tickets with ``batch_key`` outside the slots.
+
+        They join a batch that is already forming and share its single
+        decode, so they take no slot of their own; at most ``max_riders``
+        ride at a time. Dispatch order still decides which tickets go.
+        """
+        async with self._lock:
+            now = time.time()
+            lanes = [
+                OrderedDict(
+                    (c, [t for t in ts if t.batch_key == batch_key])
+                    for c, ts in lane.items()
+                    if any(t.batch_key == batch_key for t in ts)
+                )
+                for lane in self._lanes
+            ]
+            admitted = 0
+            while admitted < limit and self._riders < self.max_riders:
+                picked = self._pick(lanes, now)
+                if picked is None:
+                    break
+                lane, client, ticket = picked
+                self._take(lane, client, ticket)
+                self._take(self._lanes[JOB_PRIORITIES.index(ticket.priority)], client, ticket)
+                ticket.rider = True
+                self._riders += 1
+                self._grant(ticket)
+                admitted += 1
+            if admitted:
+                self._refresh_positions(now)
+            return admitted
+
+    def _refresh_positions(self, now: float) -> None:
+        # Replay the dispatch order on a copy to get every waiter's position.
+        lanes = [OrderedDict((c, list(t)) for c, t in lane.items()) for lane in self._lanes]
+        position = 0
+        while True:
+            picked = self._pick(lanes, now)
+            if picked is None:
+                return
+            lane, client, ticket = picked
+            self._take(lane, client, ticket)
+            position += 1
+            if ticket.current_position != position:
+                ticket.current_position = position
+                ticket._changed.set()
+
+    async def _reprice(self, ticket: _JobTicket, cost: float) -> None:
+        async with self._lock:
+            ticket.cost = float(cost)
+            if not ticket._event.is_set():
+                self._refresh_positions(time.time())
 
     async def _release(self, ticket: _JobTicket) -> None:
         async with self._lock:
-            if ticket._active:
-                if self._waiters:
-                    _, event = self._waiters.popleft()
-                    event.set()
-                else:
-                    self._available = min(self.capacity, self._available + 1)
+            # A set event means the slot was handed over, even if the waiter
+            # never got scheduled to observe it.
+            if ticket.rider and (ticket._active or ticket._event.is_set()):
+                self._riders -= 1
+                self._running.discard(ticket)
+            elif ticket._active or ticket._event.is_set():
+                held = time.monotonic() - ticket.granted_at
+                self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+                self._available = min(self.capacity, self._available + 1)
+                self._running.discard(ticket)
             else:
-                # remove from waiters if still queued
-                for idx, (wait_job_id, event) in enumerate(self._waiters):
-                    if wait_job_id == ticket.job_id:
-                        del self._waiters[idx]
-                        break
+                lane = self._lanes[JOB_PRIORITIES.index(ticket.priority)]
+                tickets = lane.get(ticket.client, [])
+                if ticket in tickets:
+                    tickets.remove(ticket)
+                    if not tickets:
+                        del lane[ticket.client]
+            self._dispatch()
+
+    async def backlog(self):
+        """Expected audio seconds still waiting, and ``(cost, seconds held)`` per running job."""
+        async with self._lock:
+            waiting = sum(t.cost for lane in self._lanes for ts in lane.values() for t in ts)
+            now = time.monotonic()
+            return waiting, [(t.cost, now - t.granted_at) for t in self._running]
 
-    async def stats(self) -> Dict[str, int]:
+    async def stats(self) -> Dict[str, object]:
         async with self._lock:
             return {
                 "capacity": self.capacity,
                 "active": self.capacity - self._available,
-                "waiting": len(self._waiters),
+                "waiting": self._waiting(),
+                "waiting_by_priority": {
+                    name: sum(len(t) for t in lane.values())
+                    for name, lane in zip(JOB_PRIORITIES, self._lanes)
+                },
+                "clients_waiting": len({c for lane in self._lanes for c in lane}),
+                "max_depth": self.max_depth,
+                "max_per_client": self.max_per_client,
+                "rejected": self._rejected,
+                "avg_job_seconds": round(self._avg_hold, 3),
+                "riders": self._riders,
             }
 
 
-_JOB_QUEUE = _JobQueue(TRANSCRIBE_CONCURRENCY)
+_JOB_QUEUE = _JobQueue(
+    API_MAX_INFLIGHT if DEPLOY_MODE == "api" else TRANSCRIBE_CONCURRENCY,
+    MAX_QUEUE_DEPTH,
+    MAX_QUEUE_PER_CLIENT,
+    # Each decode slot can carry a full batch of jobs.
+    TRANSCRIBE_CONCURRENCY * (WHISPER_BATCH_SIZE - 1) if WHISPER_BATCHING and DEPLOY_MODE != "api" else 0,
+)
 
 
-def _build_export_payload(req: ExportRequest):
-    fmt = (req.format or "txt").strip().lower()
-    include_transcript = req.include_transcript and (req.transcript or "").strip()
-    include_report = req.include_report and (req.report_markdown or "").strip()
-    if not include_transcript and not include_report:
-        raise ValueError("ไม่พบข้อมูลที่จะส่งออก โปรดเลือกเนื้อหาอย่างน้อยหนึ่งรายการ")
+class _QualityGovernor:
+    """Decode profile for a job that is about to start, given current load.
 
-    sections = []
-    if include_transcript:
-        sections.append(("Transcript", (req.transcript or "").strip()))
-    if include_report:
-        sections.append(("Report", (req.report_markdown or "").strip()))
-
-    if fmt in ("txt", "text"):
-        lines = []
-        for title, content in sections:
-            lines.append(f"## {title}")
-            lines.append(content)
-            lines.append("")
-        data = "\n".join(lines).strip() + "\n"
-        return data.encode("utf-8"), "text/plain; charset=utf-8", "meeting_export.txt"
-
-    if fmt in ("docx", "docs"):
-        if _DocxDocument is None:
-            raise RuntimeError(
-                "python-docx ไม่พร้อมใช้งานบนเซิร์ฟเวอร์ โปรดใช้รูปแบบ .txt แทน"
-            )
-        doc = _DocxDocument()
-        for title, content in sections:
-            doc.add_heading(title, level=1)
-            for paragraph in content.splitlines():
-                doc.add_paragraph(paragraph if paragraph.strip() else "")
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        return buffer.getvalue(), "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "meeting_export.docx"
+    Keeps one moving average of decode real-time factor, normalized to the
+    ``accurate`` profile through ``RELATIVE_COST``, and projects how long the
+    queue's backlog (waiting audio plus what running jobs still have left)
+    takes to drain on each profile. The shared level steps down while that
+    exceeds the SLO and steps back up once the next better profile would fit
+    comfortably (``UPGRADE_MARGIN``), so it does not flap at the boundary.
+    Until a decode has been measured there is nothing to project from and
+    the requested profile is used.
+    """
+
+    # Decode cost of each profile relative to accurate (beam 8).
+    RELATIVE_COST = {"accurate": 1.0, "balanced": 0.7, "fast": 0.35, "hyperfast": 0.3}
+    UPGRADE_MARGIN = 0.7
+
+    def __init__(self, slo_seconds: float, floor: str, enabled: bool):
+        self.slo_seconds = slo_seconds
+        self.floor = QUALITY_TIERS.index(floor)
+        self.enabled = enabled
+        self.level = 0
+        self._rtf: Optional[float] = None
+        self._projected = 0.0
+        self._changes = {"downgrade": 0, "upgrade": 0}
+
+    def applies(self, quality: str) -> bool:
+        return quality == "adaptive" or (self.enabled and quality in QUALITY_TIERS)
+
+    def observe(self, quality: str, rtf: float) -> None:
+        cost = self.RELATIVE_COST.get(quality)
+        if cost is None or rtf <= 0:
+            return
+        base = rtf / cost
+        self._rtf = base if self._rtf is None else 0.8 * self._rtf + 0.2 * base
+
+    def _drain_seconds(self, level: int, waiting: float, running, capacity: int) -> float:
+        rtf = self._rtf * self.RELATIVE_COST[QUALITY_TIERS[level]]
+        work = waiting * rtf + sum(max(0.0, cost * rtf - held) for cost, held in running)
+        return work / max(1, capacity)
+
+    async def choose(self, quality: str, queue: "_JobQueue") -> str:
+        ceiling = 0 if quality == "adaptive" else QUALITY_TIERS.index(quality)
+        if self._rtf is not None:
+            waiting, running = await queue.backlog()
+
+            def drain(level: int) -> float:
+                return self._drain_seconds(level, waiting, running, queue.capacity)
+
+            while self.level < self.floor and drain(self.level) > self.slo_seconds:
+                self.level += 1
+                self._changes["downgrade"] += 1
+            while self.level > 0 and drain(self.level - 1) <= self.slo_seconds * self.UPGRADE_MARGIN:
+                self.level -= 1
+                self._changes["upgrade"] += 1
+            self._projected = drain(self.level)
+        return QUALITY_TIERS[max(ceiling, self.level)]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "slo_seconds": self.slo_seconds,
+            "floor": QUALITY_TIERS[self.floor],
+            "level": QUALITY_TIERS[self.level],
+            "rtf_accurate": round(self._rtf, 4) if self._rtf is not None else None,
+            "projected_drain_seconds": round(self._projected, 1),
+            "changes": dict(self._changes),
+        }
+
+
+_QUALITY_GOVERNOR = _QualityGovernor(QUALITY_SLO_SECONDS, ADAPTIVE_QUALITY_FLOOR, ADAPTIVE_QUALITY)
+
+
+class _JobCancelled(Exception):
+    pass
+
+
+class _CancelToken:
+    """Cancellation flag shared by a job's event-loop side and worker threads.
+
+    Blocking stages register a callback (kill ffmpeg, abort diarization) that
+    runs as soon as the job is cancelled; loops poll :attr:`cancelled`.
+    """
+
+    __slots__ = ("_event", "_lock", "_callbacks")
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def register(self, callback):
+        """Run ``callback`` on cancellation; returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._unregister(callback)
+        callback()
+        return lambda: None
+
+    def _unregister(self, callback) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+_METRICS = metrics.Registry()
+_M_UPLOAD_BYTES = _METRICS.histogram(
+    "meeting_upload_bytes", "Size of uploaded recordings.", ["endpoint"], metrics.BYTES_BUCKETS
+)
+_M_UPLOAD_SECONDS = _METRICS.histogram(
+    "meeting_upload_seconds", "Time spent receiving an upload.", ["endpoint"]
+)
+_M_PREPROCESS_SECONDS = _METRICS.histogram(
+    "meeting_preprocess_seconds", "ffmpeg decode and preprocessing time.", ["mode", "outcome"]
+)
+_M_QUEUE_WAIT_SECONDS = _METRICS.histogram(
+    "meeting_queue_wait_seconds", "Time a job waited for a transcription slot.", ["endpoint"]
+)
+_M_MODEL_LOAD_SECONDS = _METRICS.histogram(
+    "meeting_model_load_seconds", "WhisperModel load time.", ["model"]
+)
+_M_DECODE_SECONDS = _METRICS.histogram(
+    "meeting_decode_seconds", "Whisper decode wall time per job.", ["model", "quality", "mode"]
+)
+_M_REALTIME_FACTOR = _METRICS.histogram(
+    "meeting_decode_realtime_factor",
+    "Decode seconds divided by audio seconds.",
+    ["model", "quality", "mode"],
+    metrics.RATIO_BUCKETS,
+)
+_M_DIARIZATION_SECONDS = _METRICS.histogram(
+    "meeting_diarization_seconds", "Speaker diarization time.", ["model", "outcome"]
+)
+_M_EXPORT_SECONDS = _METRICS.histogram(
+    "meeting_export_seconds", "Export rendering time.", ["format"]
+)
+_M_EXPORT_CACHE = _METRICS.counter(
+    "meeting_export_cache", "Job export renderings served from / added to the cache.", ["result"]
+)
+_M_JOBS = _METRICS.counter(
+    "meeting_jobs", "Transcription jobs by outcome.", ["endpoint", "model", "quality", "outcome"]
+)
+
+
+class _TranscriptCache:
+    """Size-bounded LRU of decoded transcripts, one JSON file per key.
+
+    Recency is kept in memory and mirrored to file mtimes so the order
+    survives restarts.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        if self.max_bytes > 0:
+            self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def _load_index(self) -> None:
+        found = []
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                st = os.stat(os.path.join(self.directory, name))
+                found.append((st.st_mtime, name[: -len(".json")], st.st_size))
+        except OSError as e:
+            print("[WARN] transcript cache disabled:", e)
+            self.max_bytes = 0
+            return
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        # caller holds self._lock
+        while self._bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            _cleanup_paths(self._path(key))
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, object]]:
+        if self.max_bytes <= 0 or not key:
+            return None
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = _json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._bytes -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return payload
+
+    def put(self, key: Optional[str], payload: Dict[str, object]) -> None:
+        if self.max_bytes <= 0 or not key:
+            return
+        data = _json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            _cleanup_paths(tmp_path)
+            return
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._bytes += len(data)
+            self.stores += 1
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "enabled": self.max_bytes > 0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+_TRANSCRIPT_CACHE = _TranscriptCache(
+    TRANSCRIPT_CACHE_DIR, TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024
+)
+_BROKER = make_broker(BROKER_URL) if DEPLOY_MODE != "all" else None
+if _UPLOAD_DIR:
+    os.makedirs(_UPLOAD_DIR, exist_ok=True)
 
-    raise ValueError(f"ไม่รองรับรูปแบบไฟล์: {req.format}")
 
 def _normalize_model_name(name: Optional[str]) -> str:
     if not name:
@@ -240,7 +846,8 @@ def _normalize_language(lang: str) -> str:
     return l
 
 def _normalize_quality(q: str) -> str:
-    return (q or QUALITY_DEFAULT).strip().lower()
+    q = (q or QUALITY_DEFAULT).strip().lower()
+    return "adaptive" if q == "auto" else q
 
 app = FastAPI(title="Meeting Minutes App")
 app.add_middleware(
@@ -248,51 +855,300 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"],
 )
 
-# Lazy cache models (respect CPU threads/workers so we can tune speed)
-_models_lock = threading.Lock()
-_models: Dict[str, WhisperModel] = {}
+@app.middleware("http")
+async def _reject_oversized_uploads(request: Request, call_next):
+    # Reject before the body is read when the client announces its size.
+    if MAX_UPLOAD_BYTES and request.method in ("POST", "PUT"):
+        try:
+            length = int(request.headers.get("content-length") or 0)
+        except ValueError:
+            length = 0
+        if length > MAX_UPLOAD_BYTES:
+            exc = _upload_too_large()
+            return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+    return await call_next(request)
 
 _diarization_lock = threading.Lock()
 _diarization_pipelines: Dict[str, object] = {}
 
-def _get_model(name: str) -> WhisperModel:
-    key = _normalize_model_name(name) + f"|t{CPU_THREADS_DEFAULT}|w{NUM_WORKERS_DEFAULT}|{COMPUTE_TYPE}"
-    with _models_lock:
-        m = _models.get(key)
-        if m is None:
-            m = WhisperModel(
-                _normalize_model_name(name),
-                device="auto",
-                compute_type=COMPUTE_TYPE,
-                cpu_threads=CPU_THREADS_DEFAULT,
-                num_workers=NUM_WORKERS_DEFAULT,
+
+def _model_key(name: str, workers: int = NUM_WORKERS_DEFAULT) -> str:
+    return _normalize_model_name(name) + f"|t{CPU_THREADS_DEFAULT}|w{workers}|{COMPUTE_TYPE}"
+
+
+def _model_bytes(name: str) -> int:
+    """Approximate resident size of a model from its weights on disk."""
+    try:
+        path = (
+            name
+            if os.path.isdir(name)
+            else _lazy("faster_whisper").download_model(name, local_files_only=True)
+        )
+        weights = os.path.join(path, "model.bin")
+        return os.path.getsize(weights) if os.path.exists(weights) else 0
+    except Exception:
+        return 0
+
+
+class _ModelEntry:
+    __slots__ = (
+        "key",
+        "name",
+        "model",
+        "bytes",
+        "load_seconds",
+        "last_used",
+        "in_use",
+        "lock",
+        "workers",
+    )
+
+    def __init__(self, key: str, name: str, workers: int):
+        self.key = key
+        self.name = name
+        self.workers = workers
+        self.model = None  # faster_whisper.WhisperModel once loaded
+        self.bytes = 0
+        self.load_seconds = 0.0
+        self.last_used = 0.0
+        self.in_use = 0
+        self.lock = threading.Lock()
+
+
+class _ModelRegistry:
+    """Lazily loaded WhisperModel instances with LRU eviction of idle models.
+
+    Loading happens under a per-model lock so a slow load never blocks lookups
+    of models that are already resident.
+    """
+
+    def __init__(self, max_models: int, max_bytes: int, allowed: Optional[List[str]]):
+        self.max_models = max(1, max_models)
+        self.max_bytes = max(0, max_bytes)
+        self._allowed = set(allowed) if allowed is not None else None
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _ModelEntry]" = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def allowed_resolved(self) -> bool:
+        return self._allowed is not None
+
+    def resolve_allowed(self) -> set:
+        """The allowed model names, read from faster_whisper's stock list once.
+
+        Without ``WHISPER_ALLOWED_MODELS`` this imports faster_whisper, so it
+        runs in the warm-up at startup rather than on the event loop.
+        """
+        if self._allowed is None:
+            stock = _lazy("faster_whisper").available_models()
+            self._allowed = {_normalize_model_name(n) for n in stock}
+        return self._allowed
+
+    def is_allowed(self, name: str) -> bool:
+        normalized = _normalize_model_name(name)
+        return normalized == MODEL_SIZE_DEFAULT or normalized in self.resolve_allowed()
+
+    @contextmanager
+    def use(self, name: str, workers: int = NUM_WORKERS_DEFAULT):
+        """Pin a model for the duration of the block so it cannot be evicted.
+
+        ``workers`` is the model's ``num_workers``: how many ``transcribe``
+        calls CTranslate2 runs on it at once. Each count is its own instance.
+        """
+        entry = self._acquire(name, workers)
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+                self._evict()
+
+    def _acquire(self, name: str, workers: int) -> _ModelEntry:
+        normalized = _normalize_model_name(name)
+        if not self.is_allowed(normalized):
+            raise ValueError(f"model not allowed: {normalized}")
+        key = _model_key(normalized, workers)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _ModelEntry(key, normalized, workers)
+                self._entries[key] = entry
+            entry.in_use += 1
+            self._entries.move_to_end(key)
+        try:
+            with entry.lock:
+                if entry.model is None:
+                    started = time.perf_counter()
+                    entry.model = _lazy("faster_whisper").WhisperModel(
+                        normalized,
+                        device="auto",
+                        compute_type=COMPUTE_TYPE,
+                        cpu_threads=CPU_THREADS_DEFAULT,
+                        num_workers=entry.workers,
+                    )
+                    entry.load_seconds = time.perf_counter() - started
+                    _M_MODEL_LOAD_SECONDS.observe(entry.load_seconds, model=normalized)
+                    entry.bytes = _model_bytes(normalized)
+                    with self._lock:
+                        self.loads += 1
+        except BaseException:
+            with self._lock:
+                entry.in_use -= 1
+                if entry.model is None and entry.in_use == 0:
+                    self._entries.pop(key, None)
+            raise
+        with self._lock:
+            entry.last_used = time.time()
+            self._evict()
+        return entry
+
+    def _over_budget(self) -> bool:
+        loaded = [e for e in self._entries.values() if e.model is not None]
+        if len(loaded) > self.max_models:
+            return True
+        return bool(self.max_bytes) and sum(e.bytes for e in loaded) > self.max_bytes
+
+    def _evict(self) -> None:
+        # caller holds self._lock; models that are in use are never dropped,
+        # so the budget may be exceeded briefly while they finish.
+        while self._over_budget():
+            victim = next(
+                (e for e in self._entries.values() if e.model is not None and e.in_use == 0),
+                None,
             )
-            _models[key] = m
-        return m
+            if victim is None:
+                return
+            del self._entries[victim.key]
+            victim.model = None
+            self.evictions += 1
+
+    def loaded_keys(self) -> List[str]:
+        with self._lock:
+            return [k for k, e in self._entries.items() if e.model is not None]
+
+    def loaded_names(self) -> List[str]:
+        with self._lock:
+            return list(dict.fromkeys(e.name for e in self._entries.values() if e.model is not None))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            resident = [
+                {
+                    "key": e.key,
+                    "model": e.name,
+                    "workers": e.workers,
+                    "bytes": e.bytes,
+                    "load_seconds": round(e.load_seconds, 3),
+                    "in_use": e.in_use,
+                    "last_used": e.last_used,
+                }
+                for e in self._entries.values()
+                if e.model is not None
+            ]
+            return {
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "resident_bytes": sum(item["bytes"] for item in resident),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "resident": resident,
+            }
+
+
+_MODEL_REGISTRY = _ModelRegistry(
+    WHISPER_MAX_MODELS,
+    WHISPER_MODEL_BUDGET_MB * 1024 * 1024,
+    [_normalize_model_name(n) for n in WHISPER_ALLOWED_MODELS]
+    if WHISPER_ALLOWED_MODELS is not None
+    else None,
+)
+
+
+def _load_model(name: str) -> None:
+    """Make ``name`` resident ahead of use (warm-up).
+
+    Nothing is handed out: decoders pin the model with
+    ``_MODEL_REGISTRY.use`` for as long as they decode, so it cannot be
+    evicted under them.
+    """
+    with _MODEL_REGISTRY.use(name):
+        pass
+
+
+async def _model_allowed(name: str) -> bool:
+    if not _MODEL_REGISTRY.allowed_resolved:
+        # Only a request that beats the warm-up gets here.
+        await asyncio.get_running_loop().run_in_executor(None, _MODEL_REGISTRY.resolve_allowed)
+    return _MODEL_REGISTRY.is_allowed(name)
+
+
+async def _ensure_model_allowed(name: str) -> None:
+    if not await _model_allowed(name):
+        raise HTTPException(status_code=400, detail=f"ไม่อนุญาตให้ใช้โมเดล: {name}")
+
+class Word(BaseModel):
+    start: float
+    end: float
+    word: str
+    probability: float = 0.0
 
-# Best-effort preload default
-try:
-    _get_model(MODEL_SIZE_DEFAULT)
-except Exception as e:
-    print("[WARN] preload failed:", e)
 
 class Segment(BaseModel):
     start: float
     end: float
     text: str
     speaker: Optional[str] = None
+    words: Optional[List[Word]] = None
+
+    def as_dict(self) -> Dict[str, object]:
+        # ``words`` only appears when word timestamps were requested.
+        return self.model_dump(exclude={"words"} if self.words is None else None)
 
 
 class ExportRequest(BaseModel):
     transcript: Optional[str] = ""
     report_markdown: Optional[str] = ""
+    segments: Optional[List[Segment]] = None
+    job_id: Optional[str] = None
     include_transcript: bool = True
     include_report: bool = False
     format: str = "txt"
 
+
+def _export_renderer(req: ExportRequest, fmt: str, transcript: str, segments, meta):
+    """Pick the chunked renderer for ``fmt``; raises ``ValueError`` on bad input."""
+    report = (req.report_markdown or "").strip()
+    include_transcript = req.include_transcript and (transcript.strip() or segments)
+    include_report = req.include_report and report
+    if fmt in exporters.TIMED_FORMATS:
+        if not segments:
+            raise ValueError(f"รูปแบบ {fmt} ต้องใช้ segments ที่มีเวลา หรือ job_id")
+        return exporters.render_srt(segments) if fmt == "srt" else exporters.render_vtt(segments)
+    if not include_transcript and not include_report:
+        raise ValueError("ไม่พบข้อมูลที่จะส่งออก โปรดเลือกเนื้อหาอย่างน้อยหนึ่งรายการ")
+    if fmt == "json":
+        return exporters.render_json(
+            segments if include_transcript else None,
+            transcript.strip() if include_transcript else "",
+            report if include_report else "",
+            meta,
+        )
+    sections = []
+    if include_transcript:
+        sections.append(("Transcript", transcript, segments))
+    if include_report:
+        sections.append(("Report", report, None))
+    return exporters.render_docx(sections) if fmt == "docx" else exporters.render_txt(sections)
+
+
 def _choose_params(quality: str):
     q = _normalize_quality(quality)
-    if q == "accurate":
+    # Outside the job queue (cache keys, live sessions) adaptive means its
+    # ceiling; _job_events resolves it against the load first.
+    if q in ("accurate", "adaptive"):
         return dict(beam_size=8, vad_filter=True, temperature=0.0, best_of=1)
     if q == "balanced":
         return dict(beam_size=5, vad_filter=True, temperature=0.0, best_of=1)
@@ -301,52 +1157,248 @@ def _choose_params(quality: str):
     # hyperfast -> fastest (no VAD, greedy)
     return dict(beam_size=1, vad_filter=False, temperature=0.0, best_of=1)
 
-def _maybe_preprocess(path_in: str, enable: bool, quick: bool=False) -> str:
-    if not enable:
+# Filters of the full (not ``fast_preprocess``) preprocessing profile.
+_PREPROCESS_FILTERS = "highpass=f=100,lowpass=f=8000,loudnorm=I=-16:TP=-1.5:LRA=11"
+
+
+def _map_pcm(path: str, keep: bool = False) -> Optional[np.ndarray]:
+    """Read-only memory map of a raw f32le file; ``None`` when it is empty.
+
+    Unless ``keep`` is set the file is removed once mapped (on Windows, where
+    a mapped file cannot be removed, when the mapping is garbage collected).
+    """
+    if os.path.getsize(path) < 4:
+        _cleanup_paths(path)
+        return None
+    audio = np.memmap(path, dtype=np.float32, mode="r")
+    if not keep:
+        if os.name == "nt":
+            weakref.finalize(audio, _cleanup_paths, path)
+        else:
+            _cleanup_paths(path)
+    return audio
+
+
+def _retain_pcm(path: str) -> None:
+    """Mark retained PCM at ``path`` as just used and trim its directory.
+
+    Other retained ``.f32`` files are removed, oldest use first, until the
+    total fits ``PCM_KEEP_MAX_BYTES``; ``path`` itself always stays.
+    """
+    try:
+        os.utime(path)
+        entries = []
+        with os.scandir(os.path.dirname(path) or ".") as it:
+            for entry in it:
+                if entry.name.endswith(".f32") and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.name))
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= PCM_KEEP_MAX_BYTES:
+            break
+        if name != os.path.basename(path):
+            _cleanup_paths(os.path.join(os.path.dirname(path), name))
+            total -= size
+
+
+def _maybe_preprocess(
+    path_in: str,
+    enable: bool,
+    quick: bool = False,
+    cancel: Optional[_CancelToken] = None,
+    keep: Optional[str] = None,
+):
+    """Decode ``path_in`` once into 16 kHz mono float32 PCM.
+
+    ffmpeg does the decoding, with the preprocessing filters when ``enable``
+    is set (``quick`` keeps only the resampling). Up to
+    ``PCM_MEMMAP_SECONDS`` of audio is returned as an in-memory array; longer
+    audio is streamed to a spool file and returned as a read-only
+    ``np.memmap``. Either way the array is what faster-whisper, the
+    diarization pipeline, the VAD and the long-form chunker all read, so no
+    stage decodes the file again. Without a usable ffmpeg the audio is
+    decoded in-process instead, and ``path_in`` itself is returned only when
+    that fails too (the model then reports the error).
+
+    With ``keep`` the PCM is always spooled, retained at that path and
+    mapped from there; if the file already exists nothing is decoded.
+    """
+    if not PCM_KEEP_MAX_BYTES:
+        keep = None
+    if keep and os.path.exists(keep):
+        audio = _map_pcm(keep, keep=True)
+        if audio is not None:
+            _retain_pcm(keep)
+            return audio
+    cmd = [
+        FFMPEG_BIN,
+        "-nostdin",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        path_in,
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+    ]
+    if enable and not quick:
+        # Higher accuracy: normalize + filters
+        cmd += ["-af", _PREPROCESS_FILTERS]
+    cmd += ["-f", "f32le", "-acodec", "pcm_f32le", "pipe:1"]
+    mode = ("quick" if quick else "full") if enable else "decode"
+    started = time.perf_counter()
+    if cancel is not None and cancel.cancelled:
         return path_in
-    out = path_in + ".norm.wav"
     try:
-        if quick:
-            # Faster: only resample/mono
-            cmd = [
-                FFMPEG_BIN,
-                "-y",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-i",
-                path_in,
-                "-ac",
-                "1",
-                "-ar",
-                "16000",
-                out,
-            ]
-        else:
-            # Higher accuracy: normalize + filters
-            cmd = [
-                FFMPEG_BIN,
-                "-y",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-i",
-                path_in,
-                "-ac",
-                "1",
-                "-ar",
-                "16000",
-                "-af",
-                "highpass=f=100,lowpass=f=8000,loudnorm=I=-16:TP=-1.5:LRA=11",
-                out,
-            ]
-        subprocess.run(cmd, check=True)
-        return out
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except Exception:
+        _M_PREPROCESS_SECONDS.observe(time.perf_counter() - started, mode=mode, outcome="error")
+        return _decode_in_process(path_in, keep)
+    unregister = cancel.register(proc.kill) if cancel is not None else None
+    buffered = bytearray()
+    spool = open(keep + ".part", "wb") if keep else None
+    limit = int(PCM_MEMMAP_SECONDS * SAMPLE_RATE) * 4
+    try:
+        while True:
+            data = proc.stdout.read1(UPLOAD_CHUNK_SIZE)
+            if not data:
+                break
+            if spool is not None:
+                spool.write(data)
+                continue
+            buffered += data
+            if len(buffered) > limit:
+                os.makedirs(PCM_SPOOL_DIR, exist_ok=True)
+                spool = _tf.NamedTemporaryFile(dir=PCM_SPOOL_DIR, suffix=".f32", delete=False)
+                spool.write(buffered)
+                buffered = bytearray()
+        proc.wait()
+    finally:
+        if unregister is not None:
+            unregister()
+        if spool is not None:
+            spool.close()
+    if proc.returncode != 0:
+        outcome = "cancelled" if cancel is not None and cancel.cancelled else "error"
+        _M_PREPROCESS_SECONDS.observe(time.perf_counter() - started, mode=mode, outcome=outcome)
+        if spool is not None:
+            _cleanup_paths(spool.name)
+        return path_in if outcome == "cancelled" else _decode_in_process(path_in, keep)
+    _M_PREPROCESS_SECONDS.observe(time.perf_counter() - started, mode=mode, outcome="ok")
+    if keep:
+        os.replace(spool.name, keep)
+        audio = _map_pcm(keep, keep=True)
+        _retain_pcm(keep)
+    elif spool is not None:
+        audio = _map_pcm(spool.name)
+    else:
+        usable = len(buffered) - len(buffered) % 4
+        audio = np.frombuffer(buffered, dtype=np.float32, count=usable // 4) if usable else None
+    return audio if audio is not None else path_in
+
+
+def _decode_in_process(path_in: str, keep: Optional[str] = None):
+    try:
+        audio = _decode_audio(path_in, SAMPLE_RATE)
     except Exception:
         return path_in
+    if keep and audio.size:
+        audio.astype(np.float32, copy=False).tofile(keep + ".part")
+        os.replace(keep + ".part", keep)
+        _retain_pcm(keep)
+    return audio
+
+
+async def _preprocess_async(
+    path_in: str,
+    enable: bool,
+    quick: bool = False,
+    cancel: Optional[_CancelToken] = None,
+    keep: Optional[str] = None,
+):
+    """Run :func:`_maybe_preprocess` on the bounded preprocessing executor."""
+    return await asyncio.get_running_loop().run_in_executor(
+        _PREPROCESS_EXECUTOR, _maybe_preprocess, path_in, enable, quick, cancel, keep
+    )
+
+
+class _FfmpegStreamDecoder:
+    """Incrementally decode a byte stream to 16 kHz mono float32 through ffmpeg.
+
+    Bytes go to ffmpeg's stdin as they arrive and a reader thread collects the
+    PCM it produces, so callers can pick up decoded audio while later bytes
+    are still in flight.
+    """
+
+    def __init__(
+        self, input_args: Optional[List[str]] = None, output_args: Optional[List[str]] = None
+    ):
+        cmd = [FFMPEG_BIN, "-hide_banner", "-loglevel", "error"]
+        cmd += list(input_args or [])
+        cmd += ["-i", "pipe:0", "-ac", "1", "-ar", str(SAMPLE_RATE)]
+        cmd += list(output_args or [])
+        cmd += ["-f", "f32le", "pipe:1"]
+        self._proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self._lock = threading.Lock()
+        self._chunks: List[bytes] = []
+        self._carry = b""
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self) -> None:
+        while True:
+            data = self._proc.stdout.read1(1 << 16)
+            if not data:
+                return
+            with self._lock:
+                self._chunks.append(data)
+
+    def feed(self, data: bytes) -> None:
+        """Blocking write into ffmpeg; call it from an executor."""
+        try:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def drain(self) -> np.ndarray:
+        """Return the samples decoded since the previous call."""
+        with self._lock:
+            data = self._carry + b"".join(self._chunks)
+            self._chunks.clear()
+        usable = len(data) - len(data) % 4
+        self._carry = data[usable:]
+        return np.frombuffer(data[:usable], dtype=np.float32)
+
+    def close(self) -> np.ndarray:
+        """Signal end of input (blocking) and return the remaining samples."""
+        try:
+            self._proc.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+        self._reader.join()
+        self._proc.wait()
+        return self.drain()
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self._proc.returncode
+
+    def kill(self) -> None:
+        if self._proc.poll() is None:
+            self._proc.kill()
+
 
 def _get_diarization_pipeline(model_name: str):
-    if _DiarizationPipeline is None:
+    pyannote = _lazy("pyannote.audio", optional=True)
+    if pyannote is None:
         raise RuntimeError("pyannote.audio is not installed")
     if not DIARIZATION_AUTH_TOKEN:
         raise RuntimeError(
@@ -355,21 +1407,73 @@ def _get_diarization_pipeline(model_name: str):
     with _diarization_lock:
         pipeline = _diarization_pipelines.get(model_name)
         if pipeline is None:
-            pipeline = _DiarizationPipeline.from_pretrained(
+            pipeline = pyannote.Pipeline.from_pretrained(
                 model_name, use_auth_token=DIARIZATION_AUTH_TOKEN
             )
             device = DIARIZATION_DEVICE_ENV
+            torch = _lazy("torch", optional=True)
             if device:
                 pipeline.to(device)
-            elif _torch is not None and _torch.cuda.is_available():
+            elif torch is not None and torch.cuda.is_available():
                 pipeline.to("cuda")
             _diarization_pipelines[model_name] = pipeline
         return pipeline
 
+def _diarization_input(audio):
+    if isinstance(audio, np.ndarray):
+        torch = _lazy("torch", optional=True)
+        if torch is None:
+            raise RuntimeError("torch is not installed")
+        with warnings.catch_warnings():
+            # Shares the (possibly read-only, memory-mapped) job buffer
+            # instead of copying it; pyannote never writes to the waveform.
+            warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+            waveform = torch.from_numpy(audio).unsqueeze(0)
+        return {"waveform": waveform, "sample_rate": SAMPLE_RATE}
+    return audio
+
+def _run_builtin_diarization(audio, cancel: Optional[_CancelToken] = None) -> Dict[str, object]:
+    model = DIARIZATION_BUILTIN
+    started = time.perf_counter()
+    try:
+        if not isinstance(audio, np.ndarray):
+            audio = _decode_audio(audio, SAMPLE_RATE)
+        # The same Silero VAD the decode uses; turns stop at real pauses.
+        speech = _speech_timestamps(audio, min_silence_duration_ms=300)
+        speaker_segments = _lazy("diarizer").diarize(
+            audio,
+            speech,
+            max_speakers=DIARIZATION_MAX_SPEAKERS,
+            should_stop=lambda: cancel is not None and cancel.cancelled,
+        )
+    except Exception as exc:
+        # diarizer.Cancelled, raised once the token is set
+        cancelled = cancel is not None and cancel.cancelled
+        _M_DIARIZATION_SECONDS.observe(
+            time.perf_counter() - started, model=model, outcome="cancelled" if cancelled else "error"
+        )
+        return {
+            "applied": False,
+            "reason": "cancelled" if cancelled else str(exc),
+            "segments": [],
+            "model": model,
+        }
+    _M_DIARIZATION_SECONDS.observe(time.perf_counter() - started, model=model, outcome="ok")
+    return {
+        "applied": True,
+        "reason": None,
+        "segments": speaker_segments,
+        "model": model,
+    }
+
 def _run_diarization(
-    wav_path: str, model_name: Optional[str] = None
+    audio, model_name: Optional[str] = None, cancel: Optional[_CancelToken] = None
 ) -> Dict[str, object]:
     model = model_name or DIARIZATION_MODEL_DEFAULT
+    if cancel is not None and cancel.cancelled:
+        return {"applied": False, "reason": "cancelled", "segments": [], "model": model}
+    if model == DIARIZATION_BUILTIN:
+        return _run_builtin_diarization(audio, cancel)
     try:
         pipeline = _get_diarization_pipeline(model)
     except Exception as exc:  # pragma: no cover - runtime dependent
@@ -379,15 +1483,27 @@ def _run_diarization(
             "segments": [],
             "model": model,
         }
+    def _hook(*args, **kwargs) -> None:
+        # pyannote calls the hook after every pipeline step; raising aborts it.
+        if cancel is not None and cancel.cancelled:
+            raise _JobCancelled()
+
+    started = time.perf_counter()
     try:
-        diarization = pipeline(wav_path)
+        diarization = pipeline(_diarization_input(audio), hook=_hook)
     except Exception as exc:  # pragma: no cover - runtime dependent
+        _M_DIARIZATION_SECONDS.observe(
+            time.perf_counter() - started,
+            model=model,
+            outcome="cancelled" if isinstance(exc, _JobCancelled) else "error",
+        )
         return {
             "applied": False,
             "reason": str(exc),
             "segments": [],
             "model": model,
         }
+    _M_DIARIZATION_SECONDS.observe(time.perf_counter() - started, model=model, outcome="ok")
     speaker_segments = []
     for turn, _, speaker in diarization.itertracks(yield_label=True):
         speaker_segments.append(
@@ -405,47 +1521,1489 @@ def _run_diarization(
     }
 
 def _assign_speakers_to_segments(
-    segments: List[Segment], speaker_segments: List[Dict[str, object]]
-) -> None:
+    segments: List[Segment],
+    speaker_segments: List[Dict[str, object]],
+    words: Optional[List[List[object]]] = None,
+) -> List[Segment]:
+    """Label segments with the speaker they overlap most.
+
+    When ``words`` (per-segment lists of faster-whisper word objects) is given,
+    a segment spanning a speaker change is split at the word boundary.
+    """
     if not segments or not speaker_segments:
-        return
-    for seg in segments:
-        best_label = None
-        best_overlap = 0.0
-        for entry in speaker_segments:
-            try:
-                s0 = float(entry.get("start", 0.0))
-                e0 = float(entry.get("end", 0.0))
-            except Exception:
-                continue
-            overlap = max(0.0, min(seg.end, e0) - max(seg.start, s0))
-            if overlap > best_overlap:
-                best_overlap = overlap
-                best_label = str(entry.get("speaker", ""))
-        if best_label:
-            seg.speaker = best_label
+        return segments
+    timeline = SpeakerTimeline(speaker_segments)
+    if not timeline:
+        return segments
+    labels = timeline.assign(
+        np.fromiter((s.start for s in segments), dtype=np.float64, count=len(segments)),
+        np.fromiter((s.end for s in segments), dtype=np.float64, count=len(segments)),
+    )
+    if words is None:
+        for seg, label in zip(segments, labels):
+            if label:
+                seg.speaker = label
+        return segments
 
-@app.get("/healthz")
-async def healthz():
-    queue_stats = await _JOB_QUEUE.stats()
-    return {
-        "ok": True,
-        "default_model": _normalize_model_name(MODEL_SIZE_DEFAULT),
-        "default_language": LANGUAGE_DEFAULT,
-        "default_quality": QUALITY_DEFAULT,
-        "host": HOST_DEFAULT,
-        "port": PORT_DEFAULT,
-        "cpu_threads": CPU_THREADS_DEFAULT,
-        "num_workers": NUM_WORKERS_DEFAULT,
+    flat = [w for seg_words in words for w in (seg_words or [])]
+    word_labels = timeline.assign(
+        np.fromiter((w.start for w in flat), dtype=np.float64, count=len(flat)),
+        np.fromiter((w.end for w in flat), dtype=np.float64, count=len(flat)),
+    )
+    result: List[Segment] = []
+    cursor = 0
+    for seg, label, seg_words in zip(segments, labels, words):
+        seg_words = seg_words or []
+        seg_labels = word_labels[cursor : cursor + len(seg_words)]
+        cursor += len(seg_words)
+        runs = speaker_runs(seg_labels)
+        if len(runs) <= 1:
+            run_label = runs[0][2] if runs else None
+            if run_label or label:
+                seg.speaker = run_label or label
+            result.append(seg)
+            continue
+        for first, last, run_label in runs:
+            part = seg_words[first:last]
+            result.append(
+                Segment(
+                    start=part[0].start,
+                    end=part[-1].end,
+                    text="".join(w.word for w in part),
+                    speaker=run_label,
+                    words=part,
+                )
+            )
+    return result
+
+_INFERENCE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=TRANSCRIBE_CONCURRENCY, thread_name_prefix="whisper"
+)
+_PREPROCESS_EXECUTOR = ThreadPoolExecutor(
+    max_workers=PREPROCESS_CONCURRENCY, thread_name_prefix="ffmpeg"
+)
+_DIARIZATION_EXECUTOR = ThreadPoolExecutor(
+    max_workers=DIARIZATION_CONCURRENCY, thread_name_prefix="diarization"
+)
+_LONGFORM_EXECUTOR = ThreadPoolExecutor(
+    max_workers=LONGFORM_WORKERS, thread_name_prefix="whisper-chunk"
+)
+# Clip planning for batched jobs: never queued behind the batches themselves
+_BATCH_CLIPS_EXECUTOR = ThreadPoolExecutor(
+    max_workers=PREPROCESS_CONCURRENCY, thread_name_prefix="batch-clips"
+)
+
+
+def _ndjson(payload: Dict[str, object]) -> bytes:
+    return (_json.dumps(payload) + "\n").encode("utf-8")
+
+
+def _normalize_layout(layout: Optional[str]) -> str:
+    name = (layout or "objects").strip().lower()
+    if name not in response_encoding.LAYOUTS:
+        raise HTTPException(status_code=400, detail="layout ต้องเป็น objects หรือ columnar")
+    return name
+
+
+def _with_layout(payload: Dict[str, object], layout: str) -> Dict[str, object]:
+    """Apply ``layout`` to a finished result (or ``done`` event); other events pass through."""
+    if layout != "columnar" or not isinstance(payload.get("segments"), list):
+        return payload
+    if payload.get("event") not in (None, "done"):
+        return payload
+    return response_encoding.columnar_result(payload)
+
+
+def _encoded_response(request: Request, payload: Dict[str, object]) -> Response:
+    """JSON or MessagePack body per ``Accept``, gzipped per ``Accept-Encoding``."""
+    media_type, use_gzip = response_encoding.negotiate(
+        request.headers.get("accept", ""), request.headers.get("accept-encoding", "")
+    )
+    body, headers = response_encoding.encode(payload, media_type, use_gzip)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _ndjson_response(request: Request, chunks) -> StreamingResponse:
+    if response_encoding.negotiate("", request.headers.get("accept-encoding", ""))[1]:
+        return StreamingResponse(
+            response_encoding.gzip_stream(chunks),
+            media_type="application/x-ndjson",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
+
+
+def _upload_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"ไฟล์มีขนาดเกินกำหนด (สูงสุด {MAX_UPLOAD_MB} MB)",
+    )
+
+
+def _client_key(connection) -> str:
+    """Fair-share key: the ``X-Client-Id`` header, else the peer address."""
+    key = connection.headers.get("x-client-id") or (
+        connection.client.host if connection.client else ""
+    )
+    return (key or "anonymous").strip()[:128]
+
+
+def _normalize_priority(priority: Optional[str]) -> str:
+    value = (priority or "normal").strip().lower()
+    if value not in JOB_PRIORITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"priority ต้องเป็นหนึ่งใน {', '.join(JOB_PRIORITIES)}",
+        )
+    return value
+
+
+def _queue_full(exc: _QueueFull) -> HTTPException:
+    return HTTPException(
+        status_code=429, detail=exc.reason, headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+async def _admit(client: str) -> None:
+    """Reject with 429 before an upload is spooled if the job could not be queued."""
+    try:
+        await _JOB_QUEUE.check_admission(client)
+    except _QueueFull as exc:
+        raise _queue_full(exc)
+
+
+async def _enqueue_upload(client: str, priority: str, path: str) -> _JobTicket:
+    """Queue a spooled upload, costed by its size until the real length is known."""
+    try:
+        cost = os.path.getsize(path) / QUEUE_COST_BYTES_PER_SECOND
+        return await _JOB_QUEUE.enqueue(priority, client, cost)
+    except _QueueFull as exc:
+        _cleanup_paths(path)
+        raise _queue_full(exc)
+
+
+async def _iter_upload_file(file: UploadFile):
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _spool_upload(
+    chunks, suffix: str = ".bin", endpoint: str = "", directory: Optional[str] = None, tap=None
+):
+    """Write an async stream of byte chunks to a temp file.
+
+    Memory stays bounded by one chunk; file writes run off the event loop and
+    the upload is aborted with 413 as soon as it exceeds ``MAX_UPLOAD_BYTES``.
+    ``tap``, if given, is awaited with every chunk once it is stored.
+    Returns ``(path, sha256_hexdigest)`` of the stored bytes.
+    """
+    loop = asyncio.get_running_loop()
+    directory = directory or _UPLOAD_DIR
+    tmp = await loop.run_in_executor(
+        None, lambda: _tf.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory)
+    )
+    hasher = hashlib.sha256()
+
+    def _write(chunk: bytes) -> None:
+        hasher.update(chunk)
+        tmp.write(chunk)
+
+    size = 0
+    started = time.perf_counter()
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if MAX_UPLOAD_BYTES and size > MAX_UPLOAD_BYTES:
+                raise _upload_too_large()
+            await loop.run_in_executor(None, _write, chunk)
+            if tap is not None:
+                await tap(chunk)
+    except BaseException:
+        tmp.close()
+        _cleanup_paths(tmp.name)
+        raise
+    await loop.run_in_executor(None, tmp.close)
+    _M_UPLOAD_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    _M_UPLOAD_BYTES.observe(size, endpoint=endpoint)
+    return tmp.name, hasher.hexdigest()
+
+
+def _threadsafe_put(loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+    def _put(item) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # loop already closed (server shutting down)
+
+    return _put
+
+
+async def _drain_inference_queue(queue: asyncio.Queue):
+    while True:
+        kind, item = await queue.get()
+        if kind == "end":
+            return
+        if kind == "error":
+            raise item
+        yield kind, item
+
+
+async def _iter_transcription(model_size: str, audio, **kwargs):
+    """Decode ``audio`` on the inference executor.
+
+    Yields ``("info", info)`` once and then ``("segment", seg)`` for every
+    segment faster-whisper produces. Model loading and decoding both happen on
+    the worker thread; the event loop only awaits the hand-off queue.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    _put = _threadsafe_put(loop, queue)
+    stop = threading.Event()
+
+    def _worker() -> None:
+        try:
+            if stop.is_set():
+                return
+            with _MODEL_REGISTRY.use(model_size) as model:
+                segments_gen, info = model.transcribe(audio, **kwargs)
+                _put(("info", info))
+                for seg in segments_gen:
+                    if stop.is_set():
+                        # Consumer went away: stop at this segment boundary.
+                        segments_gen.close()
+                        return
+                    _put(("segment", seg))
+        except BaseException as exc:
+            _put(("error", exc))
+        finally:
+            _put(("end", None))
+
+    loop.run_in_executor(_INFERENCE_EXECUTOR, _worker)
+    try:
+        async for kind, item in _drain_inference_queue(queue):
+            yield kind, item
+    finally:
+        stop.set()
+
+
+def _word_dicts(words, offset: float = 0.0) -> Optional[List[Dict[str, object]]]:
+    """faster-whisper ``Word`` tuples as plain dicts, shifted by ``offset`` seconds.
+
+    Words that are already dicts (batched, long-form and cached decoders) are
+    passed through with the same shift.
+    """
+    if not words:
+        return None
+    result = []
+    for w in words:
+        if isinstance(w, dict):
+            w = SimpleNamespace(**w)
+        result.append(
+            {
+                "start": w.start + offset,
+                "end": w.end + offset,
+                "word": w.word,
+                "probability": getattr(w, "probability", 0.0),
+            }
+        )
+    return result
+
+
+def _batch_clips(audio: np.ndarray, vad_filter: bool) -> List[tuple]:
+    """Sample ranges of at most 30 s, the unit BatchedInferencePipeline decodes."""
+    window = 30 * SAMPLE_RATE
+    if not vad_filter:
+        return [(start, min(start + window, len(audio))) for start in range(0, len(audio), window)]
+    speech = _speech_timestamps(audio, max_speech_duration_s=30, min_silence_duration_ms=160)
+    clips: List[list] = []
+    for region in speech:
+        if clips and region["end"] - clips[-1][0] <= window:
+            clips[-1][1] = region["end"]
+        else:
+            clips.append([region["start"], region["end"]])
+    return [tuple(clip) for clip in clips]
+
+
+def _batch_key(model_size: str, kwargs: Dict[str, object]) -> str:
+    """Jobs with equal keys can share one BatchedInferencePipeline call."""
+    params = {k: v for k, v in kwargs.items() if k != "vad_filter"}  # only shapes the clips
+    return _json.dumps([model_size, params], sort_keys=True, default=str)
+
+
+class _BatchItem:
+    __slots__ = ("audio", "clips", "put", "cancelled")
+
+    def __init__(self, audio: np.ndarray, clips: List[tuple], put):
+        self.audio = audio
+        self.clips = clips
+        self.put = put
+        self.cancelled = False
+
+
+class _BatchGroup:
+    __slots__ = ("model_size", "kwargs", "items")
+
+    def __init__(self, model_size: str, kwargs: Dict[str, object]):
+        self.model_size = model_size
+        self.kwargs = kwargs
+        self.items: List[_BatchItem] = []
+
+
+class _BatchScheduler:
+    """Groups compatible active jobs into one BatchedInferencePipeline call.
+
+    Jobs with the same model, language, decode parameters and prompt are
+    concatenated and decoded together; each job's 30 s clips become entries
+    of ``clip_timestamps`` and the resulting segments are routed back to the
+    job they came from. A group is flushed once it holds ``batch_size`` clips
+    or ``max_wait`` seconds after its first job arrived. A new group also
+    pulls compatible jobs still waiting in ``_JOB_QUEUE`` in as riders, so a
+    batch is not limited to jobs that already hold a decode slot.
+    """
+
+    def __init__(self, batch_size: int, max_wait: float):
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._groups: Dict[tuple, _BatchGroup] = {}
+        self.batches = 0
+        self.jobs = 0
+
+    def submit(self, model_size: str, kwargs: Dict[str, object], item: _BatchItem) -> None:
+        # Called on the event loop. Language detection runs once per batch, so
+        # jobs without an explicit language are never grouped with others.
+        key = (_batch_key(model_size, kwargs),)
+        if kwargs.get("language") is None:
+            key += (id(item),)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _BatchGroup(model_size, kwargs)
+            asyncio.get_running_loop().call_later(self.max_wait, self._flush, key, group)
+            if len(key) == 1 and self.batch_size > len(item.clips):
+                asyncio.ensure_future(_JOB_QUEUE.admit_riders(key[0], self.batch_size - len(item.clips)))
+        group.items.append(item)
+        if sum(len(i.clips) for i in group.items) >= self.batch_size:
+            self._flush(key, group)
+
+    def withdraw(self, item: _BatchItem) -> None:
+        """Drop a cancelled job: out of its pending group, or skipped once running."""
+        item.cancelled = True
+        for key, group in list(self._groups.items()):
+            if item in group.items:
+                group.items.remove(item)
+                if not group.items:
+                    del self._groups[key]
+                return
+
+    def _flush(self, key: tuple, group: _BatchGroup) -> None:
+        if self._groups.get(key) is not group:
+            return  # already flushed because it filled up
+        del self._groups[key]
+        self.batches += 1
+        self.jobs += len(group.items)
+        asyncio.get_running_loop().run_in_executor(_INFERENCE_EXECUTOR, self._run, group)
+
+    def _run(self, group: _BatchGroup) -> None:
+        items = [item for item in group.items if not item.cancelled]
+        offsets: List[float] = []
+        clips: List[Dict[str, float]] = []
+        position = 0
+        for item in items:
+            offsets.append(position / SAMPLE_RATE)
+            clips += [
+                {"start": (position + s) / SAMPLE_RATE, "end": (position + e) / SAMPLE_RATE}
+                for s, e in item.clips
+            ]
+            position += len(item.audio)
+        finished = 0
+        try:
+            with _MODEL_REGISTRY.use(group.model_size) as model:
+                language = group.kwargs.get("language")
+                if clips:
+                    combined = (
+                        np.concatenate([i.audio for i in items]) if len(items) > 1 else items[0].audio
+                    )
+                    segments_gen, info = _lazy("faster_whisper").BatchedInferencePipeline(model).transcribe(
+                        combined,
+                        clip_timestamps=clips,
+                        batch_size=self.batch_size,
+                        vad_filter=False,
+                        **group.kwargs,
+                    )
+                    language = getattr(info, "language", language)
+                else:
+                    segments_gen = iter(())
+                for item in items:
+                    item.put(
+                        ("info", SimpleNamespace(language=language, duration=len(item.audio) / SAMPLE_RATE))
+                    )
+                for seg in segments_gen:
+                    if all(item.cancelled for item in items[finished:]):
+                        segments_gen.close()
+                        break
+                    owner = max(0, bisect.bisect_right(offsets, seg.start) - 1)
+                    while finished < owner:
+                        items[finished].put(("end", None))
+                        finished += 1
+                    offset = offsets[owner]
+                    items[owner].put(
+                        (
+                            "segment",
+                            SimpleNamespace(
+                                start=seg.start - offset,
+                                end=seg.end - offset,
+                                text=seg.text,
+                                words=_word_dicts(getattr(seg, "words", None), -offset),
+                            ),
+                        )
+                    )
+        except BaseException as exc:
+            for item in items[finished:]:
+                item.put(("error", exc))
+        finally:
+            for item in items[finished:]:
+                item.put(("end", None))
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": WHISPER_BATCHING,
+            "batch_size": self.batch_size,
+            "max_wait_ms": int(self.max_wait * 1000),
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "pending_groups": len(self._groups),
+        }
+
+
+_BATCH_SCHEDULER = _BatchScheduler(WHISPER_BATCH_SIZE, BATCH_MAX_WAIT_MS / 1000.0)
+
+
+async def _iter_batched_transcription(model_size: str, audio, **kwargs):
+    """Decode ``audio`` through the cross-job batch scheduler.
+
+    Yields the same items as :func:`_iter_transcription`.
+    """
+    loop = asyncio.get_running_loop()
+    if not isinstance(audio, np.ndarray):
+        audio = await loop.run_in_executor(_BATCH_CLIPS_EXECUTOR, _decode_audio, audio, SAMPLE_RATE)
+    vad_filter = bool(kwargs.pop("vad_filter", True))
+    clips = await loop.run_in_executor(_BATCH_CLIPS_EXECUTOR, _batch_clips, audio, vad_filter)
+    queue: asyncio.Queue = asyncio.Queue()
+    batch_item = _BatchItem(audio, clips, _threadsafe_put(loop, queue))
+    _BATCH_SCHEDULER.submit(model_size, kwargs, batch_item)
+    try:
+        async for kind, item in _drain_inference_queue(queue):
+            yield kind, item
+    finally:
+        _BATCH_SCHEDULER.withdraw(batch_item)
+
+
+def _plan_chunks(audio: np.ndarray, target_seconds: float) -> List[tuple]:
+    """Split ``audio`` into ``(start, end)`` sample ranges cut inside silences.
+
+    Each chunk grows until it holds at least ``target_seconds`` of audio and is
+    then cut halfway through the next pause the VAD finds, so no word is split
+    across two chunks.
+    """
+    total = len(audio)
+    target = int(target_seconds * SAMPLE_RATE)
+    if total <= target:
+        return [(0, total)]
+    speech = _speech_timestamps(audio, min_silence_duration_ms=500)
+    bounds = []
+    chunk_start = 0
+    for current, following in zip(speech, speech[1:]):
+        if current["end"] - chunk_start < target:
+            continue
+        cut = (current["end"] + following["start"]) // 2
+        bounds.append((chunk_start, cut))
+        chunk_start = cut
+    bounds.append((chunk_start, total))
+    return bounds
+
+
+def _stitch_segments(previous: Optional[SimpleNamespace], segments: List[SimpleNamespace]):
+    """Drop boundary duplicates and keep timestamps monotonic across chunks."""
+    stitched = []
+    for seg in segments:
+        if previous is not None and seg.start < previous.end:
+            if seg.text.strip() == previous.text.strip():
+                continue
+            seg.start = previous.end
+            seg.end = max(seg.end, seg.start)
+        stitched.append(seg)
+        previous = seg
+    return stitched
+
+
+async def _iter_longform_transcription(model_size: str, audio, **kwargs):
+    """Decode silence-aligned chunks concurrently on the long-form executor.
+
+    Yields the same ``("info", ...)``/``("segment", ...)`` items as
+    :func:`_iter_transcription`, in chronological order and with absolute
+    timestamps, while later chunks are still decoding.
+    """
+    loop = asyncio.get_running_loop()
+    if not isinstance(audio, np.ndarray):
+        audio = await loop.run_in_executor(_LONGFORM_EXECUTOR, _decode_audio, audio, SAMPLE_RATE)
+    bounds = await loop.run_in_executor(
+        _LONGFORM_EXECUTOR, _plan_chunks, audio, LONGFORM_CHUNK_SECONDS
+    )
+    language = kwargs.pop("language", None)
+    stop = threading.Event()
+
+    def _detect(start: int, end: int) -> Optional[str]:
+        # transcribe() detects the language before returning; its segments
+        # are lazy, so closing them unread costs no decoding.
+        clip = audio[start : min(end, start + 30 * SAMPLE_RATE)]
+        with _MODEL_REGISTRY.use(model_size, LONGFORM_MODEL_WORKERS) as model:
+            segments_gen, info = model.transcribe(clip, language=None, **kwargs)
+            segments_gen.close()
+        return getattr(info, "language", None)
+
+    def _decode(start: int, end: int, chunk_language: Optional[str]):
+        offset = start / SAMPLE_RATE
+        segments = []
+        with _MODEL_REGISTRY.use(model_size, LONGFORM_MODEL_WORKERS) as model:
+            segments_gen, info = model.transcribe(
+                audio[start:end], language=chunk_language, **kwargs
+            )
+            for seg in segments_gen:
+                if stop.is_set():
+                    segments_gen.close()
+                    break
+                segments.append(
+                    SimpleNamespace(
+                        start=seg.start + offset,
+                        end=seg.end + offset,
+                        text=seg.text,
+                        words=_word_dicts(getattr(seg, "words", None), offset),
+                    )
+                )
+        return getattr(info, "language", chunk_language), segments
+
+    futures = []
+    try:
+        if language is None:
+            # Detect once, on the start of the first chunk, so every chunk
+            # decodes in one language and none waits for another's decode.
+            language = await loop.run_in_executor(_LONGFORM_EXECUTOR, _detect, *bounds[0])
+        futures = [
+            loop.run_in_executor(_LONGFORM_EXECUTOR, _decode, start, end, language)
+            for start, end in bounds
+        ]
+        yield "info", SimpleNamespace(
+            language=language, duration=len(audio) / SAMPLE_RATE, chunks=len(bounds)
+        )
+        previous = None
+        for future in futures:
+            _, segments = await future
+            for seg in _stitch_segments(previous, segments):
+                previous = seg
+                yield "segment", seg
+    finally:
+        # Chunks not started yet are dropped; running ones stop at a segment.
+        stop.set()
+        for future in futures:
+            future.cancel()
+
+
+def _next_chunk_cut(audio: np.ndarray, target: int) -> Optional[int]:
+    """Where to cut the next upload chunk off ``audio``, or ``None`` for "not yet".
+
+    Like :func:`_plan_chunks`, the cut goes halfway through the first pause
+    after ``target`` samples, but only once speech has resumed after it, so
+    the pause is known to be complete. Audio without such a pause is cut hard
+    at twice the target to keep chunks bounded.
+    """
+    if len(audio) < target:
+        return None
+    speech = _speech_timestamps(audio, min_silence_duration_ms=500)
+    if not speech:
+        # Silence so far: keep a second that may hold the next word's onset.
+        return len(audio) - SAMPLE_RATE
+    for current, following in zip(speech, speech[1:]):
+        if current["end"] >= target:
+            return (current["end"] + following["start"]) // 2
+    if len(audio) >= 2 * target:
+        return 2 * target
+    return None
+
+
+class _PipelinedUpload:
+    """An upload decoded and cut into chunks while its bytes are still arriving.
+
+    Every chunk of the request body goes to an incremental ffmpeg decoder as
+    it is spooled; decoded audio is cut at a pause once it holds
+    ``STREAM_UPLOAD_CHUNK_SECONDS`` and queued for
+    :func:`_iter_pipelined_transcription`, so transcription overlaps the rest
+    of the upload. ``audio`` resolves to the whole recording (for
+    diarization) after the last byte. When ffmpeg cannot decode the stream
+    from a pipe (an MP4 with its index at the end, say) the spooled file is
+    decoded instead, after the upload.
+    """
+
+    RETRY_SAMPLES = 5 * SAMPLE_RATE  # new audio needed before looking for a cut again
+
+    def __init__(self, expected_bytes: int, preprocess: bool, fast_preprocess: bool):
+        self._filtered = preprocess and not fast_preprocess
+        self._decoder = _FfmpegStreamDecoder(
+            output_args=["-af", _PREPROCESS_FILTERS] if self._filtered else None
+        )
+        self.expected_bytes = expected_bytes
+        self.received = 0
+        self.audio_hash: Optional[str] = None
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.first_chunk = asyncio.Event()
+        self.audio: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.fallback = False
+        self.started = time.perf_counter()
+        self.ingested: Optional[float] = None
+        self.decode_spans: List[tuple] = []
+        self._pending: List[np.ndarray] = []
+        self._emitted: List[np.ndarray] = []
+        self._samples = 0
+        self._cut_at = 0
+        self._retry_at = 0
+
+    def estimated_duration(self) -> float:
+        """Seconds of audio, extrapolated from the bytes received until the upload ends."""
+        seconds = self._samples / SAMPLE_RATE
+        if self.ingested is None and self.expected_bytes > self.received > 0:
+            seconds *= self.expected_bytes / self.received
+        return seconds
+
+    def _add(self, samples: np.ndarray) -> None:
+        if samples.size:
+            self._pending.append(samples)
+            self._samples += samples.size
+
+    def _emit(self, length: int) -> None:
+        tail = np.concatenate(self._pending) if len(self._pending) != 1 else self._pending[0]
+        chunk = tail[:length]
+        self._pending = [tail[length:]] if length < len(tail) else []
+        self.chunks.put_nowait((self._cut_at, chunk))
+        self._emitted.append(chunk)
+        self._cut_at += length
+        self.first_chunk.set()
+
+    async def _cut(self) -> None:
+        loop = asyncio.get_running_loop()
+        target = int(STREAM_UPLOAD_CHUNK_SECONDS * SAMPLE_RATE)
+        while self._samples - self._cut_at >= target and self._samples >= self._retry_at:
+            self._pending = [np.concatenate(self._pending)]
+            cut = await loop.run_in_executor(
+                _PREPROCESS_EXECUTOR, _next_chunk_cut, self._pending[0], target
+            )
+            if cut is None:
+                self._retry_at = self._samples + self.RETRY_SAMPLES
+                return
+            self._emit(cut)
+
+    async def feed(self, data: bytes) -> None:
+        """``_spool_upload`` tap: decode ``data`` and queue any chunk that is complete."""
+        self.received += len(data)
+        await asyncio.get_running_loop().run_in_executor(None, self._decoder.feed, data)
+        self._add(self._decoder.drain())
+        await self._cut()
+
+    async def _decode_file(self, path: str) -> None:
+        loop = asyncio.get_running_loop()
+        self.fallback = True
+        audio = await loop.run_in_executor(
+            _PREPROCESS_EXECUTOR, _maybe_preprocess, path, True, not self._filtered
+        )
+        if not isinstance(audio, np.ndarray):
+            audio = await loop.run_in_executor(_PREPROCESS_EXECUTOR, _decode_audio, path, SAMPLE_RATE)
+        self._pending, self._samples = [], 0
+        self._add(audio)
+        bounds = await loop.run_in_executor(
+            _PREPROCESS_EXECUTOR, _plan_chunks, audio, STREAM_UPLOAD_CHUNK_SECONDS
+        )
+        for start, end in bounds:
+            if end > start:
+                self._emit(end - start)
+
+    async def finish(self, path: str, audio_hash: str) -> None:
+        """Queue the last chunk after the final byte and publish ``audio``.
+
+        Decoding errors are handed to the transcription side through
+        ``chunks``, the same way a decoder error ends any other job.
+        """
+        loop = asyncio.get_running_loop()
+        self.ingested = time.perf_counter()
+        self.audio_hash = audio_hash
+        try:
+            self._add(await loop.run_in_executor(None, self._decoder.close))
+            if not self._emitted and (self._decoder.returncode != 0 or not self._samples):
+                await self._decode_file(path)
+            elif self._samples > self._cut_at:
+                self._emit(self._samples - self._cut_at)
+            self.chunks.put_nowait(None)
+            if not self.audio.done():
+                audio = np.concatenate(self._emitted) if self._emitted else np.zeros(0, np.float32)
+                self.audio.set_result(audio)
+        except Exception as exc:
+            self.chunks.put_nowait(exc)
+            if not self.audio.done():
+                self.audio.cancel()
+        finally:
+            self.first_chunk.set()
+
+    def abort(self) -> None:
+        self._decoder.kill()
+        if not self.audio.done():
+            self.audio.cancel()
+
+    def timings(self, finished: float) -> Dict[str, object]:
+        """Ingest/decode overlap for the ``done`` event's ``upload`` field."""
+        ingested = self.ingested or finished
+        decode = sum(end - start for start, end in self.decode_spans)
+        overlap = sum(max(0.0, min(end, ingested) - start) for start, end in self.decode_spans)
+        return {
+            "pipelined": not self.fallback,
+            "chunks": len(self._emitted),
+            "ingest_seconds": round(ingested - self.started, 3),
+            "decode_seconds": round(decode, 3),
+            "overlap_seconds": round(overlap, 3),
+            "tail_seconds": round(finished - ingested, 3),
+        }
+
+
+async def _iter_pipelined_transcription(model_size: str, upload: _PipelinedUpload, **kwargs):
+    """Decode the chunks of a :class:`_PipelinedUpload` as they are cut.
+
+    Yields the same items as :func:`_iter_transcription` with absolute
+    timestamps. ``info`` is repeated before every chunk because the duration
+    is only an estimate until the upload is complete; the language detected
+    on the first chunk is kept for the rest.
+    """
+    language = kwargs.pop("language", None)
+    previous = None
+    while True:
+        chunk = await upload.chunks.get()
+        if chunk is None:
+            return
+        if isinstance(chunk, BaseException):
+            raise chunk
+        start, audio = chunk
+        offset = start / SAMPLE_RATE
+        started = time.perf_counter()
+        decoding = _iter_transcription(model_size, audio, language=language, **kwargs)
+        try:
+            async with aclosing(decoding):
+                async for kind, item in decoding:
+                    if kind == "info":
+                        language = language or getattr(item, "language", None)
+                        yield "info", SimpleNamespace(
+                            language=language, duration=upload.estimated_duration()
+                        )
+                        continue
+                    shifted = SimpleNamespace(
+                        start=item.start + offset,
+                        end=item.end + offset,
+                        text=item.text,
+                        words=_word_dicts(getattr(item, "words", None), offset),
+                    )
+                    for seg in _stitch_segments(previous, [shifted]):
+                        previous = seg
+                        yield "segment", seg
+        finally:
+            upload.decode_spans.append((started, time.perf_counter()))
+
+
+async def _diarize_async(audio_future, cancel: Optional[_CancelToken] = None) -> Dict[str, object]:
+    audio = await audio_future
+    return await asyncio.get_running_loop().run_in_executor(
+        _DIARIZATION_EXECUTOR,
+        _run_diarization,
+        audio,
+        os.getenv("DIARIZATION_MODEL", DIARIZATION_MODEL_DEFAULT),
+        cancel,
+    )
+
+
+def _timeline_from(diarizing: "asyncio.Future") -> Optional[SpeakerTimeline]:
+    if diarizing.cancelled() or diarizing.exception() is not None:
+        return None
+    result = diarizing.result()
+    if not result.get("applied"):
+        return None
+    return SpeakerTimeline(result["segments"])
+
+
+async def _watch_diarization(source, diarizing: Optional["asyncio.Future"]):
+    """Pass ``source`` through, plus ``("diarized", None)`` as soon as ``diarizing`` ends.
+
+    Without the marker a stream would only notice finished diarization when
+    the next segment arrives, which on a slow decode can be much later.
+    """
+    pending = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(source.__anext__())
+            if diarizing is not None and not diarizing.done():
+                await asyncio.wait({pending, diarizing}, return_when=asyncio.FIRST_COMPLETED)
+                if not pending.done():
+                    yield "diarized", None
+            try:
+                kind, item = await pending
+            except StopAsyncIteration:
+                return
+            yield kind, item
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except BaseException:
+                pass
+        await source.aclose()
+
+
+def _reprice_from_audio(ticket: _JobTicket, preprocessing: asyncio.Future) -> None:
+    if preprocessing.cancelled() or preprocessing.exception() is not None:
+        return
+    audio = preprocessing.result()
+    if isinstance(audio, np.ndarray) and not ticket._event.is_set():
+        asyncio.ensure_future(ticket.update_cost(len(audio) / SAMPLE_RATE))
+
+
+def _mark_batchable(ticket: _JobTicket, preprocessing: asyncio.Future, batch_key: str) -> None:
+    if preprocessing.cancelled() or preprocessing.exception() is not None:
+        return
+    if isinstance(preprocessing.result(), np.ndarray):
+        ticket.batch_key = batch_key
+
+
+def _transcript_cache_key(
+    audio_hash: Optional[str],
+    *,
+    model_size: str,
+    language: str,
+    quality: str,
+    initial_prompt: Optional[str],
+    preprocess: bool,
+    fast_preprocess: bool,
+    long_form: bool = False,
+    word_timestamps: bool = False,
+    pipelined: bool = False,
+) -> Optional[str]:
+    if not audio_hash:
+        return None
+    material = [
+        audio_hash,
+        model_size,
+        COMPUTE_TYPE,
+        language,
+        _choose_params(quality),
+        initial_prompt or "",
+        bool(preprocess),
+        bool(preprocess and fast_preprocess),
+        bool(long_form),
+        WHISPER_BATCHING and not long_form,
+    ]
+    if word_timestamps:
+        # Appended only when set, so existing entries keep their keys.
+        material.append("words")
+    if pipelined:
+        # Chunked while uploading: not interchangeable with a whole-file decode.
+        material.append("pipelined")
+    material = _json.dumps(material, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+async def _iter_cached_transcription(cached: Dict[str, object]):
+    """Replay a cache entry in the same shape as :func:`_iter_transcription`."""
+    yield "info", SimpleNamespace(
+        language=cached.get("language"), duration=cached.get("duration_sec", 0.0)
+    )
+    for start, end, text, *words in cached.get("segments", []):
+        yield "segment", SimpleNamespace(
+            start=start,
+            end=end,
+            text=text,
+            words=[
+                {"start": w[0], "end": w[1], "word": w[2], "probability": w[3]} for w in words[0]
+            ]
+            if words
+            else None,
+        )
+
+
+class _ActiveJob:
+    """Handle for cancelling a running job from outside the task consuming it."""
+
+    __slots__ = ("key", "ticket", "task", "reason")
+
+    def __init__(self, key: str, ticket: _JobTicket):
+        self.key = key
+        self.ticket = ticket
+        self.task: Optional[asyncio.Task] = None
+        self.reason: Optional[str] = None  # "disconnect" or "request"
+
+    def cancel(self, reason: str) -> None:
+        if self.reason is not None:
+            return
+        self.reason = reason
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+
+_ACTIVE_JOBS: Dict[str, _ActiveJob] = {}
+_CANCELLED = {"disconnect": 0, "request": 0, "while_queued": 0, "while_running": 0}
+DISCONNECT_POLL_SECONDS = 1.0
+
+
+def _count_cancellation(reason: str, ticket: _JobTicket) -> None:
+    _CANCELLED[reason] += 1
+    _CANCELLED["while_running" if ticket._event.is_set() else "while_queued"] += 1
+
+
+async def _watch_disconnect(request: Request, active: _ActiveJob) -> None:
+    while True:
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+        if await request.is_disconnected():
+            active.cancel("disconnect")
+            return
+
+
+async def _transcription_events(
+    ticket: _JobTicket,
+    audio_path: str,
+    *,
+    endpoint: str,
+    job_key: Optional[str] = None,
+    request: Optional[Request] = None,
+    **options,
+):
+    """Run one queued job and yield the NDJSON events shared by all endpoints.
+
+    Wraps :func:`_job_events`, records the job outcome and makes the job
+    cancellable: through ``DELETE /jobs/{job_key}`` or, when ``request`` is
+    given, as soon as the client disconnects. A cancelled job drops its queue
+    ticket or stops decoding at the next segment and ends with a
+    ``cancelled`` event.
+    """
+    active = _ActiveJob(job_key or str(ticket.job_id), ticket)
+    _ACTIVE_JOBS[active.key] = active
+    watcher = None
+    outcome = "error"
+    try:
+        active.task = asyncio.current_task()
+        if request is not None:
+            watcher = asyncio.ensure_future(_watch_disconnect(request, active))
+        pipeline = _remote_job_events if DEPLOY_MODE == "api" else _job_events
+        async for event in pipeline(ticket, audio_path, endpoint=endpoint, **options):
+            if event["event"] == "done":
+                outcome = "cache_hit" if event["cache"]["hit"] else "ok"
+            yield event
+    except (GeneratorExit, asyncio.CancelledError) as exc:
+        if isinstance(exc, GeneratorExit) or active.reason is None:
+            # The server closed the stream under us: for a client-bound job
+            # that means the client went away first.
+            outcome = "aborted"
+            if request is not None:
+                _count_cancellation("disconnect", ticket)
+            raise
+        # Our own cancellation (disconnect or DELETE): absorb it and finish
+        # the stream cleanly.
+        active.task.uncancel()
+        outcome = "cancelled"
+        _count_cancellation(active.reason, ticket)
+        yield {"event": "cancelled", "job_id": active.key, "reason": active.reason}
+    finally:
+        if _ACTIVE_JOBS.get(active.key) is active:
+            del _ACTIVE_JOBS[active.key]
+        if watcher is not None:
+            watcher.cancel()
+        _M_JOBS.inc(
+            endpoint=endpoint,
+            model=options.get("model_size", ""),
+            quality=_normalize_quality(options.get("quality", "")),
+            outcome=outcome,
+        )
+
+
+async def _job_events(
+    ticket: _JobTicket,
+    audio_path: str,
+    *,
+    audio_hash: Optional[str] = None,
+    endpoint: str = "",
+    model_size: str,
+    language: str,
+    quality: str,
+    initial_prompt: Optional[str],
+    diarize: bool,
+    preprocess: bool,
+    fast_preprocess: bool,
+    long_form: bool = False,
+    word_timestamps: bool = False,
+    upload: Optional[_PipelinedUpload] = None,
+    pcm_path: Optional[str] = None,
+):
+    """Pipeline stages for one job: cache lookup, preprocessing, decode, diarization.
+
+    ffmpeg preprocessing starts right away on its own executor, so it overlaps
+    the queue wait instead of holding a decode slot. Cache hits give their
+    queue slot back immediately and replay the stored segments. With
+    ``upload`` the audio comes from a :class:`_PipelinedUpload` still in
+    flight; its hash, and so its cache entry, is only known at the end.
+    ``pcm_path`` retains the decoded audio there (see ``/jobs/{id}/retranscribe``).
+    """
+    loop = asyncio.get_running_loop()
+    cache_key = _transcript_cache_key(
+        audio_hash,
+        model_size=model_size,
+        language=language,
+        quality=quality,
+        initial_prompt=initial_prompt,
+        preprocess=preprocess,
+        fast_preprocess=fast_preprocess,
+        long_form=long_form,
+        word_timestamps=word_timestamps,
+        pipelined=upload is not None,
+    )
+    cached = await loop.run_in_executor(None, _TRANSCRIPT_CACHE.get, cache_key)
+    if cached is not None:
+        await ticket.release()
+
+    audio = audio_path
+    preprocessing = diarizing = source = None
+    cancel = _CancelToken()
+    requested_quality = quality = _normalize_quality(quality)
+    try:
+        if cached is None or diarize:
+            if upload is not None:
+                preprocessing = upload.audio  # resolves after the last byte
+            else:
+                preprocessing = asyncio.ensure_future(
+                    _preprocess_async(
+                        audio_path, preprocess, quick=fast_preprocess, cancel=cancel, keep=pcm_path
+                    )
+                )
+            if diarize:
+                # Diarization has its own executor, so it starts as soon as the
+                # audio is ready and overlaps both the queue wait and decoding.
+                diarizing = asyncio.ensure_future(_diarize_async(preprocessing, cancel))
+            if cached is None:
+                # Decoded length beats the upload-size guess for job ordering.
+                preprocessing.add_done_callback(
+                    lambda done: _reprice_from_audio(ticket, done)
+                )
+                if WHISPER_BATCHING and not long_form and upload is None and language != "auto":
+                    # Ready to ride along in a forming batch once decoded.
+                    batch_key = _batch_key(
+                        model_size,
+                        dict(
+                            language=language,
+                            initial_prompt=initial_prompt,
+                            **_choose_params(quality),
+                            **({"word_timestamps": True} if word_timestamps else {}),
+                        ),
+                    )
+                    preprocessing.add_done_callback(
+                        lambda done: _mark_batchable(ticket, done, batch_key)
+                    )
+                async for position in ticket.positions():
+                    yield {"event": "queued", "job_id": ticket.job_id, "position": position}
+                await ticket.wait_until_ready()
+                _M_QUEUE_WAIT_SECONDS.observe(ticket.wait_seconds, endpoint=endpoint)
+                # A rider keeps its profile: it was admitted to a batch for it.
+                if _QUALITY_GOVERNOR.applies(quality) and not ticket.rider:
+                    quality = await _QUALITY_GOVERNOR.choose(quality, _JOB_QUEUE)
+            if upload is None:
+                audio = await preprocessing
+        yield {"event": "progress", "progress": 0.0, "partial_text": ""}
+
+        if cached is not None:
+            source = _iter_cached_transcription(cached)
+        else:
+            if upload is not None:
+                decode_mode, decoder, audio = "pipelined", _iter_pipelined_transcription, upload
+            elif long_form:
+                decode_mode, decoder = "long_form", _iter_longform_transcription
+            elif WHISPER_BATCHING:
+                decode_mode, decoder = "batched", _iter_batched_transcription
+            else:
+                decode_mode, decoder = "standard", _iter_transcription
+            source = decoder(
+                model_size,
+                audio,
+                language=None if language == "auto" else language,
+                initial_prompt=initial_prompt,
+                **_choose_params(quality),
+                **({"word_timestamps": True} if word_timestamps else {}),
+            )
+        info = None
+        duration = 0.0
+        text_parts: List[str] = []
+        segments: List[Segment] = []
+        timeline: Optional[SpeakerTimeline] = None
+        decode_started = time.perf_counter()
+        source = _watch_diarization(source, diarizing)
+        async for kind, item in source:
+            if kind == "info":
+                info = item
+                duration = float(getattr(info, "duration", 0.0) or 0.0)
+                continue
+            if timeline is None and diarizing is not None and diarizing.done():
+                timeline = _timeline_from(diarizing)
+                if timeline and segments:
+                    # Label everything streamed so far in one go.
+                    labels = timeline.assign(
+                        [s.start for s in segments], [s.end for s in segments]
+                    )
+                    for prev, label in zip(segments, labels):
+                        prev.speaker = label
+                    yield {
+                        "event": "speakers",
+                        "segments": [
+                            {"index": i, "speaker": label}
+                            for i, label in enumerate(labels)
+                            if label
+                        ],
+                    }
+            if kind == "diarized":
+                continue
+            seg = Segment(
+                start=item.start,
+                end=item.end,
+                text=item.text,
+                words=_word_dicts(getattr(item, "words", None)) if word_timestamps else None,
+            )
+            if timeline:
+                seg.speaker = timeline.assign([seg.start], [seg.end])[0]
+            segments.append(seg)
+            text_parts.append(item.text)
+            progress = (item.end / duration * 100.0) if duration > 0 else 0.0
+            event = {
+                "event": "progress",
+                "progress": round(progress, 2),
+                "partial_text": item.text,
+                "start": seg.start,
+                "end": seg.end,
+            }
+            if seg.speaker:
+                event["speaker"] = seg.speaker
+            if seg.words is not None:
+                event["words"] = [w.model_dump() for w in seg.words]
+            yield event
+            if seg.speaker:
+                # From here on every segment's label follows it as it is decoded.
+                yield {
+                    "event": "speakers",
+                    "segments": [{"index": len(segments) - 1, "speaker": seg.speaker}],
+                }
+        if cached is None:
+            decode_seconds = time.perf_counter() - decode_started
+            labels = dict(model=model_size, quality=_normalize_quality(quality), mode=decode_mode)
+            _M_DECODE_SECONDS.observe(decode_seconds, **labels)
+            if duration > 0:
+                _M_REALTIME_FACTOR.observe(decode_seconds / duration, **labels)
+                _QUALITY_GOVERNOR.observe(quality, decode_seconds / duration)
+        if upload is not None:
+            audio_hash = upload.audio_hash
+        if cached is None and (quality != requested_quality or upload is not None):
+            # A downgraded transcript must not answer later requests for the
+            # profile that was asked for.
+            cache_key = _transcript_cache_key(
+                audio_hash,
+                model_size=model_size,
+                language=language,
+                quality=quality,
+                initial_prompt=initial_prompt,
+                preprocess=preprocess,
+                fast_preprocess=fast_preprocess,
+                long_form=long_form,
+                word_timestamps=word_timestamps,
+                pipelined=upload is not None,
+            )
+        if cached is None and cache_key:
+            await loop.run_in_executor(
+                None,
+                _TRANSCRIPT_CACHE.put,
+                cache_key,
+                {
+                    "language": getattr(info, "language", None),
+                    "duration_sec": duration,
+                    "segments": [
+                        [s.start, s.end, s.text]
+                        + (
+                            [[[w.start, w.end, w.word, w.probability] for w in s.words]]
+                            if s.words is not None
+                            else []
+                        )
+                        for s in segments
+                    ],
+                },
+            )
+
+        diarization_meta = {
+            "requested": diarize,
+            "applied": False,
+            "reason": None,
+            "segments": [],
+            "model": DIARIZATION_MODEL_DEFAULT,
+        }
+        if diarizing is not None:
+            diarization_result = await diarizing
+            diarization_meta.update(diarization_result)
+            if diarization_result.get("applied"):
+                segments = _assign_speakers_to_segments(
+                    segments,
+                    diarization_result["segments"],
+                    words=[s.words for s in segments] if word_timestamps else None,
+                )
+    finally:
+        # On an early exit this kills ffmpeg, aborts diarization and stops the
+        # decoder at its next segment; after a normal finish it is a no-op.
+        cancel.cancel()
+        for task in (preprocessing, diarizing):
+            if task is not None and not task.done():
+                task.cancel()
+        if source is not None:
+            await source.aclose()
+    speakers = sorted(
+        {seg.speaker for seg in segments if getattr(seg, "speaker", None)}
+    )
+    yield {
+        "event": "done",
+        "text": " ".join(text_parts).strip(),
+        "language": getattr(info, "language", language),
+        "duration_sec": duration,
+        "model": f"faster-whisper-{model_size}({COMPUTE_TYPE})",
+        "quality": quality,
+        "quality_requested": requested_quality,
+        "cpu_threads": CPU_THREADS_DEFAULT,
+        "num_workers": NUM_WORKERS_DEFAULT,
+        "preprocess": preprocess,
+        "fast_preprocess": fast_preprocess,
+        "long_form": long_form,
+        "word_timestamps": word_timestamps,
+        "segments": [s.as_dict() for s in segments],
+        "speakers": speakers,
+        "speaker_segments": diarization_meta["segments"]
+        if diarization_meta.get("applied")
+        else [],
+        "diarization": diarization_meta,
+        "queue": {
+            "job_id": ticket.job_id,
+            "wait_seconds": round(ticket.wait_seconds, 3),
+            "position_on_enqueue": ticket.position,
+        },
+        "cache": {"hit": cached is not None},
+    }
+
+
+async def _remote_job_events(ticket: _JobTicket, audio_path: str, *, endpoint: str = "", **options):
+    """API-node counterpart of :func:`_job_events`: the decode runs on a worker.
+
+    The local queue still orders jobs (priority, fair share) and caps how many
+    are in flight. Once the ticket is granted the job goes to the broker and
+    whatever a worker publishes is relayed. If the job is abandoned here the
+    broker entry is flagged so the worker stops too.
+    """
+    loop = asyncio.get_running_loop()
+    async for position in ticket.positions():
+        yield {"event": "queued", "job_id": ticket.job_id, "position": position}
+    await ticket.wait_until_ready()
+    _M_QUEUE_WAIT_SECONDS.observe(ticket.wait_seconds, endpoint=endpoint)
+
+    job_id = uuid.uuid4().hex
+    await loop.run_in_executor(
+        None,
+        _BROKER.submit,
+        job_id,
+        options["model_size"],
+        {"audio_path": audio_path, "options": options},
+    )
+    cursor = 0
+    started = False
+    relayed_until = -1.0
+    finished = False
+    try:
+        while not finished:
+            for seq, event in await loop.run_in_executor(None, _BROKER.events, job_id, cursor):
+                cursor = seq
+                kind = event.get("event")
+                if kind in ("queued", "requeued"):
+                    continue  # worker-local; a requeued job simply starts over
+                if kind == "progress":
+                    # After a requeue the new worker repeats what was relayed.
+                    if "end" not in event:
+                        if started:
+                            continue
+                        started = True
+                    elif event["end"] <= relayed_until:
+                        continue
+                    else:
+                        relayed_until = event["end"]
+                if kind in FINAL_EVENTS:
+                    finished = True
+                    if kind == "error":
+                        raise RuntimeError(event.get("detail") or "worker failed")
+                    if kind == "cancelled":
+                        return
+                    event["queue"] = {
+                        "job_id": ticket.job_id,
+                        "wait_seconds": round(ticket.wait_seconds, 3),
+                        "position_on_enqueue": ticket.position,
+                    }
+                yield event
+            if not finished:
+                await asyncio.sleep(BROKER_POLL_SECONDS)
+    finally:
+        # Not awaited: this also has to happen while the task is being cancelled.
+        loop.run_in_executor(None, _BROKER.forget if finished else _BROKER.cancel, job_id)
+
+
+class _WarmUp:
+    """Load what requests will need in the background, after the port is bound.
+
+    Steps run in order on the default executor: the faster-whisper import,
+    every model in ``WARMUP_MODELS``, the VAD and, with
+    ``WARMUP_DIARIZATION``, the diarization pipeline. ``/readyz`` is 503
+    until they are finished. A failed model step keeps the server unready,
+    since requests for that model would fail the same way; VAD and
+    diarization are optional and only reported. Requests that arrive early
+    still work: they wait for, or do, the same loads themselves.
+    """
+
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: "OrderedDict[str, Dict[str, object]]" = OrderedDict()
+        # Importing faster_whisper also settles which models requests may use.
+        self._plan: List[tuple] = [("import faster_whisper", _MODEL_REGISTRY.resolve_allowed, True)]
+        if DEPLOY_MODE != "api":
+            for name in WARMUP_MODELS:
+                name = _normalize_model_name(name)
+                self._plan.append((f"model {name}", lambda name=name: _load_model(name), True))
+            self._plan.append(
+                ("vad", lambda: _speech_timestamps(np.zeros(SAMPLE_RATE, dtype=np.float32)), False)
+            )
+            if WARMUP_DIARIZATION:
+                model = DIARIZATION_MODEL_DEFAULT
+                load = (
+                    (lambda: _lazy("diarizer"))
+                    if model == DIARIZATION_BUILTIN
+                    else (lambda: _get_diarization_pipeline(model))
+                )
+                self._plan.append((f"diarization {model}", load, False))
+        for name, _, required in self._plan:
+            self.steps[name] = {"status": "pending", "required": required}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.started_at = time.time()
+        for name, step, _ in self._plan:
+            state = self.steps[name]
+            state["status"] = "running"
+            started = time.perf_counter()
+            try:
+                await loop.run_in_executor(None, step)
+                state["status"] = "done"
+            except Exception as exc:
+                state["status"] = "failed"
+                state["error"] = str(exc)
+                print(f"[WARN] warm-up {name} failed:", exc)
+            state["seconds"] = round(time.perf_counter() - started, 3)
+        self.finished_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None and all(
+            state["status"] == "done" for state in self.steps.values() if state["required"]
+        )
+
+    def stats(self) -> Dict[str, object]:
+        end = self.finished_at or time.time()
+        return {
+            "ready": self.ready,
+            "finished": self.finished_at is not None,
+            "seconds": round(end - self.started_at, 3) if self.started_at else None,
+            "steps": [{"name": name, **state} for name, state in self.steps.items()],
+        }
+
+
+_WARM_UP = _WarmUp()
+_PROCESS_STARTED = time.time()
+
+
+@app.on_event("startup")
+async def _start_warm_up() -> None:
+    # Not awaited: startup has to finish for uvicorn to bind the port.
+    _WARM_UP.start()
+
+
+@app.get("/livez")
+async def livez():
+    """Liveness: the event loop answers. Never blocks on models or the queue."""
+    return {"ok": True, "uptime_seconds": round(time.time() - _PROCESS_STARTED, 3)}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once warm-up has loaded the configured models, else 503."""
+    stats = _WARM_UP.stats()
+    return JSONResponse(stats, status_code=200 if stats["ready"] else 503)
+
+
+@app.get("/healthz")
+async def healthz():
+    queue_stats = await _JOB_QUEUE.stats()
+    # Both stats are SQLite queries that can wait on another writer's lock.
+    loop = asyncio.get_running_loop()
+    job_stats = await loop.run_in_executor(None, _JOB_STORE.stats)
+    broker_stats = (
+        await loop.run_in_executor(None, _BROKER.stats) if _BROKER is not None else None
+    )
+    return {
+        "ok": True,
+        "default_model": _normalize_model_name(MODEL_SIZE_DEFAULT),
+        "default_language": LANGUAGE_DEFAULT,
+        "default_quality": QUALITY_DEFAULT,
+        "host": HOST_DEFAULT,
+        "port": PORT_DEFAULT,
+        "cpu_threads": CPU_THREADS_DEFAULT,
+        "num_workers": NUM_WORKERS_DEFAULT,
         "compute": COMPUTE_TYPE,
-        "loaded_models": list(_models.keys()),
+        "loaded_models": _MODEL_REGISTRY.loaded_keys(),
+        "models": _MODEL_REGISTRY.stats(),
         "ffmpeg": FFMPEG_BIN,
         "queue": queue_stats,
+        "adaptive_quality": _QUALITY_GOVERNOR.stats(),
         "max_concurrency": TRANSCRIBE_CONCURRENCY,
+        "transcript_cache": _TRANSCRIPT_CACHE.stats(),
+        "batching": _BATCH_SCHEDULER.stats(),
+        "jobs": job_stats,
+        "active_jobs": len(_ACTIVE_JOBS),
+        "cancelled": dict(_CANCELLED),
+        "mode": DEPLOY_MODE,
+        "broker": broker_stats,
+        "warmup": _WARM_UP.stats(),
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(
+        content=_METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.post("/transcribe")
 async def transcribe(
+    request: Request,
     file: UploadFile = File(...),
     language: str = Form(LANGUAGE_DEFAULT),
     model_size: str = Form(MODEL_SIZE_DEFAULT),
@@ -454,84 +3012,437 @@ async def transcribe(
     diarize: bool = Form(DIARIZATION_DEFAULT_ENABLED),
     preprocess: bool = Form(False),
     fast_preprocess: bool = Form(False),
+    long_form: bool = Form(LONGFORM_DEFAULT),
+    priority: str = Form("normal"),
+    word_timestamps: bool = Form(False),
+    layout: str = Form("objects"),
+):
+    model_size = _normalize_model_name(model_size)
+    language = _normalize_language(language)
+    await _ensure_model_allowed(model_size)
+    priority = _normalize_priority(priority)
+    layout = _normalize_layout(layout)
+    client = _client_key(request)
+    await _admit(client)
+
+    suffix = os.path.splitext(file.filename or '')[-1] or '.bin'
+    tmp_path, audio_hash = await _spool_upload(
+        _iter_upload_file(file), suffix, endpoint="transcribe"
+    )
+
+    ticket = await _enqueue_upload(client, priority, tmp_path)
+    events = _transcription_events(
+        ticket,
+        tmp_path,
+        endpoint="transcribe",
+        request=request,
+        audio_hash=audio_hash,
+        model_size=model_size,
+        language=language,
+        quality=quality,
+        initial_prompt=initial_prompt,
+        diarize=diarize,
+        preprocess=preprocess,
+        fast_preprocess=fast_preprocess,
+        long_form=long_form,
+        word_timestamps=word_timestamps,
+    )
+    try:
+        result: Dict[str, object] = {}
+        async for event in events:
+            if event["event"] == "done":
+                result = event
+            elif event["event"] == "cancelled":
+                raise HTTPException(status_code=409, detail="งานถูกยกเลิก")
+        result.pop("event", None)
+        return _encoded_response(request, _with_layout(result, layout))
+    finally:
+        await events.aclose()
+        await ticket.release()
+        _cleanup_paths(tmp_path)
+
+@app.post("/transcribe_stream")
+async def transcribe_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    language: str = Form(LANGUAGE_DEFAULT),
+    model_size: str = Form(MODEL_SIZE_DEFAULT),
+    quality: str = Form(QUALITY_DEFAULT),
+    initial_prompt: Optional[str] = Form(None),
+    diarize: bool = Form(DIARIZATION_DEFAULT_ENABLED),
+    preprocess: bool = Form(False),
+    fast_preprocess: bool = Form(False),
+    long_form: bool = Form(LONGFORM_DEFAULT),
+    priority: str = Form("normal"),
+    word_timestamps: bool = Form(False),
+    layout: str = Form("objects"),
+):
+    model_size = _normalize_model_name(model_size)
+    language = _normalize_language(language)
+    await _ensure_model_allowed(model_size)
+    priority = _normalize_priority(priority)
+    layout = _normalize_layout(layout)
+    client = _client_key(request)
+    await _admit(client)
+
+    suffix = os.path.splitext(file.filename or '')[-1] or '.bin'
+    tmp_path, audio_hash = await _spool_upload(
+        _iter_upload_file(file), suffix, endpoint="transcribe_stream"
+    )
+
+    ticket = await _enqueue_upload(client, priority, tmp_path)
+
+    async def gen():
+        try:
+            async for event in _transcription_events(
+                ticket,
+                tmp_path,
+                endpoint="transcribe_stream",
+                request=request,
+                audio_hash=audio_hash,
+                model_size=model_size,
+                language=language,
+                quality=quality,
+                initial_prompt=initial_prompt,
+                diarize=diarize,
+                preprocess=preprocess,
+                fast_preprocess=fast_preprocess,
+                long_form=long_form,
+                word_timestamps=word_timestamps,
+            ):
+                yield _ndjson(_with_layout(event, layout))
+        finally:
+            await ticket.release()
+            _cleanup_paths(tmp_path)
+
+    return _ndjson_response(request, gen())
+
+
+async def _pipelined_stream_upload(
+    request: Request, client: str, priority: str, layout: str, upload: _PipelinedUpload, options
+) -> StreamingResponse:
+    """``/transcribe_stream_upload`` with decoding overlapping the upload.
+
+    The job is queued as soon as the first chunk is cut and runs while the
+    body is still being read; its events are buffered and streamed once the
+    upload is complete, which is when HTTP clients start reading anyway.
+    Nothing else reads the request meanwhile, so no disconnect watcher is
+    attached: a client that goes away aborts the upload itself.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    enqueued = asyncio.Event()
+    ticket: Optional[_JobTicket] = None
+
+    async def _run() -> None:
+        nonlocal ticket
+        try:
+            await upload.first_chunk.wait()
+            try:
+                ticket = await _JOB_QUEUE.enqueue(priority, client, upload.estimated_duration())
+            finally:
+                enqueued.set()
+            async for event in _transcription_events(
+                ticket, "", endpoint="transcribe_stream_upload", upload=upload, **options
+            ):
+                events.put_nowait(event)
+        finally:
+            enqueued.set()
+            events.put_nowait(None)
+
+    job = asyncio.ensure_future(_run())
+    tmp_path = None
+    try:
+        tmp_path, audio_hash = await _spool_upload(
+            request.stream(), endpoint="transcribe_stream_upload", tap=upload.feed
+        )
+        await upload.finish(tmp_path, audio_hash)
+        await enqueued.wait()
+        if job.done() and not job.cancelled() and isinstance(job.exception(), _QueueFull):
+            raise _queue_full(job.exception())
+    except BaseException:
+        upload.abort()
+        job.cancel()
+        if ticket is not None:
+            await ticket.release()
+        _cleanup_paths(tmp_path)
+        raise
+
+    async def gen():
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                if event["event"] == "done":
+                    event["upload"] = upload.timings(time.perf_counter())
+                yield _ndjson(_with_layout(event, layout))
+            await job  # re-raise a decoding error, as the other endpoints do
+        finally:
+            job.cancel()
+            if ticket is not None:
+                await ticket.release()
+            upload.abort()
+            _cleanup_paths(tmp_path)
+
+    return _ndjson_response(request, gen())
+
+
+@app.post("/transcribe_stream_upload")
+async def transcribe_stream_upload(
+    request: Request,
+    language: str = Query(LANGUAGE_DEFAULT),
+    model_size: str = Query(MODEL_SIZE_DEFAULT),
+    quality: str = Query(QUALITY_DEFAULT),
+    initial_prompt: Optional[str] = Query(None),
+    diarize: bool = Query(DIARIZATION_DEFAULT_ENABLED),
+    preprocess: bool = Query(False),
+    fast_preprocess: bool = Query(False),
+    long_form: bool = Query(LONGFORM_DEFAULT),
+    priority: str = Query("normal"),
+    word_timestamps: bool = Query(False),
+    layout: str = Query("objects"),
+    pipelined: bool = Query(STREAM_UPLOAD_PIPELINED),
 ):
+    """Transcribe a raw request body, streaming NDJSON events.
+
+    ``pipelined=true`` decodes chunks while the body is still arriving (see
+    :class:`_PipelinedUpload`); ``long_form`` does not apply then, since the
+    upload is already chunked. The ``done`` event reports the ``upload``
+    timings of either mode.
+    """
     model_size = _normalize_model_name(model_size)
     language = _normalize_language(language)
-    params = _choose_params(quality)
-    model = _get_model(model_size)
+    await _ensure_model_allowed(model_size)
+    priority = _normalize_priority(priority)
+    layout = _normalize_layout(layout)
+    client = _client_key(request)
+    await _admit(client)
+    options = dict(
+        model_size=model_size,
+        language=language,
+        quality=quality,
+        initial_prompt=initial_prompt,
+        diarize=diarize,
+        preprocess=preprocess,
+        fast_preprocess=fast_preprocess,
+        long_form=long_form,
+        word_timestamps=word_timestamps,
+    )
 
-    suffix = os.path.splitext(file.filename or '')[-1] or '.bin'
-    data = await file.read()
-    with _tf.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(data)
-        tmp_path = tmp.name
+    # Workers in api mode read the spooled file, so they cannot start early.
+    if pipelined and DEPLOY_MODE != "api":
+        try:
+            upload = _PipelinedUpload(
+                int(request.headers.get("content-length") or 0), preprocess, fast_preprocess
+            )
+        except OSError:
+            upload = None  # no ffmpeg: spool first, as without pipelining
+        if upload is not None:
+            options["long_form"] = False
+            return await _pipelined_stream_upload(request, client, priority, layout, upload, options)
+
+    ingest_started = time.perf_counter()
+    tmp_path, audio_hash = await _spool_upload(
+        request.stream(), endpoint="transcribe_stream_upload"
+    )
+    ingested = time.perf_counter()
 
-    wav_path = _maybe_preprocess(tmp_path, preprocess, quick=fast_preprocess)
+    ticket = await _enqueue_upload(client, priority, tmp_path)
 
-    diarization_meta = {
-        "requested": diarize,
-        "applied": False,
-        "reason": None,
-        "segments": [],
-        "model": DIARIZATION_MODEL_DEFAULT,
-    }
+    async def gen():
+        try:
+            async for event in _transcription_events(
+                ticket,
+                tmp_path,
+                endpoint="transcribe_stream_upload",
+                request=request,
+                audio_hash=audio_hash,
+                **options,
+            ):
+                if event["event"] == "done":
+                    tail = time.perf_counter() - ingested
+                    event["upload"] = {
+                        "pipelined": False,
+                        "ingest_seconds": round(ingested - ingest_started, 3),
+                        "decode_seconds": round(max(0.0, tail - ticket.wait_seconds), 3),
+                        "overlap_seconds": 0.0,
+                        "tail_seconds": round(tail, 3),
+                    }
+                yield _ndjson(_with_layout(event, layout))
+        finally:
+            await ticket.release()
+            _cleanup_paths(tmp_path)
 
-    ticket = await _JOB_QUEUE.enqueue()
+    return _ndjson_response(request, gen())
+
+
+_JOB_STORE = JobStore(os.path.join(JOBS_DIR, "jobs.sqlite3"))
+_JOB_AUDIO_DIR = os.path.join(JOBS_DIR, "audio")
+_JOB_TASKS: Dict[str, asyncio.Task] = {}
+_JOB_CANCEL_REQUESTS: set = set()
+_JOB_UPDATES: Dict[str, asyncio.Event] = {}
+JOB_EVENTS_POLL_SECONDS = 15.0
+
+
+def _job_pcm_path(job: Dict[str, object]) -> Optional[str]:
+    # Decoded 16 kHz float32 audio, retained next to the upload for retranscribe
+    return f"{job['audio_path']}.f32" if job.get("audio_path") else None
+
+
+def _notify_job(job_id: str) -> None:
+    waiters = _JOB_UPDATES.pop(job_id, None)
+    if waiters is not None:
+        waiters.set()
+
+
+def _persist_job_event(job_id: str, event: Optional[Dict[str, object]], fields: Dict[str, object]) -> None:
+    # Event first, status second: a reader that sees a terminal status has
+    # already got every event.
+    if event is not None:
+        _JOB_STORE.append_event(job_id, event)
+    if fields:
+        _JOB_STORE.update(job_id, **fields)
+
+
+async def _run_stored_job(job: Dict[str, object]) -> None:
+    """Decode one persisted job and append its events to the job store.
+
+    A job interrupted by a restart is simply run again; progress events for
+    segments that were already stored are not repeated, so a client resuming
+    with ``since`` sees one continuous stream.
+    """
+    loop = asyncio.get_running_loop()
+    job_id = str(job["id"])
+    stored = await loop.run_in_executor(None, _JOB_STORE.events, job_id, 0)
+    resumed_until: Optional[float] = None
+    if stored:
+        resumed_until = max(
+            (float(p["end"]) for _, p in stored if p.get("event") == "progress" and "end" in p),
+            default=0.0,
+        )
+
+    async def _persist(event: Optional[Dict[str, object]], **fields: object) -> None:
+        await loop.run_in_executor(None, _persist_job_event, job_id, event, fields)
+        _notify_job(job_id)
+
+    params = dict(job["params"])
+    schedule = params.pop("schedule", {})
+    # Admission was checked when the job was accepted; never reject it here.
+    ticket = await _JOB_QUEUE.enqueue(
+        schedule.get("priority", "normal"),
+        schedule.get("client", ""),
+        schedule.get("cost", 0.0),
+        enforce_limits=False,
+    )
+    status = "queued"
     try:
-        await ticket.wait_until_ready()
-        segments_gen, info = model.transcribe(
-            wav_path,
-            language=None if language == "auto" else language,
-            initial_prompt=initial_prompt,
-            **params,
+        await _persist(
+            {"event": "resumed", "after": resumed_until} if stored else None,
+            status=status,
+            position=ticket.position,
         )
-        segments = []
-        text_parts = []
-        for seg in segments_gen:
-            segments.append(Segment(start=seg.start, end=seg.end, text=seg.text))
-            text_parts.append(seg.text)
-        if diarize:
-            diarization_result = _run_diarization(
-                wav_path, os.getenv("DIARIZATION_MODEL", DIARIZATION_MODEL_DEFAULT)
-            )
-            diarization_meta.update(diarization_result)
-            if diarization_result.get("applied"):
-                _assign_speakers_to_segments(segments, diarization_result["segments"])
-        speakers = sorted(
-            {seg.speaker for seg in segments if getattr(seg, "speaker", None)}
+        async for event in _transcription_events(
+            ticket,
+            str(job["audio_path"]),
+            endpoint="jobs",
+            job_key=job_id,
+            audio_hash=job.get("audio_hash"),
+            pcm_path=_job_pcm_path(job),
+            **params,
+        ):
+            fields: Dict[str, object] = {}
+            kind = event["event"]
+            if kind == "progress":
+                if status != "running":
+                    status = fields["status"] = "running"
+                    fields["position"] = 0
+                if event.get("progress") is not None:
+                    fields["progress"] = event["progress"]
+                if resumed_until is not None and float(event.get("end", 0.0)) <= resumed_until:
+                    event = None  # already in the stored stream
+            elif kind == "done":
+                result = dict(event)
+                result.pop("event", None)
+                result["job_id"] = job_id
+                status = "done"
+                fields.update(status=status, progress=100.0, result=result)
+            elif kind == "queued":
+                fields["position"] = event["position"]
+                event = dict(event, job_id=job_id)
+            elif kind == "cancelled":
+                status = "cancelled"
+                fields.update(status=status, position=0)
+            await _persist(event, **fields)
+    except asyncio.CancelledError:
+        if job_id not in _JOB_CANCEL_REQUESTS:
+            raise  # shutdown: leave the job unfinished so the next start resumes it
+        # Cancelled before the pipeline could register itself as active.
+        asyncio.current_task().uncancel()
+        _count_cancellation("request", ticket)
+        await _persist(
+            {"event": "cancelled", "job_id": job_id, "reason": "request"},
+            status="cancelled",
+            position=0,
         )
-        return {
-            "text": " ".join(text_parts).strip(),
-            "language": getattr(info, "language", language),
-            "segments": [s.model_dump() for s in segments],
-            "duration_sec": float(getattr(info, "duration", 0.0) or 0.0),
-            "model": f"faster-whisper-{model_size}({COMPUTE_TYPE})",
-            "quality": _normalize_quality(quality),
-            "cpu_threads": CPU_THREADS_DEFAULT,
-            "num_workers": NUM_WORKERS_DEFAULT,
-            "preprocess": preprocess,
-            "fast_preprocess": fast_preprocess,
-            "speakers": speakers,
-            "speaker_segments": diarization_meta["segments"]
-            if diarization_meta.get("applied")
-            else [],
-            "diarization": diarization_meta,
-            "queue": {
-                "job_id": ticket.job_id,
-                "wait_seconds": round(ticket.wait_seconds, 3),
-                "position_on_enqueue": ticket.position,
-            },
-        }
+    except Exception as exc:
+        detail = getattr(exc, "detail", None) or str(exc) or exc.__class__.__name__
+        await _persist({"event": "error", "detail": detail}, status="error", error=detail)
     finally:
         await ticket.release()
-        try: os.remove(tmp_path)
-        except Exception: pass
-        if wav_path != tmp_path:
-            try: os.remove(wav_path)
-            except Exception: pass
+        _JOB_TASKS.pop(job_id, None)
+        _JOB_CANCEL_REQUESTS.discard(job_id)
+        _notify_job(job_id)
 
-@app.post("/transcribe_stream")
-async def transcribe_stream(
+
+def _start_job(job: Dict[str, object]) -> None:
+    job_id = str(job["id"])
+    if job_id not in _JOB_TASKS:
+        _JOB_TASKS[job_id] = asyncio.ensure_future(_run_stored_job(job))
+
+
+def _job_view(job: Dict[str, object]) -> Dict[str, object]:
+    view = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "position": job["position"],
+        "progress": job["progress"],
+        "params": job["params"],
+        "error": job.get("error"),
+        "events_url": f"/jobs/{job['id']}/events",
+    }
+    if job.get("result") is not None:
+        view["result"] = job["result"]
+    return view
+
+
+def _purge_finished_jobs() -> None:
+    if JOB_RETENTION_HOURS <= 0:
+        return
+    expired = _JOB_STORE.purge(time.time() - JOB_RETENTION_HOURS * 3600.0)
+    _cleanup_paths(*(p for job in expired for p in (job.get("audio_path"), _job_pcm_path(job))))
+    _drop_exports(*(job["id"] for job in expired))
+
+
+@app.on_event("startup")
+async def _resume_jobs() -> None:
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _purge_finished_jobs)
+    for job in await loop.run_in_executor(None, _JOB_STORE.unfinished):
+        if job.get("audio_path") and os.path.exists(str(job["audio_path"])):
+            _start_job(job)
+        else:
+            detail = "audio for this job is no longer available"
+            await loop.run_in_executor(
+                None, _persist_job_event, job["id"], {"event": "error", "detail": detail},
+                {"status": "error", "error": detail},
+            )
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    request: Request,
     file: UploadFile = File(...),
     language: str = Form(LANGUAGE_DEFAULT),
     model_size: str = Form(MODEL_SIZE_DEFAULT),
@@ -540,297 +3451,829 @@ async def transcribe_stream(
     diarize: bool = Form(DIARIZATION_DEFAULT_ENABLED),
     preprocess: bool = Form(False),
     fast_preprocess: bool = Form(False),
+    long_form: bool = Form(LONGFORM_DEFAULT),
+    priority: str = Form("normal"),
+    word_timestamps: bool = Form(False),
 ):
+    """Queue a transcription and return its id without waiting for the result."""
     model_size = _normalize_model_name(model_size)
     language = _normalize_language(language)
-    params = _choose_params(quality)
-    model = _get_model(model_size)
+    await _ensure_model_allowed(model_size)
+    priority = _normalize_priority(priority)
+    client = _client_key(request)
+    await _admit(client)
 
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, lambda: os.makedirs(_JOB_AUDIO_DIR, exist_ok=True))
     suffix = os.path.splitext(file.filename or '')[-1] or '.bin'
-    data = await file.read()
-    with _tf.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(data)
-        tmp_path = tmp.name
+    audio_path, audio_hash = await _spool_upload(
+        _iter_upload_file(file), suffix, endpoint="jobs", directory=_JOB_AUDIO_DIR
+    )
+    params = {
+        "model_size": model_size,
+        "language": language,
+        "quality": quality,
+        "initial_prompt": initial_prompt,
+        "diarize": diarize,
+        "preprocess": preprocess,
+        "fast_preprocess": fast_preprocess,
+        "long_form": long_form,
+        "word_timestamps": word_timestamps,
+        "schedule": {
+            "priority": priority,
+            "client": client,
+            "cost": os.path.getsize(audio_path) / QUEUE_COST_BYTES_PER_SECOND,
+        },
+    }
+    try:
+        job = await loop.run_in_executor(
+            None, _JOB_STORE.create, uuid.uuid4().hex, params, audio_path, audio_hash
+        )
+    except Exception:
+        _cleanup_paths(audio_path)
+        raise
+    _start_job(job)
+    await loop.run_in_executor(None, _purge_finished_jobs)
+    return _job_view(job)
+
+
+async def _load_job(job_id: str) -> Dict[str, object]:
+    job = await asyncio.get_running_loop().run_in_executor(None, _JOB_STORE.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ไม่พบงานนี้")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str, layout: str = Query("objects")):
+    layout = _normalize_layout(layout)
+    view = _job_view(await _load_job(job_id))
+    if "result" in view:
+        view["result"] = _with_layout(view["result"], layout)
+    return _encoded_response(request, view)
 
-    wav_path = _maybe_preprocess(tmp_path, preprocess, quick=fast_preprocess)
 
-    ticket = await _JOB_QUEUE.enqueue()
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancel a queued or running job, or delete a finished one.
+
+    Works for ``/jobs`` ids and for the ``job_id`` in the ``queued`` event of
+    the streaming endpoints. Cancelling frees the queue slot, kills ffmpeg,
+    aborts diarization and stops decoding at the next segment boundary.
+    """
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(None, _JOB_STORE.get, job_id)
+    active = _ACTIVE_JOBS.get(job_id)
+    if job is None:
+        if active is None:
+            raise HTTPException(status_code=404, detail="ไม่พบงานนี้")
+        active.cancel("request")
+        return {"job_id": job_id, "status": "cancelling"}
+    if job["status"] in TERMINAL_STATUSES:
+        await loop.run_in_executor(None, _JOB_STORE.delete, job_id)
+        _cleanup_paths(job.get("audio_path"), _job_pcm_path(job))
+        await loop.run_in_executor(None, _drop_exports, job_id)
+        return {"job_id": job_id, "status": "deleted"}
+    task = _JOB_TASKS.get(job_id)
+    if active is not None:
+        active.cancel("request")
+    elif task is not None:
+        _JOB_CANCEL_REQUESTS.add(job_id)
+        task.cancel()
+    else:
+        await loop.run_in_executor(
+            None, _persist_job_event, job_id,
+            {"event": "cancelled", "job_id": job_id, "reason": "request"},
+            {"status": "cancelled", "position": 0},
+        )
+        _notify_job(job_id)
+    return {"job_id": job_id, "status": "cancelling"}
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(
+    request: Request,
+    job_id: str,
+    since: int = Query(0, ge=0),
+    follow: bool = Query(True),
+    layout: str = Query("objects"),
+):
+    """NDJSON events of a job after sequence number ``since``.
+
+    Every event carries its ``seq``; reconnect with the last one seen to pick
+    up where the stream dropped. With ``follow`` the stream stays open until
+    the job finishes.
+    """
+    layout = _normalize_layout(layout)
+    await _load_job(job_id)
+    loop = asyncio.get_running_loop()
 
     async def gen():
+        cursor = since
+        while True:
+            # Subscribe before reading so an update between the read and the
+            # wait is not missed.
+            updated = _JOB_UPDATES.setdefault(job_id, asyncio.Event())
+            job = await loop.run_in_executor(None, _JOB_STORE.get, job_id)
+            for seq, payload in await loop.run_in_executor(None, _JOB_STORE.events, job_id, cursor):
+                payload["seq"] = cursor = seq
+                yield _ndjson(_with_layout(payload, layout))
+            if not follow or job is None or job["status"] in TERMINAL_STATUSES:
+                return
+            try:
+                await asyncio.wait_for(updated.wait(), JOB_EVENTS_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    return _ndjson_response(request, gen())
+
+
+class RetranscribeRequest(BaseModel):
+    start: float
+    end: float
+    # Unset fields keep the job's own parameters.
+    quality: Optional[str] = None
+    initial_prompt: Optional[str] = None
+    language: Optional[str] = None
+    model_size: Optional[str] = None
+    priority: str = "high"
+
+
+_RETRANSCRIBE_LOCKS: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _affected_span(segments: List[Dict[str, object]], start: float, end: float):
+    """Indices ``[first, last)`` of the stored segments ``[start, end)`` touches.
+
+    The window is widened to the outer edges of the segments it cuts through,
+    so a re-decoded passage never starts or stops inside a stored segment.
+    Returns ``(first, last, start, end)``.
+    """
+    starts = [float(s["start"]) for s in segments]
+    first = bisect.bisect_right(starts, start)
+    if first > 0 and float(segments[first - 1]["end"]) > start:
+        first -= 1
+    last = bisect.bisect_left(starts, end, lo=first)
+    if first < last:
+        start = min(start, float(segments[first]["start"]))
+        end = max(end, max(float(s["end"]) for s in segments[first:last]))
+    return first, last, start, end
+
+
+@app.post("/jobs/{job_id}/retranscribe")
+async def retranscribe_job(
+    request: Request, job_id: str, payload: RetranscribeRequest, layout: str = Query("objects")
+):
+    """Re-decode ``start``-``end`` of a finished job and splice it into its result.
+
+    Only that window is decoded, from the audio the job retained as decoded
+    PCM (or, if it was never decoded here, the upload decoded once now and
+    retained). The window is widened to the stored segments it cuts through,
+    those are replaced by the new ones, and only the new segments are given
+    speakers from the job's diarization. Saving the result bumps
+    ``updated_at``, which also retires cached exports of the old result.
+    """
+    layout = _normalize_layout(layout)
+    if DEPLOY_MODE == "api":
+        raise HTTPException(status_code=501, detail="retranscribe ต้องรันบนเครื่องที่ถอดเสียงได้ (DEPLOY_MODE=all)")
+    if payload.start < 0 or payload.end <= payload.start:
+        raise HTTPException(status_code=400, detail="ต้องระบุช่วงเวลา start < end (วินาที)")
+    priority = _normalize_priority(payload.priority)
+    client = _client_key(request)
+    loop = asyncio.get_running_loop()
+    lock = _RETRANSCRIBE_LOCKS.get(job_id)
+    if lock is None:
+        lock = _RETRANSCRIBE_LOCKS[job_id] = asyncio.Lock()
+    async with lock:  # one splice per job at a time
+        job = await _load_job(job_id)
+        if job["status"] != "done" or not job.get("result"):
+            raise HTTPException(status_code=409, detail="แก้ไขได้เฉพาะงานที่ถอดเสียงเสร็จแล้ว")
+        params = dict(job["params"])
+        result = dict(job["result"])
+        model_size = _normalize_model_name(payload.model_size or params["model_size"])
+        await _ensure_model_allowed(model_size)
+        language = _normalize_language(payload.language or params["language"])
+        if language == "auto":
+            language = result.get("language") or "auto"
+        quality = _normalize_quality(payload.quality or params["quality"])
+        initial_prompt = (
+            payload.initial_prompt if payload.initial_prompt is not None else params.get("initial_prompt")
+        )
+        segments = list(result.get("segments") or [])
+        duration = float(result.get("duration_sec") or 0.0)
+        end = min(payload.end, duration) if duration > 0 else payload.end
+        if payload.start >= end:
+            raise HTTPException(status_code=400, detail="ช่วงเวลาอยู่นอกความยาวของไฟล์เสียง")
+        first, last, start, end = _affected_span(segments, payload.start, end)
+
+        if not job.get("audio_path") or not os.path.exists(str(job["audio_path"])):
+            raise HTTPException(status_code=410, detail="ไฟล์เสียงของงานนี้ถูกลบแล้ว")
+        audio = await _preprocess_async(
+            str(job["audio_path"]),
+            params.get("preprocess", False),
+            quick=params.get("fast_preprocess", False),
+            keep=_job_pcm_path(job),
+        )
+        if not isinstance(audio, np.ndarray):
+            raise HTTPException(status_code=422, detail="ถอดรหัสไฟล์เสียงของงานนี้ไม่ได้")
+        window = audio[int(start * SAMPLE_RATE) : int(np.ceil(end * SAMPLE_RATE))]
+
+        try:
+            ticket = await _JOB_QUEUE.enqueue(priority, client, len(window) / SAMPLE_RATE)
+        except _QueueFull as exc:
+            raise _queue_full(exc)
+        new_segments: List[Segment] = []
         try:
-            if ticket.position > 0:
-                yield (
-                    _json.dumps(
-                        {
-                            "event": "queued",
-                            "job_id": ticket.job_id,
-                            "position": ticket.position,
-                        }
-                    )
-                    + "\n"
-                ).encode("utf-8")
             await ticket.wait_until_ready()
-            yield (
-                _json.dumps({"event": "progress", "progress": 0.0, "partial_text": ""})
-                + "\n"
-            ).encode("utf-8")
-            segments_gen, info = model.transcribe(
-                wav_path,
+            if _QUALITY_GOVERNOR.applies(quality):
+                quality = await _QUALITY_GOVERNOR.choose(quality, _JOB_QUEUE)
+            decode_started = time.perf_counter()
+            decoding = _iter_transcription(
+                model_size,
+                window,
                 language=None if language == "auto" else language,
                 initial_prompt=initial_prompt,
-                **params,
+                **_choose_params(quality),
+                **({"word_timestamps": True} if params.get("word_timestamps") else {}),
             )
-            full_text = []
-            duration = float(getattr(info, "duration", 0.0) or 0.0)
-            collected_segments: List[Segment] = []
-            for seg in segments_gen:
-                collected_segment = Segment(
-                    start=seg.start, end=seg.end, text=seg.text
-                )
-                collected_segments.append(collected_segment)
-                full_text.append(seg.text)
-                progress = (seg.end / duration * 100.0) if duration > 0 else 0.0
-                yield (
-                    _json.dumps(
-                        {
-                            "event": "progress",
-                            "progress": round(progress, 2),
-                            "partial_text": seg.text,
-                        }
-                    )
-                    + "\n"
-                ).encode("utf-8")
-            diarization_meta = {
-                "requested": diarize,
-                "applied": False,
-                "reason": None,
-                "segments": [],
-                "model": DIARIZATION_MODEL_DEFAULT,
-            }
-            if diarize:
-                diarization_result = _run_diarization(
-                    wav_path, os.getenv("DIARIZATION_MODEL", DIARIZATION_MODEL_DEFAULT)
-                )
-                diarization_meta.update(diarization_result)
-                if diarization_result.get("applied"):
-                    _assign_speakers_to_segments(
-                        collected_segments, diarization_result["segments"]
+            async with aclosing(decoding):
+                async for kind, item in decoding:
+                    if kind != "segment":
+                        continue
+                    new_segments.append(
+                        Segment(
+                            start=round(start + item.start, 3),
+                            end=round(min(end, start + item.end), 3),
+                            text=item.text,
+                            words=_word_dicts(getattr(item, "words", None), start)
+                            if params.get("word_timestamps")
+                            else None,
+                        )
                     )
-            speakers = sorted(
-                {
-                    seg.speaker
-                    for seg in collected_segments
-                    if getattr(seg, "speaker", None)
-                }
+            decode_seconds = time.perf_counter() - decode_started
+        finally:
+            await ticket.release()
+        labels = dict(model=model_size, quality=quality, mode="retranscribe")
+        _M_DECODE_SECONDS.observe(decode_seconds, **labels)
+        _M_REALTIME_FACTOR.observe(decode_seconds / max(end - start, 1e-3), **labels)
+
+        speaker_segments = [
+            s for s in result.get("speaker_segments") or []
+            if float(s["end"]) > start and float(s["start"]) < end
+        ]
+        new_segments = _assign_speakers_to_segments(
+            new_segments,
+            speaker_segments,
+            words=[s.words for s in new_segments] if params.get("word_timestamps") else None,
+        )
+        segments[first:last] = [s.as_dict() for s in new_segments]
+        result["segments"] = segments
+        result["text"] = " ".join(str(s["text"]) for s in segments).strip()
+        result["speakers"] = sorted({s["speaker"] for s in segments if s.get("speaker")})
+        edit = {
+            "start": round(start, 3),
+            "end": round(end, 3),
+            "replaced": last - first,
+            "segments": len(new_segments),
+            "model_size": model_size,
+            "language": language,
+            "quality": quality,
+            "initial_prompt": initial_prompt,
+            "decode_seconds": round(decode_seconds, 3),
+        }
+        result["retranscribed"] = list(result.get("retranscribed") or []) + [edit]
+        await loop.run_in_executor(
+            None, _persist_job_event, job_id, dict(edit, event="retranscribed"), {"result": result}
+        )
+        _notify_job(job_id)
+        view = _job_view(await _load_job(job_id))
+    view["result"] = _with_layout(view["result"], layout)
+    view["retranscribe"] = edit
+    return _encoded_response(request, view)
+
+
+class _LiveSession:
+    """Rolling-buffer state for one ``/ws/transcribe`` connection.
+
+    Audio accumulates in ``buffer`` (everything after the last commit). Each
+    step runs the VAD over it, decodes and commits utterances that are
+    followed by enough silence, then re-decodes only the uncommitted tail to
+    produce a partial hypothesis.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        *,
+        model_size: str,
+        language: str,
+        quality: str,
+        initial_prompt: Optional[str],
+    ):
+        self.websocket = websocket
+        self.model_size = model_size
+        self.language = None if language == "auto" else language
+        self.quality = quality
+        self.initial_prompt = initial_prompt
+        self.params = _choose_params(quality)
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.offset = 0  # samples already committed (or dropped as silence)
+        self.segments: List[Segment] = []
+        self._pending: List[np.ndarray] = []
+        self.pending_samples = 0
+
+    def add(self, samples: np.ndarray) -> None:
+        if samples.size:
+            self._pending.append(samples)
+            self.pending_samples += samples.size
+
+    def _take_pending(self) -> None:
+        if self._pending:
+            self.buffer = np.concatenate([self.buffer, *self._pending])
+            self._pending.clear()
+        self.pending_samples = 0
+
+    def _prompt(self) -> Optional[str]:
+        # Carry the end of the committed text so consecutive utterances stay
+        # consistent, the way condition_on_previous_text does offline.
+        tail = "".join(s.text for s in self.segments[-4:])[-200:]
+        prompt = " ".join(p for p in (self.initial_prompt, tail.strip()) if p)
+        return prompt or None
+
+    async def _decode(self, audio: np.ndarray) -> List[SimpleNamespace]:
+        # Live audio is interactive: short steps in the high-priority class.
+        ticket = await _JOB_QUEUE.enqueue(
+            "high", _client_key(self.websocket), len(audio) / SAMPLE_RATE, enforce_limits=False
+        )
+        try:
+            await ticket.wait_until_ready()
+            segments = []
+            decoding = _iter_transcription(
+                self.model_size,
+                audio,
+                language=self.language,
+                initial_prompt=self._prompt(),
+                **self.params,
             )
-            yield (
-                _json.dumps(
+            # aclosing: a disconnect mid-step stops the decoder right away.
+            async with aclosing(decoding):
+                async for kind, item in decoding:
+                    if kind == "info":
+                        if self.language is None:
+                            self.language = getattr(item, "language", None)
+                        continue
+                    segments.append(item)
+            return segments
+        finally:
+            await ticket.release()
+
+    async def _send(self, payload: Dict[str, object]) -> None:
+        await self.websocket.send_text(_json.dumps(payload))
+
+    async def step(self, final: bool = False) -> None:
+        self._take_pending()
+        audio = self.buffer
+        if final:
+            cut, speech = len(audio), True
+        else:
+            cut, speech = await asyncio.get_running_loop().run_in_executor(
+                _PREPROCESS_EXECUTOR, _live_commit_point, audio
+            )
+        if cut > 0:
+            base = self.offset / SAMPLE_RATE
+            for seg in (await self._decode(audio[:cut])) if speech else []:
+                committed = Segment(start=seg.start + base, end=seg.end + base, text=seg.text)
+                self.segments.append(committed)
+                await self._send(
                     {
-                        "event": "done",
-                        "text": " ".join(full_text).strip(),
-                        "language": getattr(info, "language", "auto"),
-                        "duration_sec": duration,
-                        "model": f"faster-whisper-{model_size}({COMPUTE_TYPE})",
-                        "quality": _normalize_quality(quality),
-                        "cpu_threads": CPU_THREADS_DEFAULT,
-                        "num_workers": NUM_WORKERS_DEFAULT,
-                        "preprocess": preprocess,
-                        "fast_preprocess": fast_preprocess,
-                        "segments": [s.model_dump() for s in collected_segments],
-                        "speakers": speakers,
-                        "speaker_segments": diarization_meta["segments"]
-                        if diarization_meta.get("applied")
-                        else [],
-                        "diarization": diarization_meta,
-                        "queue": {
-                            "job_id": ticket.job_id,
-                            "wait_seconds": round(ticket.wait_seconds, 3),
-                            "position_on_enqueue": ticket.position,
-                        },
+                        "event": "progress",
+                        "progress": None,
+                        "partial_text": committed.text,
+                        "start": committed.start,
+                        "end": committed.end,
+                        "final": True,
                     }
                 )
-                + "\n"
-            ).encode("utf-8")
-        finally:
-            await ticket.release()
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
-            if wav_path != tmp_path:
-                try:
-                    os.remove(wav_path)
-                except Exception:
-                    pass
+            self.buffer = audio[cut:]
+            self.offset += cut
+        if final or len(self.buffer) < SAMPLE_RATE // 2:
+            return
+        if (await _JOB_QUEUE.stats())["waiting"] > 0:
+            return  # partials are best effort; don't delay queued jobs
+        tail = await self._decode(self.buffer)
+        if tail:
+            base = self.offset / SAMPLE_RATE
+            await self._send(
+                {
+                    "event": "progress",
+                    "progress": None,
+                    "partial_text": "".join(s.text for s in tail),
+                    "start": tail[0].start + base,
+                    "end": tail[-1].end + base,
+                    "final": False,
+                }
+            )
+
+    def done_payload(self) -> Dict[str, object]:
+        return {
+            "event": "done",
+            "text": " ".join(s.text for s in self.segments).strip(),
+            "language": self.language or "auto",
+            "duration_sec": (self.offset + len(self.buffer)) / SAMPLE_RATE,
+            "model": f"faster-whisper-{self.model_size}({COMPUTE_TYPE})",
+            "quality": _normalize_quality(self.quality),
+            "segments": [s.as_dict() for s in self.segments],
+            "speakers": [],
+            "speaker_segments": [],
+        }
 
-    return StreamingResponse(gen(), media_type="application/x-ndjson")
 
+def _live_commit_point(audio: np.ndarray):
+    """Return ``(cut, has_speech)``: how much of the buffer can be committed.
 
-@app.post("/transcribe_stream_upload")
-async def transcribe_stream_upload(
-    request: Request,
+    Everything up to the middle of the pause after the last utterance that is
+    followed by at least ``LIVE_COMMIT_SILENCE_MS`` of silence is final. A
+    buffer longer than ``LIVE_MAX_BUFFER_SECONDS`` is committed as a whole.
+    """
+    if not len(audio):
+        return 0, False
+    speech = _speech_timestamps(audio, min_silence_duration_ms=LIVE_COMMIT_SILENCE_MS)
+    silence = LIVE_COMMIT_SILENCE_MS * SAMPLE_RATE // 1000
+    if not speech:
+        # Pure silence: drop all but a short tail that may hold a word onset.
+        keep = min(len(audio), silence)
+        return len(audio) - keep, False
+    finished = [r for r in speech if r["end"] <= len(audio) - silence]
+    if finished:
+        last = finished[-1]
+        following = speech[len(finished)]["start"] if len(finished) < len(speech) else len(audio)
+        return (last["end"] + following) // 2, True
+    if len(audio) >= LIVE_MAX_BUFFER_SECONDS * SAMPLE_RATE:
+        return len(audio), True
+    return 0, True
+
+
+async def _close_with_error(websocket: WebSocket, detail: str) -> None:
+    """Send a live client an ``error`` event, then close with 1011."""
+    try:
+        await websocket.send_text(_json.dumps({"event": "error", "detail": detail}))
+        await websocket.close(code=1011)
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # the client is already gone
+
+
+@app.websocket("/ws/transcribe")
+async def ws_transcribe(
+    websocket: WebSocket,
     language: str = Query(LANGUAGE_DEFAULT),
     model_size: str = Query(MODEL_SIZE_DEFAULT),
     quality: str = Query(QUALITY_DEFAULT),
     initial_prompt: Optional[str] = Query(None),
-    diarize: bool = Query(DIARIZATION_DEFAULT_ENABLED),
-    preprocess: bool = Query(False),
-    fast_preprocess: bool = Query(False),
+    audio_format: str = Query("s16le", alias="format"),
+    sample_rate: int = Query(SAMPLE_RATE),
 ):
+    """Live transcription over a WebSocket.
+
+    Send binary frames of audio (``format=s16le``/``f32le`` mono PCM at
+    ``sample_rate``, or an encoded stream such as ``ogg``/``webm`` Opus that
+    ffmpeg can read from a pipe) and a text frame ``{"event": "stop"}`` at
+    the end. The server pushes ``progress`` events (``final`` true for
+    committed segments, false for the current tail) and a closing ``done``.
+    """
     model_size = _normalize_model_name(model_size)
     language = _normalize_language(language)
-    params = _choose_params(quality)
-    model = _get_model(model_size)
+    if not await _model_allowed(model_size):
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
 
-    with _tf.NamedTemporaryFile(delete=False, suffix=".bin") as tmp:
-        tmp_path = tmp.name
+    audio_format = (audio_format or "s16le").strip().lower()
+    decoder: Optional[_FfmpegStreamDecoder] = None
+    try:
+        if audio_format not in ("s16le", "f32le") or sample_rate != SAMPLE_RATE:
+            if audio_format in ("s16le", "f32le"):
+                decoder = _FfmpegStreamDecoder(["-f", audio_format, "-ar", str(sample_rate), "-ac", "1"])
+            else:
+                decoder = _FfmpegStreamDecoder()
+    except OSError as exc:
+        # ffmpeg missing or not executable; 16 kHz s16le/f32le still works without it.
+        await _close_with_error(
+            websocket, f"ไม่สามารถเริ่ม ffmpeg เพื่อถอดรหัสเสียง ({audio_format}, {sample_rate} Hz): {exc}"
+        )
+        _M_JOBS.inc(
+            endpoint="ws_transcribe",
+            model=model_size,
+            quality=_normalize_quality(quality),
+            outcome="error",
+        )
+        return
+    session = _LiveSession(
+        websocket,
+        model_size=model_size,
+        language=language,
+        quality=quality,
+        initial_prompt=initial_prompt,
+    )
+    loop = asyncio.get_running_loop()
+    step_samples = int(LIVE_STEP_SECONDS * SAMPLE_RATE)
+    stepping: Optional[asyncio.Task] = None
+    outcome = "aborted"
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            data = message.get("bytes")
+            if data:
+                if decoder is not None:
+                    await loop.run_in_executor(None, decoder.feed, data)
+                    session.add(decoder.drain())
+                elif audio_format == "f32le":
+                    session.add(np.frombuffer(data[: len(data) - len(data) % 4], dtype=np.float32))
+                else:
+                    pcm = np.frombuffer(data[: len(data) - len(data) % 2], dtype="<i2")
+                    session.add(pcm.astype(np.float32) / 32768.0)
+            elif message.get("text"):
+                try:
+                    control = _json.loads(message["text"])
+                except ValueError:
+                    control = {}
+                if control.get("event") == "stop":
+                    break
+            if session.pending_samples >= step_samples and (stepping is None or stepping.done()):
+                if stepping is not None:
+                    stepping.result()  # surface errors from the previous step
+                stepping = asyncio.ensure_future(session.step())
+        if stepping is not None:
+            await stepping
+        if decoder is not None:
+            session.add(await loop.run_in_executor(None, decoder.close))
+        await session.step(final=True)
+        await websocket.send_text(_json.dumps(session.done_payload()))
+        outcome = "ok"
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as exc:
+        # A failed decode step: close with a reason instead of dropping the socket.
+        outcome = "error"
+        await _close_with_error(
+            websocket, getattr(exc, "detail", None) or str(exc) or exc.__class__.__name__
+        )
+    finally:
+        if stepping is not None and not stepping.done():
+            stepping.cancel()
+        if decoder is not None:
+            decoder.kill()
+        _M_JOBS.inc(
+            endpoint="ws_transcribe",
+            model=model_size,
+            quality=_normalize_quality(quality),
+            outcome=outcome,
+        )
 
-    with open(tmp_path, "wb") as f:
-        async for chunk in request.stream():
-            if chunk:
-                f.write(chunk)
 
-    wav_path = _maybe_preprocess(tmp_path, preprocess, quick=fast_preprocess)
+_EXPORT_DIR = os.path.join(JOBS_DIR, "exports")
 
-    ticket = await _JOB_QUEUE.enqueue()
 
-    async def gen():
-        try:
-            if ticket.position > 0:
-                yield (
-                    _json.dumps(
-                        {
-                            "event": "queued",
-                            "job_id": ticket.job_id,
-                            "position": ticket.position,
-                        }
-                    )
-                    + "\n"
-                ).encode("utf-8")
-            await ticket.wait_until_ready()
-            yield (
-                _json.dumps({"event": "progress", "progress": 0.0, "partial_text": ""})
-                + "\n"
-            ).encode("utf-8")
-            segments_gen, info = model.transcribe(
-                wav_path,
-                language=None if language == "auto" else language,
-                initial_prompt=initial_prompt,
-                **params,
-            )
-            collected = []
-            collected_segments: List[Segment] = []
-            duration = float(getattr(info, "duration", 0.0) or 0.0)
-            for seg in segments_gen:
-                collected.append(seg.text)
-                collected_segments.append(
-                    Segment(start=seg.start, end=seg.end, text=seg.text)
-                )
-                progress = (seg.end / duration * 100.0) if duration > 0 else 0.0
-                yield (
-                    _json.dumps(
-                        {
-                            "event": "progress",
-                            "progress": round(progress, 2),
-                            "partial_text": seg.text,
-                        }
-                    )
-                    + "\n"
-                ).encode("utf-8")
-            diarization_meta = {
-                "requested": diarize,
-                "applied": False,
-                "reason": None,
-                "segments": [],
-                "model": DIARIZATION_MODEL_DEFAULT,
-            }
-            if diarize:
-                diarization_result = _run_diarization(
-                    wav_path, os.getenv("DIARIZATION_MODEL", DIARIZATION_MODEL_DEFAULT)
-                )
-                diarization_meta.update(diarization_result)
-                if diarization_result.get("applied"):
-                    _assign_speakers_to_segments(
-                        collected_segments, diarization_result["segments"]
-                    )
-            speakers = sorted(
-                {
-                    seg.speaker
-                    for seg in collected_segments
-                    if getattr(seg, "speaker", None)
-                }
-            )
-            yield (
-                _json.dumps(
-                    {
-                        "event": "done",
-                        "text": " ".join(collected).strip(),
-                        "language": getattr(info, "language", "auto"),
-                        "duration_sec": duration,
-                        "model": f"faster-whisper-{model_size}({COMPUTE_TYPE})",
-                        "quality": _normalize_quality(quality),
-                        "cpu_threads": CPU_THREADS_DEFAULT,
-                        "num_workers": NUM_WORKERS_DEFAULT,
-                        "preprocess": preprocess,
-                        "fast_preprocess": fast_preprocess,
-                        "segments": [s.model_dump() for s in collected_segments],
-                        "speakers": list(speakers),
-                        "speaker_segments": diarization_meta["segments"]
-                        if diarization_meta.get("applied")
-                        else [],
-                        "diarization": diarization_meta,
-                        "queue": {
-                            "job_id": ticket.job_id,
-                            "wait_seconds": round(ticket.wait_seconds, 3),
-                            "position_on_enqueue": ticket.position,
-                        },
-                    }
-                )
-                + "\n"
-            ).encode("utf-8")
-        finally:
-            await ticket.release()
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
-            if wav_path != tmp_path:
-                try:
-                    os.remove(wav_path)
-                except Exception:
-                    pass
+def _drop_exports(*job_ids: str) -> None:
+    for job_id in job_ids:
+        shutil.rmtree(os.path.join(_EXPORT_DIR, job_id), ignore_errors=True)
+
+
+def _export_cache_path(job: Dict[str, object], req: ExportRequest, fmt: str) -> str:
+    # The name is "{format}-{result}-{options}": the result part hashes the
+    # job's updated_at, so a changed result never serves an old rendering.
+    result = hashlib.sha256(str(job["updated_at"]).encode("utf-8")).hexdigest()[:12]
+    key = _json.dumps(
+        [
+            req.include_transcript,
+            req.include_report,
+            (req.report_markdown or "").strip() if req.include_report else "",
+        ]
+    )
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    ext = exporters.FORMATS[fmt][1]
+    return os.path.join(_EXPORT_DIR, str(job["id"]), f"{fmt}-{result}-{digest}.{ext}")
+
+
+def _iter_file(path: str, chunk_size: int = exporters.CHUNK_BYTES):
+    with open(path, "rb") as fh:
+        while True:
+            chunk = fh.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _tee_to_cache(chunks, path: str):
+    """Yield ``chunks`` while writing them to ``path``; publish only when complete."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = _tf.mkstemp(dir=directory, suffix=".part")
+    completed = False
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+                yield chunk
+        # Renderings of an older result are obsolete; other options and
+        # formats of this result stay cached next to this one.
+        result = os.path.basename(path).split("-")[1]
+        for name in os.listdir(directory):
+            parts = name.split("-")
+            if len(parts) == 3 and parts[1] != result and not name.endswith(".part"):
+                _cleanup_paths(os.path.join(directory, name))
+        os.replace(tmp, path)
+        completed = True
+    finally:
+        if not completed:
+            _cleanup_paths(tmp)
+
 
-    return StreamingResponse(gen(), media_type="application/x-ndjson")
+def _observe_export(chunks, fmt: str, started: float):
+    try:
+        yield from chunks
+    finally:
+        _M_EXPORT_SECONDS.observe(time.perf_counter() - started, format=fmt)
 
 
 @app.post("/export")
 async def export(payload: ExportRequest):
+    """Render a transcript as TXT, DOCX, SRT, WebVTT or JSON, streamed in chunks.
+
+    The transcript comes from ``segments`` (timestamps and speakers kept),
+    the flat ``transcript`` string, or a finished ``/jobs`` result via
+    ``job_id``. Job renderings are cached on disk per job and format.
+    """
+    started = time.perf_counter()
+    try:
+        fmt = exporters.normalize_format(payload.format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = None
+    if payload.job_id:
+        job = await _load_job(payload.job_id)
+        if job["status"] != "done" or not job.get("result"):
+            raise HTTPException(status_code=409, detail="งานนี้ยังถอดเสียงไม่เสร็จ")
+        result = job["result"]
+        segments = result.get("segments") or []
+        transcript = str(result.get("text") or "")
+        meta = {
+            "job_id": job["id"],
+            "language": result.get("language"),
+            "duration_sec": result.get("duration_sec"),
+        }
+    else:
+        segments = [seg.as_dict() for seg in payload.segments] if payload.segments else []
+        transcript = payload.transcript or ""
+        meta = {}
     try:
-        data, media_type, filename = _build_export_payload(payload)
+        chunks = _export_renderer(payload, fmt, transcript, segments, meta)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except RuntimeError as e:
         raise HTTPException(status_code=503, detail=str(e))
-    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-    return Response(content=data, media_type=media_type, headers=headers)
+
+    media_type, ext = exporters.FORMATS[fmt]
+    if job is not None:
+        path = _export_cache_path(job, payload, fmt)
+        exists = await asyncio.get_running_loop().run_in_executor(None, os.path.exists, path)
+        _M_EXPORT_CACHE.inc(result="hit" if exists else "miss")
+        chunks = _iter_file(path) if exists else _tee_to_cache(chunks, path)
+    # Renderers are plain generators; Starlette pulls them in its threadpool.
+    headers = {"Content-Disposition": f'attachment; filename="meeting_export.{ext}"'}
+    return StreamingResponse(_observe_export(chunks, fmt, started), media_type=media_type, headers=headers)
+
+
+@app.get("/jobs/{job_id}/export")
+async def export_job(
+    job_id: str,
+    format: str = Query("txt"),
+    include_transcript: bool = Query(True),
+):
+    """Download link form of ``POST /export`` with ``job_id``."""
+    return await export(
+        ExportRequest(job_id=job_id, format=format, include_transcript=include_transcript)
+    )
+
+
+class SummarizeRequest(BaseModel):
+    transcript: Optional[str] = ""
+    segments: Optional[List[Segment]] = None
+    style: str = "thai-formal"
+    sections: Optional[List[str]] = None
+    max_items: int = 6
 
 
 @app.post("/summarize")
-async def summarize(req: Request):
-    body = await req.json()
-    transcript = body.get("transcript", "")
-    style = body.get("style", "thai-formal")
-    sections = body.get("sections", [])
-
-    report = f"# สรุปรายงาน ({style})\n\n"
-    if sections:
-        for sec in sections:
-            report += f"## {sec}\n- {transcript[:100]}...\n"
-    else:
-        report += transcript
-    return {"report_markdown": report}
+async def summarize(payload: SummarizeRequest):
+    if not (payload.transcript or "").strip() and not payload.segments:
+        raise HTTPException(status_code=400, detail="ต้องส่ง transcript หรือ segments")
+    if not 1 <= payload.max_items <= 50:
+        raise HTTPException(status_code=400, detail="max_items ต้องอยู่ระหว่าง 1-50")
+    segments = [seg.as_dict() for seg in payload.segments] if payload.segments else None
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        None,
+        # Imported on first use: scipy.sparse is most of its import time.
+        lambda: _lazy("summarizer").summarize(
+            transcript=payload.transcript or "",
+            segments=segments,
+            sections=payload.sections,
+            style=payload.style or "thai-formal",
+            max_items=payload.max_items,
+        ),
+    )
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+async def _watch_broker_cancel(job_id: str) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(1.0)
+        if await loop.run_in_executor(None, _BROKER.is_cancelled, job_id):
+            active = _ACTIVE_JOBS.get(job_id)
+            if active is not None:
+                active.cancel("request")
+            return
+
+
+async def _work_on(job: Dict[str, object]) -> None:
+    loop = asyncio.get_running_loop()
+    job_id = str(job["id"])
+    ticket = await _JOB_QUEUE.enqueue(enforce_limits=False)
+    watcher = asyncio.ensure_future(_watch_broker_cancel(job_id))
+    try:
+        async for event in _transcription_events(
+            ticket, str(job["audio_path"]), endpoint="worker", job_key=job_id, **job["options"]
+        ):
+            if event["event"] == "done":
+                event = dict(event, worker=WORKER_ID)
+            await loop.run_in_executor(None, _BROKER.publish, job_id, event)
+    except Exception as exc:
+        detail = str(exc) or exc.__class__.__name__
+        await loop.run_in_executor(
+            None, _BROKER.publish, job_id, {"event": "error", "detail": detail}
+        )
+    finally:
+        watcher.cancel()
+        await ticket.release()
+
+
+async def _run_worker() -> None:
+    """``DEPLOY_MODE=worker``: claim jobs from the broker and decode them.
+
+    Runs ``TRANSCRIBE_CONCURRENCY`` claim loops and a heartbeat that
+    advertises the models this process has loaded, which the broker uses to
+    route jobs to warm workers.
+    """
+    loop = asyncio.get_running_loop()
+    busy = 0
+    _WARM_UP.start()
+
+    async def _heartbeat() -> None:
+        while True:
+            await loop.run_in_executor(
+                None,
+                _BROKER.heartbeat,
+                WORKER_ID,
+                _MODEL_REGISTRY.loaded_names(),
+                TRANSCRIBE_CONCURRENCY,
+                busy,
+            )
+            await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+
+    async def _slot() -> None:
+        nonlocal busy
+        while True:
+            job = await loop.run_in_executor(
+                None, _BROKER.claim, WORKER_ID, _MODEL_REGISTRY.loaded_names()
+            )
+            if job is None:
+                await asyncio.sleep(BROKER_POLL_SECONDS)
+                continue
+            busy += 1
+            try:
+                await _work_on(job)
+            finally:
+                busy -= 1
+
+    print(f"[worker] {WORKER_ID} pulling from {BROKER_URL}")
+    try:
+        await asyncio.gather(_heartbeat(), *(_slot() for _ in range(TRANSCRIBE_CONCURRENCY)))
+    finally:
+        _BROKER.leave(WORKER_ID)
+
 
 if __name__ == "__main__":
-    import uvicorn
+    if DEPLOY_MODE == "worker":
+        try:
+            asyncio.run(_run_worker())
+        except KeyboardInterrupt:
+            pass
+    else:
+        import uvicorn
 
-    uvicorn.run("main:app", host=HOST_DEFAULT, port=PORT_DEFAULT)
+        uvicorn.run("main:app", host=HOST_DEFAULT, port=PORT_DEFAULT)
@@ -0,0 +1,213 @@
+"""Compact transcript layout and response content negotiation.
+
+``layout=columnar`` replaces the list of segment objects with parallel
+arrays: start/end times, offsets into one shared string holding all segment
+text, speaker ids into a speaker table and, with word timestamps, per-word
+times, text offsets and probabilities. Repeated JSON keys, and the full text
+duplicated next to the segments, are what make long meetings multi-MB.
+
+Bodies are JSON, or MessagePack when the client accepts it and ``msgpack``
+is installed, and gzip-compressed when the client accepts that. NDJSON
+streams are gzipped with a sync flush after every event, so compression does
+not hold events back.
+"""
+
+import gzip
+import json
+import zlib
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import msgpack as _msgpack
+except ImportError:
+    _msgpack = None
+
+LAYOUTS = ("objects", "columnar")
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+GZIP_MIN_BYTES = 1024
+
+
+def _ms(value: float) -> float:
+    return round(float(value), 3)
+
+
+def _speaker_column(labels: Sequence[Optional[str]], table: List[str], index: Dict[str, int]) -> List[int]:
+    column = []
+    for label in labels:
+        if not label:
+            column.append(-1)
+            continue
+        if label not in index:
+            index[label] = len(table)
+            table.append(label)
+        column.append(index[label])
+    return column
+
+
+def columnar_segments(segments: Sequence[Dict[str, object]]) -> Dict[str, object]:
+    """Columnar form of segment dicts (``start``, ``end``, ``text``, ``speaker``, ``words``)."""
+    parts: List[str] = []
+    offsets = [0]
+    position = 0
+    speakers: List[str] = []
+    speaker_index: Dict[str, int] = {}
+    word_columns = {"start": [], "end": [], "text_offset": [], "text_length": [], "probability": []}
+    word_bounds = [0]
+    extra: List[str] = []  # word text that is not a substring of its segment
+    has_words = False
+    for seg in segments:
+        text = str(seg.get("text") or "")
+        seg_start = position
+        parts.append(text)
+        position += len(text)
+        offsets.append(position)
+        cursor = 0
+        for word in seg.get("words") or ():
+            has_words = True
+            token = str(word.get("word") or "")
+            found = text.find(token, cursor) if token else cursor
+            if found < 0:
+                found_at = None
+            else:
+                found_at = seg_start + found
+                cursor = found + len(token)
+            if found_at is None:
+                extra.append(token)
+                found_at = -1  # patched below, once the segment text is complete
+            word_columns["start"].append(_ms(word["start"]))
+            word_columns["end"].append(_ms(word["end"]))
+            word_columns["text_offset"].append(found_at)
+            word_columns["text_length"].append(len(token))
+            word_columns["probability"].append(round(float(word.get("probability") or 0.0), 3))
+        word_bounds.append(len(word_columns["start"]))
+    shared = "".join(parts)
+    if extra:
+        # Unmatched words are appended after the segment text, in order.
+        tail = position
+        pending = iter(extra)
+        for i, offset in enumerate(word_columns["text_offset"]):
+            if offset == -1:
+                token = next(pending)
+                word_columns["text_offset"][i] = tail
+                tail += len(token)
+        shared += "".join(extra)
+    result: Dict[str, object] = {
+        "layout": "columnar",
+        "count": len(segments),
+        "text": shared,
+        "text_offsets": offsets,
+        "start": [_ms(seg["start"]) for seg in segments],
+        "end": [_ms(seg["end"]) for seg in segments],
+        "speaker": _speaker_column([seg.get("speaker") for seg in segments], speakers, speaker_index),
+        "speakers": speakers,
+    }
+    if has_words:
+        result["words"] = dict(word_columns, segment_offsets=word_bounds)
+    return result
+
+
+def columnar_result(result: Dict[str, object]) -> Dict[str, object]:
+    """A ``done`` payload with columnar segments and without duplicated text."""
+    compact = dict(result)
+    segments = compact.get("segments") or []
+    compact["segments"] = columnar_segments(segments)
+    compact.pop("text", None)  # same characters as segments.text
+    turns = compact.get("speaker_segments") or []
+    if turns:
+        table = compact["segments"]["speakers"]
+        index = {label: i for i, label in enumerate(table)}
+        compact["speaker_segments"] = {
+            "start": [_ms(t["start"]) for t in turns],
+            "end": [_ms(t["end"]) for t in turns],
+            "speaker": _speaker_column([t.get("speaker") for t in turns], table, index),
+        }
+    diarization = compact.get("diarization")
+    if isinstance(diarization, dict) and "segments" in diarization:
+        # Identical to speaker_segments.
+        compact["diarization"] = {k: v for k, v in diarization.items() if k != "segments"}
+    return compact
+
+
+def _ranges(header: str) -> List[Tuple[str, float]]:
+    """``(range, q)`` for each element of an ``Accept``-style header.
+
+    Parameters may come in any order with optional whitespace around ``;``
+    and ``=``; a missing ``q`` is 1 and a malformed one is treated as 0.
+    """
+    ranges = []
+    for element in (header or "").split(","):
+        name, *params = element.split(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = min(1.0, max(0.0, float(value.strip().strip('"'))))
+                except ValueError:
+                    q = 0.0
+        ranges.append((name, q))
+    return ranges
+
+
+def _quality(ranges: Sequence[Tuple[str, float]], token: str) -> Tuple[float, int]:
+    """``(q, specificity)`` of ``token``: the most specific matching range wins.
+
+    Specificity is 2 for an exact match, 1 for ``type/*`` and 0 for ``*`` or
+    ``*/*``; ``(0.0, -1)`` means nothing matched.
+    """
+    kind = token.split("/", 1)[0] + "/*" if "/" in token else None
+    best = (0.0, -1)
+    for name, q in ranges:
+        if name == token:
+            specificity = 2
+        elif kind is not None and name == kind:
+            specificity = 1
+        elif name in ("*", "*/*"):
+            specificity = 0
+        else:
+            continue
+        if specificity > best[1]:
+            best = (q, specificity)
+    return best
+
+
+def negotiate(accept: str, accept_encoding: str) -> Tuple[str, bool]:
+    """``(media_type, gzip)`` for a request's ``Accept`` / ``Accept-Encoding``.
+
+    MessagePack needs to be named explicitly (wildcards keep JSON) with a
+    non-zero q no lower than JSON's; ``gzip`` is used when it, or ``*``, has a
+    non-zero q.
+    """
+    media_type = "application/json"
+    if _msgpack is not None:
+        ranges = _ranges(accept)
+        json_q = _quality(ranges, "application/json")[0]
+        for candidate in MSGPACK_TYPES:
+            q, specificity = _quality(ranges, candidate)
+            if specificity == 2 and q > 0.0 and q >= json_q:
+                media_type = "application/msgpack"
+                break
+    return media_type, _quality(_ranges(accept_encoding), "gzip")[0] > 0.0
+
+
+def encode(payload: object, media_type: str, use_gzip: bool) -> Tuple[bytes, Dict[str, str]]:
+    if media_type == "application/msgpack":
+        body = _msgpack.packb(payload, use_bin_type=True)
+    else:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if use_gzip and len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Gzip an async byte stream, flushing after every chunk."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,110 @@
+"""Sorted-interval speaker alignment for diarization output.
+
+Diarization turns are grouped per speaker, merged into non-overlapping sorted
+intervals and turned into a cumulative "speaking time before t" function.
+The overlap of any ``[start, end]`` range with a speaker is then two binary
+searches, so aligning ``n`` segments against ``m`` turns costs
+``O((n + m) log m)`` and runs entirely in NumPy.
+"""
+
+from typing import Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SpeakerTimeline:
+    def __init__(self, turns: Iterable[Mapping[str, object]]):
+        starts: List[float] = []
+        ends: List[float] = []
+        labels: List[str] = []
+        for turn in turns:
+            try:
+                s0 = float(turn.get("start", 0.0))
+                e0 = float(turn.get("end", 0.0))
+            except (TypeError, ValueError):
+                continue
+            if e0 <= s0:
+                continue
+            starts.append(s0)
+            ends.append(e0)
+            labels.append(str(turn.get("speaker", "")))
+
+        self.labels: List[str] = sorted({label for label in labels if label})
+        self._tracks: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        if not self.labels:
+            return
+        starts_arr = np.asarray(starts, dtype=np.float64)
+        ends_arr = np.asarray(ends, dtype=np.float64)
+        codes = np.asarray(
+            [self.labels.index(label) if label else -1 for label in labels]
+        )
+        for code in range(len(self.labels)):
+            mask = codes == code
+            self._tracks.append(_merged_track(starts_arr[mask], ends_arr[mask]))
+
+    def __bool__(self) -> bool:
+        return bool(self.labels)
+
+    def overlaps(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Seconds each ``[starts[i], ends[i]]`` overlaps each speaker, shape (n, k)."""
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.maximum(np.asarray(ends, dtype=np.float64), starts)
+        out = np.empty((starts.shape[0], len(self._tracks)), dtype=np.float64)
+        for k, track in enumerate(self._tracks):
+            out[:, k] = _coverage(track, ends) - _coverage(track, starts)
+        return out
+
+    def assign(self, starts: np.ndarray, ends: np.ndarray) -> List[Optional[str]]:
+        """Speaker with the largest overlap per range, or ``None`` if none overlaps."""
+        if not self._tracks or len(starts) == 0:
+            return [None] * len(starts)
+        scores = self.overlaps(starts, ends)
+        best = scores.argmax(axis=1)
+        has_overlap = scores[np.arange(len(best)), best] > 0.0
+        return [self.labels[b] if ok else None for b, ok in zip(best, has_overlap)]
+
+
+def _merged_track(starts: np.ndarray, ends: np.ndarray):
+    order = np.argsort(starts, kind="stable")
+    starts = starts[order]
+    ends = ends[order]
+    # New run whenever a turn starts after everything before it has ended.
+    reach = np.maximum.accumulate(ends)
+    new_run = np.ones(starts.shape[0], dtype=bool)
+    new_run[1:] = starts[1:] > reach[:-1]
+    run_ids = np.flatnonzero(new_run)
+    merged_starts = starts[run_ids]
+    merged_ends = np.maximum.reduceat(ends, run_ids)
+    cumulative = np.concatenate(([0.0], np.cumsum(merged_ends - merged_starts)))
+    return merged_starts, merged_ends, cumulative
+
+
+def _coverage(track, times: np.ndarray) -> np.ndarray:
+    """Total speaking time of one speaker in ``(-inf, t]`` for every t."""
+    starts, ends, cumulative = track
+    idx = np.searchsorted(starts, times, side="right") - 1
+    safe = np.clip(idx, 0, None)
+    partial = np.clip(times - starts[safe], 0.0, ends[safe] - starts[safe])
+    return np.where(idx >= 0, cumulative[safe] + partial, 0.0)
+
+
+def speaker_runs(labels: Sequence[Optional[str]]) -> List[Tuple[int, int, Optional[str]]]:
+    """Collapse per-word labels into ``(first, last_exclusive, label)`` runs.
+
+    Unlabelled words join the run before them (or the first labelled run when
+    they lead the segment), so silence gaps never create extra splits.
+    """
+    filled = list(labels)
+    last = next((label for label in filled if label), None)
+    for i, label in enumerate(filled):
+        if label:
+            last = label
+        else:
+            filled[i] = last
+    runs: List[Tuple[int, int, Optional[str]]] = []
+    for i, label in enumerate(filled):
+        if runs and runs[-1][2] == label:
+            runs[-1] = (runs[-1][0], i + 1, label)
+        else:
+            runs.append((i, i + 1, label))
+    return runs
@@ -0,0 +1,404 @@
+"""Offline extractive summarizer for Thai and English meeting transcripts.
+
+Transcript units (segments, or sentences split out of plain text) are turned
+into a sublinear TF-IDF matrix: words for Latin script, character trigrams
+for Thai, which has no spaces between words. Sentence centrality is
+TextRank, computed by power iteration on ``X @ X.T`` without ever building
+the sentence-by-sentence similarity matrix, so every step is two sparse
+mat-vecs. Requested sections are mapped to a kind (key points, decisions,
+action items, open questions) and filled with the best-scoring units that
+match the kind's Thai/English cue phrases. Items are deduplicated by cosine
+similarity and listed in meeting order. Action items carry an owner (a
+speaker named in the item, else the leading subject such as "Somchai will
+..." or "ฝากคุณสมชายช่วย ...", else the speaker) and a due date when one is
+mentioned.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+
+_TOKEN = re.compile(r"[฀-๿]+|[A-Za-z0-9][A-Za-z0-9'\-]*")
+_THAI_CHAR = re.compile(r"[฀-๿]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+|\s{2,}")
+_SPEAKER_LINE = re.compile(r"^\s*([^:：\n]{1,40}?)\s*[:：]\s+(.+)$")
+_MAX_UNIT_CHARS = 160
+
+_EN_STOPWORDS = frozenset(
+    """a about above after again all also am an and any are as at be because been
+    before being below between both but by can could did do does doing down during
+    each few for from further had has have having he her here hers him his how i if
+    in into is it its itself just let me more most my no nor not now of off on once
+    only or other our ours out over own same she should so some such than that the
+    their them then there these they this those through to too under until up very
+    was we were what when where which while who whom why will with would you your
+    yeah yes okay ok um uh like really so well right gonna got get""".split()
+)
+
+# Cue phrases per section kind (Thai and English), matched case-insensitively.
+_CUES = {
+    "decisions": (
+        "ตัดสินใจ", "ตกลง", "สรุปว่า", "สรุปแล้ว", "เห็นชอบ", "อนุมัติ", "มติ", "เลือกใช้",
+        "ยืนยัน", "decide", "decided", "decision", "agreed", "agree to", "approve",
+        "approved", "go with", "settled on", "final answer", "resolved",
+    ),
+    "actions": (
+        "รับผิดชอบ", "ฝาก", "ช่วย", "ต้องทำ", "ดำเนินการ", "ติดตาม", "ส่งให้", "ภายใน",
+        "ก่อนวัน", "จะทำ", "จะส่ง", "จะเตรียม", "มอบหมาย", "action item", "todo", "to do",
+        "follow up", "follow-up", "will send", "will prepare", "will check", "i'll", "we'll",
+        "assign", "owner", "deadline", "by monday", "by tuesday", "by wednesday",
+        "by thursday", "by friday", "next week", "need to", "please",
+    ),
+    "questions": (
+        "?", "ไหม", "มั้ย", "หรือไม่", "หรือเปล่า", "อย่างไร", "ยังไง", "ทำไม", "ยังไม่ได้",
+        "ยังไม่มี", "ติดปัญหา", "ติดขัด", "ปัญหา", "ความเสี่ยง", "ไม่แน่ใจ", "รอ", "question",
+        "unclear", "not sure", "blocked", "blocker", "issue", "risk", "pending", "open point",
+        "concern", "why", "how do",
+    ),
+}
+
+_CUE_PATTERNS = {
+    kind: re.compile("|".join(re.escape(cue) for cue in cues)) for kind, cues in _CUES.items()
+}
+
+# Words in a section title that select its kind.
+_SECTION_KINDS = (
+    ("actions", ("action", "todo", "to-do", "ผู้รับผิดชอบ", "งานที่ต้องทำ", "มอบหมาย", "ติดตาม")),
+    ("decisions", ("decision", "decided", "ตัดสินใจ", "มติ", "ข้อตกลง", "ตกลง")),
+    ("questions", ("question", "issue", "blocker", "risk", "open", "คำถาม", "ติดขัด", "ปัญหา", "ค้าง")),
+    ("key_points", ("summary", "key", "highlight", "overview", "สรุป", "ประเด็น", "ภาพรวม")),
+)
+
+_DUE = re.compile(
+    r"(ภายใน\s*(?:วัน)?\S+|ก่อน\s*(?:วัน)?\S+|พรุ่งนี้|มะรืน\S*|สัปดาห์หน้า|อาทิตย์หน้า|เดือนหน้า"
+    r"|วัน(?:จันทร์|อังคาร|พุธ|พฤหัส(?:บดี)?|ศุกร์|เสาร์|อาทิตย์)(?:หน้า)?"
+    r"|\d{1,2}\s*(?:ม\.?ค\.?|ก\.?พ\.?|มี\.?ค\.?|เม\.?ย\.?|พ\.?ค\.?|มิ\.?ย\.?|ก\.?ค\.?|ส\.?ค\.?"
+    r"|ก\.?ย\.?|ต\.?ค\.?|พ\.?ย\.?|ธ\.?ค\.?|มกราคม|กุมภาพันธ์|มีนาคม|เมษายน|พฤษภาคม|มิถุนายน"
+    r"|กรกฎาคม|สิงหาคม|กันยายน|ตุลาคม|พฤศจิกายน|ธันวาคม)"
+    r"|\bby\s+(?:mon|tues|wednes|thurs|fri|satur|sun)day\b|\bby\s+(?:tomorrow|eod|end of \w+)"
+    r"|\btomorrow\b|\bnext\s+(?:week|month|monday|tuesday|wednesday|thursday|friday)\b"
+    r"|\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b)",
+    re.IGNORECASE,
+)
+
+# Who an action is on when no speaker label is mentioned: "Somchai will send
+# ...", "Somchai, please ...", "I'll ...", "ฝากคุณสมชายช่วย ...", "ผมจะส่ง ...".
+_EN_OWNER = re.compile(
+    r"^(?:(?i:ok(?:ay)?|so|and|then|also)[,\s]+)*"
+    r"(?P<who>[A-Z][\w'\-]*(?:\s+[A-Z][\w'\-]*)?)"
+    r"(?:\s+(?:will|shall|should|can|needs? to|has to|is going to|to)\b|'ll\b"
+    r"|,\s*(?:please|can you|could you)\b)"
+)
+_TH_OWNER = re.compile(
+    r"^(?:ฝาก|ให้|ขอให้)?\s*(?P<who>(?:คุณ|พี่|น้อง|ทีม)\s*[฀-๿A-Za-z]+?|ผม|ดิฉัน|ฉัน|เรา|พวกเรา)"
+    r"\s*(?:จะ|ช่วย|รับผิดชอบ|ดำเนินการ|ต้อง|ไป)"
+)
+_SELF = frozenset(("i", "we", "ผม", "ดิฉัน", "ฉัน", "เรา", "พวกเรา"))
+_NOT_OWNERS = _EN_STOPWORDS | {"someone", "somebody", "everyone", "everybody", "anyone", "nobody"}
+
+_LABELS = {
+    "th": {
+        "speakers": "ผู้พูด",
+        "owner": "ผู้รับผิดชอบ",
+        "due": "กำหนด",
+        "none": "- (ไม่พบ)",
+        "key_points": "สรุปประเด็นสำคัญ",
+        "decisions": "สิ่งที่ตัดสินใจ",
+        "actions": "Action items (ผู้รับผิดชอบ/กำหนดเสร็จ)",
+        "questions": "คำถามค้าง/ติดขัด",
+    },
+    "en": {
+        "speakers": "Speakers",
+        "owner": "Owner",
+        "due": "Due",
+        "none": "- (none found)",
+        "key_points": "Key points",
+        "decisions": "Decisions",
+        "actions": "Action items",
+        "questions": "Open questions / blockers",
+    },
+}
+
+
+class _Unit:
+    __slots__ = ("text", "speaker", "start", "end")
+
+    def __init__(self, text: str, speaker: Optional[str], start: Optional[float], end: Optional[float]):
+        self.text = text
+        self.speaker = speaker
+        self.start = start
+        self.end = end
+
+
+def _split_long(text: str) -> List[str]:
+    """Split a unit longer than ``_MAX_UNIT_CHARS`` at spaces (Thai clause gaps)."""
+    if len(text) <= _MAX_UNIT_CHARS:
+        return [text]
+    pieces: List[str] = []
+    current = ""
+    for word in text.split(" "):
+        if current and len(current) + 1 + len(word) > _MAX_UNIT_CHARS:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _units_from_segments(segments: Iterable[Dict[str, object]]) -> List[_Unit]:
+    units: List[_Unit] = []
+    for seg in segments:
+        text = str(seg.get("text") or "").strip()
+        if not text:
+            continue
+        speaker = seg.get("speaker") or None
+        start, end = seg.get("start"), seg.get("end")
+        for sentence in _SENTENCE_END.split(text):
+            for piece in _split_long(sentence.strip()):
+                if piece:
+                    units.append(_Unit(piece, speaker, start, end))
+    return units
+
+
+def _units_from_text(transcript: str) -> List[_Unit]:
+    units: List[_Unit] = []
+    for line in transcript.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        speaker = None
+        match = _SPEAKER_LINE.match(line)
+        if match and len(match.group(1).split()) <= 3:
+            speaker, line = match.group(1).strip(), match.group(2)
+        for sentence in _SENTENCE_END.split(line):
+            for piece in _split_long(sentence.strip()):
+                if piece:
+                    units.append(_Unit(piece, speaker, None, None))
+    return units
+
+
+def _tokens(text: str) -> List[str]:
+    out: List[str] = []
+    for match in _TOKEN.finditer(text):
+        token = match.group(0)
+        if "฀" <= token[0] <= "๿":
+            if len(token) <= 3:
+                out.append(token)
+            else:
+                out.extend(token[i : i + 3] for i in range(len(token) - 2))
+        else:
+            word = token.lower()
+            if len(word) > 1 and word not in _EN_STOPWORDS:
+                out.append(word)
+    return out
+
+
+def _tfidf(token_lists: Sequence[List[str]], max_df: float = 0.5):
+    """Row-normalized sublinear TF-IDF as CSR, plus the vocabulary."""
+    vocab: Dict[str, int] = {}
+    cols: List[int] = []
+    lengths = np.fromiter((len(t) for t in token_lists), dtype=np.int64, count=len(token_lists))
+    for tokens in token_lists:
+        cols.extend(vocab.setdefault(t, len(vocab)) for t in tokens)
+    n = len(token_lists)
+    rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+    counts = sparse.csr_matrix(
+        (np.ones(len(cols), dtype=np.float64), (rows, np.asarray(cols, dtype=np.int64))),
+        shape=(n, max(1, len(vocab))),
+    )
+    counts.sum_duplicates()
+    counts.data = 1.0 + np.log(counts.data)
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    if n >= 20:
+        idf[df > max_df * n] = 0.0  # fillers and very common trigrams carry no signal
+    counts.data *= idf[counts.indices]
+    norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1)).ravel())
+    inv = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    matrix = sparse.diags(inv) @ counts
+    matrix.eliminate_zeros()
+    return matrix.tocsr(), vocab, norms > 0
+
+
+def _textrank(matrix, has_terms: np.ndarray, damping: float = 0.85, iterations: int = 60):
+    """PageRank over cosine similarity ``X X^T`` with the diagonal removed."""
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    xt = matrix.T.tocsr()
+    self_similarity = has_terms.astype(np.float64)
+    degree = matrix @ (xt @ np.ones(n)) - self_similarity
+    degree = np.where(degree > 1e-12, degree, np.inf)
+    rank = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        weighted = rank / degree
+        spread = matrix @ (xt @ weighted) - self_similarity * weighted
+        updated = (1.0 - damping) / n + damping * spread
+        if np.abs(updated - rank).sum() < 1e-7:
+            rank = updated
+            break
+        rank = updated
+    return rank / max(rank.max(), 1e-12)
+
+
+def _cue_mask(lowered: Sequence[str], kind: str) -> np.ndarray:
+    pattern = _CUE_PATTERNS[kind]
+    return np.fromiter(
+        (pattern.search(text) is not None for text in lowered), dtype=bool, count=len(lowered)
+    )
+
+
+def _section_kind(title: str) -> Optional[str]:
+    lowered = title.lower()
+    for kind, words in _SECTION_KINDS:
+        if any(word in lowered for word in words):
+            return kind
+    return None
+
+
+def _select(scores: np.ndarray, matrix, limit: int, redundancy: float = 0.6) -> List[int]:
+    """Top units by score, skipping near-duplicates of units already taken.
+
+    Candidates are compared in blocks with one sparse product per block
+    instead of one per candidate; repetitive meetings reject a lot of them.
+    """
+    order = np.argsort(-scores, kind="stable")
+    order = order[scores[order] > 0]
+    picked: List[int] = []
+    block = limit * 16
+    offset = 0
+    while offset < len(order) and len(picked) < limit:
+        candidates = np.concatenate([np.asarray(picked, dtype=np.int64), order[offset : offset + block]])
+        similarity = (matrix[candidates] @ matrix[candidates].T).toarray()
+        taken = list(range(len(picked)))
+        for position in range(len(picked), len(candidates)):
+            if len(taken) >= limit:
+                break
+            if taken and similarity[position, taken].max() > redundancy:
+                continue
+            taken.append(position)
+        picked = [int(candidates[position]) for position in taken]
+        offset += block
+        block = min(block * 4, 2048)
+    return sorted(picked)
+
+
+def _owner(unit: _Unit, speakers: Sequence[str]) -> Optional[str]:
+    # "ฝากคุณ X ..." / "X, please ..." names someone else than the speaker.
+    for speaker in speakers:
+        if speaker != unit.speaker and re.search(rf"(?<!\w){re.escape(speaker)}(?!\w)", unit.text):
+            return speaker
+    # Without labels (plain text) the owner is the sentence's leading subject.
+    match = _EN_OWNER.match(unit.text) or _TH_OWNER.match(unit.text)
+    if match:
+        who = re.sub(r"\s+", " ", match.group("who"))
+        if who.lower() in _SELF:
+            return unit.speaker
+        if who.lower() not in _NOT_OWNERS:
+            return who
+    return unit.speaker
+
+
+def _clock(seconds: Optional[float]) -> Optional[str]:
+    if seconds is None:
+        return None
+    seconds = int(max(0.0, float(seconds)))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def summarize(
+    transcript: str = "",
+    segments: Optional[Iterable[Dict[str, object]]] = None,
+    sections: Optional[Sequence[str]] = None,
+    style: str = "thai-formal",
+    max_items: int = 6,
+) -> Dict[str, object]:
+    """Summarize a transcript into markdown plus structured sections."""
+    units = _units_from_segments(segments) if segments else _units_from_text(transcript or "")
+    sample = "".join(unit.text for unit in units[:200])
+    thai_chars = len(_THAI_CHAR.findall(sample))
+    language = "th" if style.startswith("thai") or thai_chars > 0.3 * max(1, len(sample)) else "en"
+    labels = _LABELS[language]
+    titles = list(sections or []) or [labels[k] for k in ("key_points", "decisions", "actions", "questions")]
+
+    token_lists = [_tokens(unit.text) for unit in units]
+    matrix, vocab, has_terms = _tfidf(token_lists)
+    centrality = _textrank(matrix, has_terms)
+    lengths = np.fromiter((len(t) for t in token_lists), dtype=np.float64, count=len(units))
+    # Back-channel ("ครับ", "okay") and one-word units are rarely summary material.
+    base = centrality * np.minimum(1.0, lengths / 8.0)
+
+    lowered = [unit.text.lower() for unit in units]
+    speakers = sorted({unit.speaker for unit in units if unit.speaker})
+    out_sections = []
+    lines = [f"# สรุปรายงาน ({style})" if language == "th" else f"# Meeting summary ({style})", ""]
+    if speakers:
+        talk = {s: 0.0 for s in speakers}
+        for unit in units:
+            if unit.speaker:
+                if unit.start is not None and unit.end is not None:
+                    talk[unit.speaker] += max(0.0, float(unit.end) - float(unit.start))
+                else:
+                    talk[unit.speaker] += len(unit.text)
+        total = sum(talk.values()) or 1.0
+        shares = ", ".join(
+            f"{s} ({talk[s] / total:.0%})" for s in sorted(speakers, key=lambda s: -talk[s])
+        )
+        lines += [f"{labels['speakers']}: {shares}", ""]
+
+    for title in titles:
+        kind = _section_kind(title)
+        if kind in _CUES:
+            scores = np.where(_cue_mask(lowered, kind), 0.5 + base, 0.0)
+        elif kind == "key_points" or not units:
+            scores = base
+        else:
+            # Free-form section: rank by similarity to the title itself.
+            query = _tokens(title)
+            ids = [vocab[t] for t in query if t in vocab]
+            relevance = (
+                np.asarray(matrix[:, ids].sum(axis=1)).ravel() if ids else np.zeros(len(units))
+            )
+            scores = relevance * (0.5 + base) if relevance.any() else base
+        picked = _select(scores, matrix, max_items) if units else []
+        items = []
+        lines.append(f"## {title}")
+        for index in picked:
+            unit = units[index]
+            item: Dict[str, object] = {
+                "text": unit.text,
+                "speaker": unit.speaker,
+                "start": unit.start,
+                "end": unit.end,
+            }
+            prefix = f"[{_clock(unit.start)}] " if unit.start is not None else ""
+            who = f"{unit.speaker}: " if unit.speaker else ""
+            if kind == "actions":
+                item["owner"] = _owner(unit, speakers)
+                due = _DUE.search(unit.text)
+                item["due"] = due.group(0) if due else None
+                extras = []
+                if item["owner"]:
+                    extras.append(f"{labels['owner']}: {item['owner']}")
+                if item["due"]:
+                    extras.append(f"{labels['due']}: {item['due']}")
+                suffix = f" — {' · '.join(extras)}" if extras else ""
+                lines.append(f"- [ ] {prefix}{unit.text}{suffix}")
+            else:
+                lines.append(f"- {prefix}{who}{unit.text}")
+            items.append(item)
+        if not items:
+            lines.append(labels["none"])
+        lines.append("")
+        out_sections.append({"title": title, "kind": kind or "custom", "items": items})
+
+    return {
+        "report_markdown": "\n".join(lines).rstrip() + "\n",
+        "sections": out_sections,
+        "language": language,
+        "units": len(units),
+    }
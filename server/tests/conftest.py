@@ -0,0 +1,72 @@
+"""Shared setup: run ``main`` offline against ``benchmarks/stub_model``.
+
+``main`` reads its configuration at import, so the environment is set here,
+before any test module imports it. Jobs, transcripts and spooled PCM go to a
+per-session temporary directory; ``FFMPEG_BIN`` points nowhere, so audio is
+decoded in-process by the stub's ``decode_audio`` (16-bit PCM WAV).
+"""
+
+import io
+import os
+import sys
+import tempfile
+import wave
+
+import numpy as np
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_DIR = os.path.join(SERVER_DIR, "benchmarks", "stub_model")
+_WORKDIR = tempfile.mkdtemp(prefix="meeting-tests-")
+
+TEST_ENV = {
+    "JOBS_DIR": os.path.join(_WORKDIR, "jobs"),
+    "TRANSCRIPT_CACHE_DIR": os.path.join(_WORKDIR, "transcripts"),
+    "PCM_SPOOL_DIR": os.path.join(_WORKDIR, "pcm"),
+    "BROKER_SHARED_DIR": os.path.join(_WORKDIR, "shared"),
+    "WHISPER_MODEL": "tiny",
+    "WARMUP_MODELS": "tiny",
+    "FFMPEG_BIN": os.path.join(_WORKDIR, "no-ffmpeg"),
+    "BENCH_STUB_RTF": "0.001",
+    "DIARIZATION_MODEL": "builtin",
+}
+os.environ.update(TEST_ENV)
+for path in (STUB_DIR, SERVER_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def wav_bytes(seconds: float, seed: int = 0) -> bytes:
+    """Voiced bursts and pauses as a 16 kHz mono 16-bit WAV."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * 16000)
+    audio = rng.normal(0.0, 0.003, total)
+    t = 0
+    while t < total:
+        n = min(int(rng.uniform(0.5, 2.0) * 16000), total - t)
+        time_axis = np.arange(n) / 16000
+        audio[t : t + n] += 0.2 * np.sin(2 * np.pi * rng.uniform(100, 220) * time_axis)
+        t += n + int(rng.uniform(0.2, 0.8) * 16000)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="session")
+def main_module():
+    import main
+
+    return main
+
+
+@pytest.fixture
+def client(main_module):
+    from fastapi.testclient import TestClient
+
+    # ``with`` runs the startup hooks (warm-up, job resumption).
+    with TestClient(main_module.app) as test_client:
+        yield test_client
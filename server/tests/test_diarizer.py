@@ -0,0 +1,41 @@
+import numpy as np
+
+import diarizer
+from benchmarks.diarization import der, run_builtin, synthetic_meeting
+
+REFERENCE = [(0.0, 4.0, "alice"), (4.0, 8.0, "bob"), (8.0, 10.0, "alice")]
+
+
+def test_der_is_zero_for_a_relabelled_copy_of_the_reference():
+    hypothesis = [(s, e, {"alice": "SPEAKER_01", "bob": "SPEAKER_00"}[n]) for s, e, n in REFERENCE]
+    assert der(REFERENCE, hypothesis, 10.0) == {
+        "der": 0.0, "missed": 0.0, "false_alarm": 0.0, "confusion": 0.0, "speakers": 2,
+    }
+
+
+def test_der_splits_errors_into_missed_false_alarm_and_confusion():
+    hypothesis = [(0.0, 4.0, "A"), (4.0, 6.0, "B"), (8.0, 10.0, "B"), (10.0, 11.0, "A")]
+    score = der(REFERENCE, hypothesis, 11.0)
+    # 10 s of reference speech: 6-8 missed, 10-11 false alarm, and 8-10 is
+    # bob's label on alice's speech after the best one-to-one mapping.
+    assert score["missed"] == 0.2
+    assert score["false_alarm"] == 0.1
+    assert score["confusion"] == 0.2
+    assert score["der"] == 0.5
+
+
+def test_collar_ignores_boundary_frames():
+    hypothesis = [(0.0, 4.2, "A"), (4.2, 8.0, "B"), (8.0, 10.0, "A")]
+    assert der(REFERENCE, hypothesis, 10.0)["der"] > 0.0
+    assert der(REFERENCE, hypothesis, 10.0, collar=0.25)["der"] == 0.0
+
+
+def test_builtin_diarizer_on_a_synthetic_meeting():
+    audio, reference = synthetic_meeting(1.0, 3, seed=1)
+    score = der(reference, run_builtin(audio, None), len(audio) / diarizer.SAMPLE_RATE, collar=0.25)
+    assert score["speakers"] == 3
+    assert score["der"] < 0.05
+
+
+def test_silence_has_no_turns():
+    assert diarizer.diarize(np.zeros(diarizer.SAMPLE_RATE * 5, dtype=np.float32)) == []
@@ -0,0 +1,100 @@
+import io
+import json
+import os
+
+import pytest
+
+import exporters
+
+SEGMENTS = [
+    {"start": 0.0, "end": 1.5, "text": " Hello", "speaker": "SPEAKER_00"},
+    {"start": 3661.25, "end": 3662.0, "text": " a <b> & c --> d"},
+]
+
+
+def _text(chunks):
+    return b"".join(chunks).decode("utf-8")
+
+
+def test_normalize_format_aliases_and_rejects_unknown():
+    assert exporters.normalize_format(None) == "txt"
+    assert exporters.normalize_format(" WebVTT ") == "vtt"
+    assert exporters.normalize_format("docs") == "docx"
+    with pytest.raises(ValueError):
+        exporters.normalize_format("pdf")
+
+
+def test_render_srt():
+    assert _text(exporters.render_srt(SEGMENTS)) == (
+        "1\n00:00:00,000 --> 00:00:01,500\n[SPEAKER_00] Hello\n\n"
+        "2\n01:01:01,250 --> 01:01:02,000\na <b> & c --> d\n\n"
+    )
+
+
+def test_render_vtt_escapes_cue_text():
+    assert _text(exporters.render_vtt(SEGMENTS)) == (
+        "WEBVTT\n\n"
+        "00:00:00.000 --> 00:00:01.500\n<v SPEAKER_00>Hello\n\n"
+        "01:01:01.250 --> 01:01:02.000\na &lt;b> &amp; c -> d\n\n"
+    )
+
+
+def test_render_txt_sections():
+    out = _text(exporters.render_txt([("Transcript", "", SEGMENTS), ("Report", "line 1\nline 2\n", None)]))
+    assert out == (
+        "## Transcript\n[00:00:00] SPEAKER_00: Hello\n[01:01:01] a <b> & c --> d\n"
+        "\n## Report\nline 1\nline 2\n"
+    )
+
+
+def test_render_json_round_trips():
+    out = json.loads(_text(exporters.render_json(SEGMENTS, "", "# สรุป", {"job_id": "j1"})))
+    assert out == {"job_id": "j1", "report_markdown": "# สรุป", "segments": SEGMENTS}
+    plain = json.loads(_text(exporters.render_json(None, "ข้อความ", "", {})))
+    assert plain == {"transcript": "ข้อความ", "segments": []}
+
+
+def test_render_docx_builds_a_word_document(monkeypatch):
+    docx = pytest.importorskip("docx")
+    # Small chunks check that the saved package is handed out in pieces.
+    monkeypatch.setattr(exporters, "CHUNK_BYTES", 1024)
+    chunks = list(exporters.render_docx([("Transcript", "", SEGMENTS * 50), ("Report", "# สรุป\n\nข้อ 1", None)]))
+    assert len(chunks) > 1 and all(len(chunk) <= 1024 for chunk in chunks)
+    document = docx.Document(io.BytesIO(b"".join(chunks)))
+    headings = [p.text for p in document.paragraphs if p.style.name == "Heading 1"]
+    assert headings == ["Transcript", "Report"]
+    texts = [p.text for p in document.paragraphs]
+    assert texts.count("[00:00:00] SPEAKER_00: Hello") == 50
+    assert "[01:01:01] a <b> & c --> d" in texts
+    assert document.paragraphs[1].runs[1].bold
+
+
+def test_render_docx_without_python_docx_fails_before_streaming(monkeypatch):
+    monkeypatch.setattr(exporters, "_DocxDocument", None)
+    with pytest.raises(RuntimeError, match="python-docx"):
+        exporters.render_docx([("Transcript", "text", None)])
+
+
+def test_export_cache_keeps_each_variant_of_a_result(main_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(main_module, "_EXPORT_DIR", str(tmp_path))
+    job = {"id": "j1", "updated_at": 100.0}
+
+    def render(fmt, include_report, body):
+        req = main_module.ExportRequest(job_id="j1", include_report=include_report, report_markdown="# r", format=fmt)
+        path = main_module._export_cache_path(job, req, fmt)
+        assert list(main_module._tee_to_cache(iter([body]), path)) == [body]
+        return path
+
+    plain = render("txt", False, b"plain")
+    report = render("txt", True, b"report")
+    vtt = render("vtt", False, b"vtt")
+    # Alternating options of one result never evict each other.
+    assert render("txt", False, b"plain") == plain
+    for path, body in ((plain, b"plain"), (report, b"report"), (vtt, b"vtt")):
+        with open(path, "rb") as fh:
+            assert fh.read() == body
+    # A new result retires every rendering of the old one.
+    job["updated_at"] = 200.0
+    fresh = render("txt", False, b"fresh")
+    assert fresh != plain
+    assert sorted(os.listdir(tmp_path / "j1")) == [os.path.basename(fresh)]
@@ -0,0 +1,17 @@
+import threading
+
+
+def test_healthz_reads_the_job_store_off_the_event_loop(client, main_module, monkeypatch):
+    loop_thread = client.portal.call(threading.current_thread)
+    seen = []
+    real_stats = main_module._JOB_STORE.stats
+
+    def stats():
+        seen.append(threading.current_thread())
+        return real_stats()
+
+    monkeypatch.setattr(main_module._JOB_STORE, "stats", stats)
+    body = client.get("/healthz").json()
+    assert body["ok"] is True
+    assert isinstance(body["jobs"], dict)
+    assert seen and seen[0] is not loop_thread
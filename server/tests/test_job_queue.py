@@ -0,0 +1,170 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from conftest import wav_bytes
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_priority_then_fair_share_then_shortest_job(main_module):
+    async def scenario():
+        queue = main_module._JobQueue(1)
+        running = await queue.enqueue("normal", "a", 10.0)
+        waiting = {
+            "a-long": await queue.enqueue("normal", "a", 600.0),
+            "a-short": await queue.enqueue("normal", "a", 30.0),
+            "b": await queue.enqueue("normal", "b", 900.0),
+            "low": await queue.enqueue("low", "c", 1.0),
+            "high": await queue.enqueue("high", "d", 900.0),
+        }
+        positions = {name: t.current_position for name, t in waiting.items()}
+        order = []
+        current = running
+        for _ in waiting:
+            await current.release()
+            current = next(t for t in waiting.values() if t._event.is_set() and t not in order)
+            order.append(current)
+        await current.release()
+        names = {id(t): name for name, t in waiting.items()}
+        return positions, [names[id(t)] for t in order]
+
+    positions, order = _run(scenario())
+    # high class first; then clients a and b alternate, a's shortest job first.
+    assert order == ["high", "a-short", "b", "a-long", "low"]
+    assert positions == {"high": 1, "a-short": 2, "b": 3, "a-long": 4, "low": 5}
+
+
+def test_full_queue_rejects_with_retry_after(main_module):
+    async def scenario():
+        queue = main_module._JobQueue(1, max_depth=1)
+        running = await queue.enqueue("normal", "a")
+        waiting = await queue.enqueue("normal", "b")
+        with pytest.raises(main_module._QueueFull) as excinfo:
+            await queue.enqueue("normal", "c")
+        # Restarted jobs bypass admission.
+        resumed = await queue.enqueue("normal", "c", enforce_limits=False)
+        stats = await queue.stats()
+        for ticket in (running, waiting, resumed):
+            await ticket.release()
+        return excinfo.value, stats
+
+    error, stats = _run(scenario())
+    assert error.retry_after >= 1
+    assert stats["rejected"] == 1 and stats["waiting"] == 2
+
+
+def _hold_queue(client, main_module, monkeypatch, **limits):
+    """Swap in a one-slot queue whose slot is taken, and return the holder ticket."""
+    queue = main_module._JobQueue(1, **limits)
+    monkeypatch.setattr(main_module, "_JOB_QUEUE", queue)
+    return queue, client.portal.call(queue.enqueue, "normal", "holder", 0.0)
+
+
+def test_transcribe_returns_429_when_queue_is_full(client, main_module, monkeypatch):
+    queue, holder = _hold_queue(client, main_module, monkeypatch, max_depth=1)
+    waiter = client.portal.call(queue.enqueue, "normal", "other", 0.0)
+    try:
+        response = client.post("/transcribe", files={"file": ("q.wav", wav_bytes(2, seed=5))})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert response.json()["detail"] == "คิวงานเต็ม กรุณาลองใหม่ภายหลัง"
+        jobs = client.post("/jobs", files={"file": ("q.wav", wav_bytes(2, seed=5))})
+        assert jobs.status_code == 429
+    finally:
+        client.portal.call(waiter.release)
+        client.portal.call(holder.release)
+
+
+def _wait_for_status(client, job_id, statuses, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} stuck in {job['status']}")
+
+
+def test_delete_cancels_a_queued_job(client, main_module, monkeypatch):
+    queue, holder = _hold_queue(client, main_module, monkeypatch)
+    try:
+        job_id = client.post("/jobs", files={"file": ("c.wav", wav_bytes(3, seed=8))}).json()["job_id"]
+        _wait_for_status(client, job_id, {"queued"})
+        assert client.delete(f"/jobs/{job_id}").json() == {"job_id": job_id, "status": "cancelling"}
+        job = _wait_for_status(client, job_id, {"cancelled", "done", "error"})
+        assert job["status"] == "cancelled"
+        events = client.get(f"/jobs/{job_id}/events", params={"follow": "false"}).text
+        last = json.loads(events.strip().splitlines()[-1])
+        assert last["event"] == "cancelled" and last["reason"] == "request"
+        stats = client.portal.call(queue.stats)
+        assert stats["waiting"] == 0 and stats["active"] == 1  # only the holder
+    finally:
+        client.portal.call(holder.release)
+    # A finished job is deleted outright.
+    assert client.delete(f"/jobs/{job_id}").json()["status"] == "deleted"
+    assert client.get(f"/jobs/{job_id}").status_code == 404
+
+
+def test_riders_join_a_batch_without_taking_slots(main_module):
+    async def scenario():
+        queue = main_module._JobQueue(1, max_riders=2)
+        holder = await queue.enqueue("normal", "a", 10.0)
+        tickets = [await queue.enqueue("normal", c, 5.0) for c in ("a", "b", "c", "d")]
+        for ticket in tickets[:3]:
+            ticket.batch_key = "k"
+        tickets[3].batch_key = "other"
+        admitted = await queue.admit_riders("k", 5)
+        granted = [t._event.is_set() for t in tickets]
+        stats = await queue.stats()
+        for ticket in tickets:
+            if ticket._event.is_set():
+                await ticket.wait_until_ready()
+        await tickets[0].release()  # a rider going leaves the slot taken
+        after_rider = (await queue.stats())["active"]
+        await holder.release()
+        next_up = [t for t in tickets if t._event.is_set()]
+        for ticket in tickets:
+            await ticket.release()
+        return admitted, granted, stats, after_rider, next_up, tickets
+
+    admitted, granted, stats, after_rider, next_up, tickets = _run(scenario())
+    # max_riders caps it at two, taken in dispatch order; "other" never rides.
+    assert admitted == 2 and granted == [True, True, False, False]
+    assert stats["active"] == 1 and stats["riders"] == 2 and stats["waiting"] == 2
+    assert after_rider == 1
+    # The holder's slot goes to the next waiter as usual.
+    assert tickets[2] in next_up and tickets[3] not in next_up
+
+
+def test_batch_pulls_waiting_jobs_into_one_call(client, main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "WHISPER_BATCHING", True)
+    scheduler = main_module._BatchScheduler(8, 1.0)
+    monkeypatch.setattr(main_module, "_BATCH_SCHEDULER", scheduler)
+    queue = main_module._JobQueue(1, max_riders=7)
+    monkeypatch.setattr(main_module, "_JOB_QUEUE", queue)
+    holder = client.portal.call(queue.enqueue, "normal", "holder", 0.0)
+    job_ids = [
+        client.post("/jobs", files={"file": ("b.wav", wav_bytes(3, seed=40 + i))}, data={"language": "th"}).json()[
+            "job_id"
+        ]
+        for i in range(3)
+    ]
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        waiting = [t for lane in queue._lanes for ts in lane.values() for t in ts]
+        if len(waiting) == 3 and all(t.batch_key for t in waiting):
+            break
+        time.sleep(0.02)
+    else:
+        raise AssertionError("jobs never became batchable")
+    client.portal.call(holder.release)
+    for job_id in job_ids:
+        assert _wait_for_status(client, job_id, {"done", "error"})["status"] == "done"
+    # One slot, three jobs, one BatchedInferencePipeline call.
+    assert scheduler.batches == 1 and scheduler.jobs == 3
+    assert client.portal.call(queue.stats)["active"] == 0
@@ -0,0 +1,51 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import wav_bytes
+
+
+def _audio(tmp_path, seconds):
+    import faster_whisper
+
+    path = tmp_path / "long.wav"
+    path.write_bytes(wav_bytes(seconds, seed=21))
+    return faster_whisper.decode_audio(str(path))
+
+
+def _decode_seconds(main_module, audio, language):
+    async def run():
+        segments = []
+        async for kind, item in main_module._iter_longform_transcription("tiny", audio, language=language):
+            if kind == "segment":
+                segments.append(item)
+        return segments
+
+    started = time.perf_counter()
+    segments = asyncio.run(run())
+    return time.perf_counter() - started, segments
+
+
+@pytest.mark.parametrize("language", ["th", None])
+def test_longform_wall_clock_drops_with_more_workers(main_module, monkeypatch, tmp_path, language):
+    import faster_whisper
+
+    audio = _audio(tmp_path, 80)
+    monkeypatch.setattr(faster_whisper, "_RTF", 0.02)  # about 1.6 s of decoding in all
+    monkeypatch.setattr(main_module, "LONGFORM_CHUNK_SECONDS", 10.0)
+    assert len(main_module._plan_chunks(audio, 10.0)) >= 4
+    timings = {}
+    for workers in (1, 4):
+        monkeypatch.setattr(main_module, "_MODEL_REGISTRY", main_module._ModelRegistry(2, 0, None))
+        monkeypatch.setattr(main_module, "_LONGFORM_EXECUTOR", ThreadPoolExecutor(workers))
+        monkeypatch.setattr(main_module, "LONGFORM_MODEL_WORKERS", workers)
+        timings[workers], segments = _decode_seconds(main_module, audio, language)
+        assert [s.start for s in segments] == sorted(s.start for s in segments)
+        assert segments[-1].end == pytest.approx(80.0, abs=0.01)
+        stats = main_module._MODEL_REGISTRY.stats()["resident"]
+        assert [entry["workers"] for entry in stats] == [workers]
+    # Chunks decode side by side, including the first when the language is
+    # detected rather than given.
+    assert timings[4] < 0.5 * timings[1], timings
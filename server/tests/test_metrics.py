@@ -0,0 +1,47 @@
+import metrics
+from conftest import wav_bytes
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry()
+    hist = registry.histogram("job_seconds", "Job time.", ["mode"], buckets=(1, 5))
+    for value in (0.5, 1.0, 3.0, 7.0):
+        hist.observe(value, mode="batch")
+    assert hist.count(mode="batch") == 4
+    assert registry.render().splitlines() == [
+        "# HELP job_seconds Job time.",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{mode="batch",le="1"} 2',
+        'job_seconds_bucket{mode="batch",le="5"} 3',
+        'job_seconds_bucket{mode="batch",le="+Inf"} 4',
+        'job_seconds_sum{mode="batch"} 11.5',
+        'job_seconds_count{mode="batch"} 4',
+    ]
+
+
+def test_counter_escapes_label_values():
+    registry = metrics.Registry()
+    counter = registry.counter("jobs", "Jobs.", ["outcome"])
+    counter.inc(outcome='bad "x"\n')
+    counter.inc(2, outcome="done")
+    lines = registry.render().splitlines()
+    assert 'jobs_total{outcome="bad \\"x\\"\\n"} 1' in lines
+    assert 'jobs_total{outcome="done"} 2' in lines
+
+
+def test_metrics_endpoint_reports_a_transcription(client):
+    response = client.post("/transcribe", files={"file": ("m.wav", wav_bytes(4, seed=21))})
+    assert response.status_code == 200
+    scrape = client.get("/metrics")
+    assert scrape.status_code == 200
+    assert scrape.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = scrape.text.splitlines()
+    assert "# TYPE meeting_decode_seconds histogram" in lines
+    assert any(
+        line.startswith('meeting_upload_bytes_bucket{endpoint="transcribe",le="+Inf"} ')
+        for line in lines
+    )
+    assert any(
+        line.startswith("meeting_jobs_total{") and 'endpoint="transcribe"' in line
+        for line in lines
+    )
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+
+def test_allowed_models_resolve_off_the_event_loop(client, main_module, monkeypatch):
+    loop_thread = client.portal.call(threading.current_thread)
+    registry = main_module._ModelRegistry(1, 0, None)
+    monkeypatch.setattr(main_module, "_MODEL_REGISTRY", registry)
+    seen = []
+    stock = main_module._lazy("faster_whisper")
+    real = stock.available_models
+
+    def available_models():
+        seen.append(threading.current_thread())
+        return real()
+
+    monkeypatch.setattr(stock, "available_models", available_models)
+    client.portal.call(main_module._ensure_model_allowed, "small")
+    client.portal.call(main_module._ensure_model_allowed, "base")
+    assert len(seen) == 1 and seen[0] is not loop_thread
+    with pytest.raises(main_module.HTTPException):
+        client.portal.call(main_module._ensure_model_allowed, "no-such-model")
+
+
+def test_warm_up_resolves_the_allowed_models(client, main_module):
+    assert main_module._MODEL_REGISTRY.allowed_resolved
+    assert main_module._WARM_UP.steps["import faster_whisper"]["status"] == "done"
+
+
+def test_a_pinned_model_outlives_eviction(main_module):
+    registry = main_module._ModelRegistry(1, 0, None)
+    with registry.use("tiny") as tiny:
+        # A second model puts the registry over budget; the pinned one stays
+        # resident and the idle one goes instead.
+        with registry.use("base"):
+            assert sorted(registry.loaded_names()) == ["base", "tiny"]
+        assert registry.loaded_names() == ["tiny"]
+        assert tiny.name == "tiny"
+    with registry.use("base"):
+        assert registry.loaded_names() == ["base"]
+
+
+@pytest.mark.parametrize("workers, warns", [(None, False), ("1", True), ("4", False)])
+def test_num_workers_follows_transcribe_concurrency(workers, warns):
+    from conftest import SERVER_DIR, STUB_DIR, TEST_ENV
+
+    env = dict(os.environ, **TEST_ENV, TRANSCRIBE_CONCURRENCY="3", PYTHONPATH=STUB_DIR)
+    env.pop("WHISPER_NUM_WORKERS", None)
+    if workers is not None:
+        env["WHISPER_NUM_WORKERS"] = workers
+    out = subprocess.run(
+        [sys.executable, "-c", "import main; print(main.NUM_WORKERS_DEFAULT)"],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    assert out.splitlines()[-1] == (workers or "3")
+    assert ("[WARN] WHISPER_NUM_WORKERS" in out) is warns
@@ -0,0 +1,60 @@
+import pytest
+
+import response_encoding
+from response_encoding import negotiate
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("", False),
+        ("gzip", True),
+        ("gzip;q=0", False),
+        ("gzip; q=0.0", False),
+        ("gzip;q=0.000", False),
+        ("GZIP ; Q = 0", False),
+        ("gzip;q=0.5", True),
+        ("deflate, gzip;q=0.01", True),
+        ("gzip;level=1;q=0", False),  # q after another parameter
+        ("gzip;q=oops", False),
+        ("*", True),
+        ("*;q=0", False),
+        ("br, *;q=0.1", True),
+        ("gzip;q=0, *", False),  # the explicit refusal beats the wildcard
+        ("gzip, *;q=0", True),
+        ("identity", False),
+        ("x-gzip", False),
+    ],
+)
+def test_gzip_negotiation(header, expected):
+    assert negotiate("", header)[1] is expected
+
+
+@pytest.fixture
+def with_msgpack(monkeypatch):
+    # negotiate only checks that msgpack is importable.
+    monkeypatch.setattr(response_encoding, "_msgpack", object())
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("", "application/json"),
+        ("application/msgpack", "application/msgpack"),
+        ("application/x-msgpack;q=0.8", "application/msgpack"),
+        ("application/msgpack;q=0", "application/json"),
+        ("application/msgpack ; charset=x ; q=0", "application/json"),
+        ("*/*", "application/json"),  # wildcards never switch a JSON client
+        ("application/*", "application/json"),
+        ("application/json, application/msgpack;q=0.5", "application/json"),
+        ("application/json;q=0.5, application/msgpack", "application/msgpack"),
+        ("*/*;q=0.1, application/msgpack", "application/msgpack"),
+    ],
+)
+def test_media_type_negotiation(with_msgpack, header, expected):
+    assert negotiate(header, "")[0] == expected
+
+
+def test_msgpack_is_not_offered_when_it_is_not_installed(monkeypatch):
+    monkeypatch.setattr(response_encoding, "_msgpack", None)
+    assert negotiate("application/msgpack", "")[0] == "application/json"
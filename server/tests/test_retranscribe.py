@@ -0,0 +1,128 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import wav_bytes
+
+
+def _segs(*spans):
+    return [{"start": s, "end": e, "text": f"{s}-{e}"} for s, e in spans]
+
+
+SEGMENTS = _segs((0.0, 5.0), (5.0, 10.0), (12.0, 15.0), (15.0, 20.0))
+
+
+@pytest.mark.parametrize(
+    "start, end, expected",
+    [
+        # Cuts through one segment: widened to its edges.
+        (6.0, 8.0, (1, 2, 5.0, 10.0)),
+        # Spans two segments and the gap between them.
+        (9.0, 13.0, (1, 3, 5.0, 15.0)),
+        # Touching the start of the recording.
+        (0.0, 1.0, (0, 1, 0.0, 5.0)),
+        # Touching the end, past the last segment.
+        (19.0, 25.0, (3, 4, 15.0, 25.0)),
+        # Entirely inside a gap: nothing replaced, window unchanged.
+        (10.5, 11.5, (2, 2, 10.5, 11.5)),
+        # A boundary between segments only touches the later one.
+        (10.0, 12.5, (2, 3, 10.0, 15.0)),
+    ],
+)
+def test_affected_span(main_module, start, end, expected):
+    assert main_module._affected_span(SEGMENTS, start, end) == expected
+
+
+def test_affected_span_without_segments(main_module):
+    assert main_module._affected_span([], 1.0, 2.0) == (0, 0, 1.0, 2.0)
+
+
+def _finished_job(client, seconds=20, seed=3):
+    job_id = client.post("/jobs", files={"file": ("r.wav", wav_bytes(seconds, seed=seed))}).json()["job_id"]
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "error", "cancelled"):
+            assert job["status"] == "done"
+            return job
+        time.sleep(0.05)
+    raise AssertionError("job did not finish")
+
+
+def _spans(job):
+    return [(s["start"], s["end"]) for s in job["result"]["segments"]]
+
+
+def test_retranscribe_replaces_only_the_affected_segments(client):
+    job = _finished_job(client)
+    before = job["result"]["segments"]
+    assert _spans(job) == [(0.0, 5.0), (5.0, 10.0), (10.0, 15.0), (15.0, 20.0)]
+
+    response = client.post(f"/jobs/{job['job_id']}/retranscribe", json={"start": 6, "end": 8})
+    assert response.status_code == 200
+    view = response.json()
+    assert view["retranscribe"]["start"] == 5.0 and view["retranscribe"]["end"] == 10.0
+    assert view["retranscribe"]["replaced"] == 1
+    after = view["result"]["segments"]
+    assert _spans(view) == _spans(job)
+    assert after[0] == before[0] and after[2:] == before[2:]
+    assert after[1]["text"].strip() == "segment 0"  # decoded on its own
+
+
+@pytest.mark.parametrize("start, end, first, last", [(0, 2, 0, 1), (17, 30, 3, 4)])
+def test_retranscribe_at_the_edges(client, start, end, first, last):
+    job = _finished_job(client)
+    view = client.post(f"/jobs/{job['job_id']}/retranscribe", json={"start": start, "end": end}).json()
+    edit = view["retranscribe"]
+    # Clamped to the recording and widened to the segments it touches.
+    assert (edit["start"], edit["end"]) == (_spans(job)[first][0], _spans(job)[last - 1][1])
+    assert _spans(view) == _spans(job)
+    untouched = [i for i in range(4) if not first <= i < last]
+    assert [view["result"]["segments"][i] for i in untouched] == [job["result"]["segments"][i] for i in untouched]
+
+
+def test_overlapping_retranscribes_are_applied_one_after_the_other(client):
+    job = _finished_job(client)
+    url = f"/jobs/{job['job_id']}/retranscribe"
+    with ThreadPoolExecutor(2) as pool:
+        responses = list(pool.map(lambda span: client.post(url, json=span), [
+            {"start": 4, "end": 11},
+            {"start": 8, "end": 12},
+        ]))
+    assert [r.status_code for r in responses] == [200, 200]
+    final = client.get(f"/jobs/{job['job_id']}").json()
+    # Each splice saw the other's result: neither edit was lost.
+    assert len(final["result"]["retranscribed"]) == 2
+    assert _spans(final) == sorted(_spans(final))
+    assert final["result"]["segments"][-1]["end"] == 20.0
+
+
+def test_retranscribe_decodes_the_upload_again_once_pcm_is_evicted(client, main_module):
+    # A fresh recording: a transcript-cache hit never decodes (or retains) PCM.
+    job = _finished_job(client, seed=11)
+    pcm = main_module._job_pcm_path(main_module._JOB_STORE.get(job["job_id"]))
+    assert os.path.exists(pcm)
+    os.remove(pcm)
+    view = client.post(f"/jobs/{job['job_id']}/retranscribe", json={"start": 6, "end": 8}).json()
+    assert _spans(view) == _spans(job)
+    assert os.path.exists(pcm)  # retained again for the next edit
+
+
+def test_retained_pcm_is_capped_least_recently_used_first(main_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(main_module, "PCM_KEEP_MAX_BYTES", 2500)
+    paths = []
+    for index in range(4):
+        path = tmp_path / f"job{index}.f32"
+        path.write_bytes(b"\0" * 1000)
+        os.utime(path, (1000 + index, 1000 + index))
+        paths.append(str(path))
+    (tmp_path / "job0").write_bytes(b"\0" * 5000)  # uploads do not count
+    # job0 was used most recently, so job1 and job2 are the ones evicted.
+    main_module._retain_pcm(paths[0])
+    assert sorted(os.listdir(tmp_path)) == ["job0", "job0.f32", "job3.f32"]
+    # The file being retained stays even when it alone is over the cap.
+    monkeypatch.setattr(main_module, "PCM_KEEP_MAX_BYTES", 10)
+    main_module._retain_pcm(paths[3])
+    assert sorted(os.listdir(tmp_path)) == ["job0", "job3.f32"]
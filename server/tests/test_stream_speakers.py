@@ -0,0 +1,71 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from conftest import wav_bytes
+
+TURNS = [
+    {"start": 0.0, "end": 10.0, "speaker": "SPEAKER_00"},
+    {"start": 10.0, "end": 20.0, "speaker": "SPEAKER_01"},
+]
+
+
+def test_speaker_labels_arrive_mid_stream(client, main_module, monkeypatch):
+    state = {}
+
+    def event(name):
+        if name not in state:
+            state[name] = asyncio.Event()
+        return state[name]
+
+    real_timeline_from = main_module._timeline_from
+
+    def timeline_from(diarizing):
+        event("labelled").set()
+        return real_timeline_from(diarizing)
+
+    async def diarize(audio_future, cancel=None):
+        await audio_future
+        await event("diarized").wait()
+        return {"applied": True, "reason": None, "segments": TURNS}
+
+    async def decode(model_size, audio, **kwargs):
+        yield "info", SimpleNamespace(language="th", duration=20.0)
+        for start in (0.0, 5.0, 10.0, 15.0):
+            if start == 10.0:
+                # Diarization finishes while the decoder is between segments;
+                # the stream has to pick it up without a new segment arriving.
+                event("diarized").set()
+                await asyncio.wait_for(event("labelled").wait(), 5)
+            yield "segment", SimpleNamespace(start=start, end=start + 5.0, text=f" part {int(start)}")
+
+    monkeypatch.setattr(main_module, "_diarize_async", diarize)
+    monkeypatch.setattr(main_module, "_iter_transcription", decode)
+    monkeypatch.setattr(main_module, "_timeline_from", timeline_from)
+    monkeypatch.setattr(main_module, "WHISPER_BATCHING", False)
+    with client.stream(
+        "POST",
+        "/transcribe_stream",
+        files={"file": ("s.wav", wav_bytes(20, seed=60))},
+        data={"diarize": "true", "long_form": "false"},
+    ) as response:
+        events = [json.loads(line) for line in response.iter_lines() if line.strip()]
+
+    flow = [
+        (e["event"], e.get("start"), e.get("speaker"), e.get("segments"))
+        for e in events
+        if e["event"] in ("progress", "speakers") and (e["event"] == "speakers" or "start" in e)
+    ]
+    assert flow == [
+        ("progress", 0.0, None, None),
+        ("progress", 5.0, None, None),
+        # Sent as soon as diarization is done, before the next segment decodes.
+        ("speakers", None, None, [{"index": 0, "speaker": "SPEAKER_00"}, {"index": 1, "speaker": "SPEAKER_00"}]),
+        ("progress", 10.0, "SPEAKER_01", None),
+        ("speakers", None, None, [{"index": 2, "speaker": "SPEAKER_01"}]),
+        ("progress", 15.0, "SPEAKER_01", None),
+        ("speakers", None, None, [{"index": 3, "speaker": "SPEAKER_01"}]),
+    ]
+    done = events[-1]
+    assert done["event"] == "done"
+    assert [s["speaker"] for s in done["segments"]] == ["SPEAKER_00", "SPEAKER_00", "SPEAKER_01", "SPEAKER_01"]
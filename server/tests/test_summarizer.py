@@ -0,0 +1,55 @@
+import summarizer
+
+TRANSCRIPT = "\n".join(
+    [
+        "Somchai will send the report by Friday.",
+        "We decided to go with vendor B.",
+        "Malee, please follow up with the client next week.",
+        "I'll prepare the slides tomorrow.",
+        "Someone needs to follow up with legal next month.",
+    ]
+)
+
+
+def _actions(result):
+    section = next(s for s in result["sections"] if s["kind"] == "actions")
+    return {item["text"]: (item["owner"], item["due"]) for item in section["items"]}
+
+
+def test_plain_text_action_owner_is_the_leading_name():
+    actions = _actions(summarizer.summarize(TRANSCRIPT, style="english"))
+    assert actions["Somchai will send the report by Friday."] == ("Somchai", "by Friday")
+    assert actions["Malee, please follow up with the client next week."] == ("Malee", "next week")
+    # Pronouns and non-names give no owner when nobody is labelled as speaker.
+    assert actions["I'll prepare the slides tomorrow."] == (None, "tomorrow")
+    assert actions["Someone needs to follow up with legal next month."] == (None, "next month")
+
+
+def test_thai_owner_needs_an_honorific_or_is_the_speaker():
+    result = summarizer.summarize(
+        "\n".join(
+            [
+                "ฝากคุณสมชายช่วยเตรียมเอกสารภายในวันศุกร์",
+                "SPEAKER_01: ผมจะส่งสรุปให้พรุ่งนี้",
+                "ฝากช่วยตรวจงบประมาณภายในวันจันทร์",
+            ]
+        )
+    )
+    actions = _actions(result)
+    assert actions["ฝากคุณสมชายช่วยเตรียมเอกสารภายในวันศุกร์"][0] == "คุณสมชาย"
+    assert actions["ผมจะส่งสรุปให้พรุ่งนี้"] == ("SPEAKER_01", "พรุ่งนี้")
+    assert actions["ฝากช่วยตรวจงบประมาณภายในวันจันทร์"][0] is None
+
+
+def test_named_speaker_wins_over_the_one_talking(client):
+    segments = [
+        {"start": 0.0, "end": 4.0, "speaker": "Nok", "text": "Somchai will send the report by Friday."},
+        {"start": 4.0, "end": 8.0, "speaker": "Somchai", "text": "Nok, please check the budget."},
+        {"start": 8.0, "end": 12.0, "speaker": "Nok", "text": "I'll book the room for next week."},
+    ]
+    response = client.post("/summarize", json={"segments": segments, "style": "english"})
+    assert response.status_code == 200
+    actions = _actions(response.json())
+    assert actions["Somchai will send the report by Friday."][0] == "Somchai"
+    assert actions["Nok, please check the budget."][0] == "Nok"
+    assert actions["I'll book the room for next week."][0] == "Nok"
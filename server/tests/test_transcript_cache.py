@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import SERVER_DIR, STUB_DIR, TEST_ENV, wav_bytes
+
+
+def _fill(directory, entries, size):
+    os.makedirs(directory, exist_ok=True)
+    for index in range(entries):
+        path = os.path.join(directory, f"key{index:03d}.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(json.dumps({"pad": "x" * size}))
+        os.utime(path, (1000 + index, 1000 + index))
+
+
+def test_import_with_over_budget_cache_dir_evicts_oldest(tmp_path):
+    # 3 MB on disk against a 1 MB budget: import must evict, not crash.
+    cache_dir = tmp_path / "transcripts"
+    _fill(cache_dir, 6, 512 * 1024)
+    env = dict(os.environ, **TEST_ENV)
+    env.update(
+        TRANSCRIPT_CACHE_DIR=str(cache_dir),
+        TRANSCRIPT_CACHE_MAX_MB="1",
+        JOBS_DIR=str(tmp_path / "jobs"),
+        PYTHONPATH=os.pathsep.join([STUB_DIR, SERVER_DIR]),
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", "import json, main; print(json.dumps(main._TRANSCRIPT_CACHE.stats()))"],
+        cwd=SERVER_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert out.returncode == 0, out.stderr
+    stats = json.loads(out.stdout.strip().splitlines()[-1])
+    assert stats["evictions"] == 5
+    assert stats["bytes"] <= stats["max_bytes"]
+    # Oldest mtimes go first.
+    assert sorted(os.listdir(cache_dir)) == ["key005.json"]
+
+
+def test_put_get_and_evict(main_module, tmp_path):
+    cache = main_module._TranscriptCache(str(tmp_path), 300)
+    assert cache.get("a") is None
+    cache.put("a", {"segments": [[0.0, 1.0, "x" * 100]]})
+    assert cache.get("a")["segments"][0][2] == "x" * 100
+    cache.put("b", {"segments": [[0.0, 1.0, "y" * 100]]})
+    cache.get("a")  # "a" is now the most recently used
+    cache.put("c", {"segments": [[0.0, 1.0, "z" * 100]]})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 4 and stats["misses"] == 2
+    assert not os.path.exists(tmp_path / "b.json")
+
+
+def test_repeat_upload_is_served_from_cache(client):
+    audio = wav_bytes(6, seed=11)
+    first = client.post("/transcribe", files={"file": ("a.wav", audio)}, data={"language": "th"})
+    second = client.post("/transcribe", files={"file": ("a.wav", audio)}, data={"language": "th"})
+    assert first.status_code == second.status_code == 200
+    assert first.json()["cache"] == {"hit": False}
+    assert second.json()["cache"] == {"hit": True}
+    assert second.json()["segments"] == first.json()["segments"]
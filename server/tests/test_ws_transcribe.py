@@ -0,0 +1,49 @@
+import time
+
+import numpy as np
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+
+def test_missing_ffmpeg_sends_error_and_closes_1011(client):
+    # FFMPEG_BIN points at a file that does not exist in the test environment.
+    with client.websocket_connect("/ws/transcribe?format=ogg") as ws:
+        message = ws.receive_json()
+        assert message["event"] == "error"
+        assert "ffmpeg" in message["detail"]
+        with pytest.raises(WebSocketDisconnect) as excinfo:
+            ws.receive_json()
+    assert excinfo.value.code == 1011
+
+
+def test_pcm_stream_needs_no_ffmpeg(client):
+    pcm = (np.sin(np.arange(16000 * 3) / 16000 * 2 * np.pi * 180) * 8000).astype("<i2")
+    with client.websocket_connect("/ws/transcribe?format=s16le") as ws:
+        ws.send_bytes(pcm.tobytes())
+        ws.send_json({"event": "stop"})
+        while True:
+            message = ws.receive_json()
+            if message["event"] == "done":
+                break
+            assert message["event"] == "progress"
+
+
+@pytest.mark.parametrize("stop", [False, True], ids=["mid-stream", "on-stop"])
+def test_failed_decode_step_sends_error_and_closes_1011(client, main_module, monkeypatch, stop):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("decoder crashed")
+        yield  # pragma: no cover - makes this an async generator
+
+    monkeypatch.setattr(main_module, "_iter_transcription", broken)
+    pcm = (np.sin(np.arange(16000 * 3) / 16000 * 2 * np.pi * 180) * 8000).astype("<i2")
+    with client.websocket_connect("/ws/transcribe?format=s16le") as ws:
+        ws.send_bytes(pcm.tobytes())
+        if stop:
+            ws.send_json({"event": "stop"})
+        else:
+            time.sleep(0.3)  # let the first step fail in the background
+            ws.send_bytes(pcm.tobytes())  # the next step surfaces that failure
+        assert ws.receive_json() == {"event": "error", "detail": "decoder crashed"}
+        with pytest.raises(WebSocketDisconnect) as excinfo:
+            ws.receive_json()
+    assert excinfo.value.code == 1011